@@ -4,5 +4,3 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
 	name = 'accounts'
 	default_auto_field = 'django.db.models.BigAutoField'
-
-
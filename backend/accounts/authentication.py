@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from datetime import date
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from billing.models import Subscription
+
+
+User = get_user_model()
+
+
+def add_user_claims(token, user):
+	"""
+	Embed the claims ClaimsJWTAuthentication needs to build request.user without
+	a query. Subscription claims are only added when the subscription is already
+	loaded (e.g. via select_related), so minting a token never costs a query.
+	"""
+	token['username'] = user.username
+	if not User.subscription.is_cached(user):
+		return
+	try:
+		subscription = user.subscription
+	except Subscription.DoesNotExist:
+		return
+	token['sub_plan'] = subscription.plan
+	token['sub_status'] = subscription.status
+	token['sub_end'] = subscription.end_date.isoformat()
+
+
+class SubscriptionClaims:
+	"""Subscription state as it was when the access token was issued."""
+
+	def __init__(self, plan, status, end_date):
+		self.plan = plan
+		self.status = status
+		self.end_date = end_date
+
+	def is_active(self) -> bool:
+		# Same rule as Subscription.is_active, minus the auto-expire write
+		return self.status == Subscription.STATUS_ACTIVE and self.end_date >= timezone.now().date()
+
+
+class _VerifiedTokenCache:
+	"""Small thread-safe LRU of raw access token -> validated token."""
+
+	def __init__(self, maxsize):
+		self.maxsize = maxsize
+		self._tokens = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, raw_token):
+		with self._lock:
+			token = self._tokens.get(raw_token)
+			if token is not None:
+				self._tokens.move_to_end(raw_token)
+			return token
+
+	def put(self, raw_token, token):
+		if self.maxsize <= 0:
+			return
+		with self._lock:
+			self._tokens[raw_token] = token
+			self._tokens.move_to_end(raw_token)
+			while len(self._tokens) > self.maxsize:
+				self._tokens.popitem(last=False)
+
+	def discard(self, raw_token):
+		with self._lock:
+			self._tokens.pop(raw_token, None)
+
+	def clear(self):
+		with self._lock:
+			self._tokens.clear()
+
+
+verified_tokens = _VerifiedTokenCache(getattr(settings, 'JWT_VERIFIED_TOKEN_CACHE_SIZE', 1024))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+	"""
+	JWT authentication that builds request.user from token claims instead of
+	loading auth_user on every request.
+
+	request.user is a real User instance with only id and username loaded; any
+	other field is fetched on first access, and save() only writes loaded
+	fields, so code that needs more of the row still works. Endpoints that use
+	the full row anyway (profile, password change) should opt back into
+	JWTAuthentication. Tokens minted before claims existed fall back to the
+	database lookup.
+	"""
+
+	def get_validated_token(self, raw_token):
+		token = verified_tokens.get(raw_token)
+		if token is not None:
+			try:
+				# check_exp defaults to the time the token object was built
+				token.check_exp(current_time=aware_utcnow())
+				return token
+			except TokenError:
+				verified_tokens.discard(raw_token)
+		token = super().get_validated_token(raw_token)
+		verified_tokens.put(raw_token, token)
+		return token
+
+	def get_user(self, validated_token):
+		username = validated_token.get('username')
+		user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+		if username is None or user_id is None:
+			return super().get_user(validated_token)
+
+		user = User.from_db(DEFAULT_DB_ALIAS, ['id', 'username'], [user_id, username])
+		user.subscription_claims = None
+		if 'sub_end' in validated_token:
+			user.subscription_claims = SubscriptionClaims(
+				plan=validated_token.get('sub_plan'),
+				status=validated_token.get('sub_status'),
+				end_date=date.fromisoformat(validated_token['sub_end']),
+			)
+		return user
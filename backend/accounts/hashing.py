@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingUnavailable(APIException):
+	status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+	default_detail = "Too many sign-in requests right now. Please retry in a few seconds."
+	default_code = "hashing_unavailable"
+
+
+def _configure_worker(password_hashers):
+	# Hashers only need PASSWORD_HASHERS, so workers skip the full Django setup
+	if not settings.configured:
+		settings.configure(PASSWORD_HASHERS=password_hashers)
+
+
+class PasswordHashingService:
+	"""
+	Runs password hashing off the request thread in a size-capped process pool.
+
+	At most `max_pending` hash jobs (running or queued) are accepted per web
+	process; beyond that callers get HashingUnavailable (503) immediately instead
+	of piling up behind a login storm. With workers=0 hashing runs inline but
+	the same pending limit applies.
+	"""
+
+	def __init__(self, workers, max_pending, timeout):
+		self.workers = workers
+		self.max_pending = max_pending
+		self.timeout = timeout
+		self._slots = threading.BoundedSemaphore(max_pending)
+		self._lock = threading.Lock()
+		self._executor = None
+		self._pid = None
+
+	def _get_executor(self):
+		with self._lock:
+			# A pool inherited through fork (e.g. gunicorn preload) is unusable
+			if self._executor is None or self._pid != os.getpid():
+				self._executor = ProcessPoolExecutor(
+					max_workers=self.workers,
+					mp_context=multiprocessing.get_context('spawn'),
+					initializer=_configure_worker,
+					initargs=(list(settings.PASSWORD_HASHERS),),
+				)
+				self._pid = os.getpid()
+			return self._executor
+
+	def _discard_executor(self, executor):
+		with self._lock:
+			if self._executor is executor:
+				self._executor = None
+		executor.shutdown(wait=False, cancel_futures=True)
+
+	def run(self, func, *args):
+		if not self._slots.acquire(blocking=False):
+			raise HashingUnavailable()
+
+		if self.workers <= 0:
+			try:
+				return func(*args)
+			finally:
+				self._slots.release()
+
+		executor = self._get_executor()
+		try:
+			future = executor.submit(func, *args)
+		except BrokenProcessPool:
+			self._slots.release()
+			self._discard_executor(executor)
+			raise HashingUnavailable()
+		# The slot is held until the job really finishes, even if we stop waiting
+		future.add_done_callback(lambda _: self._slots.release())
+		try:
+			return future.result(timeout=self.timeout)
+		except FutureTimeoutError:
+			raise HashingUnavailable()
+		except BrokenProcessPool:
+			self._discard_executor(executor)
+			raise HashingUnavailable()
+
+	def shutdown(self):
+		with self._lock:
+			executor, self._executor = self._executor, None
+		if executor is not None:
+			executor.shutdown(wait=True, cancel_futures=True)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> PasswordHashingService:
+	global _service
+	with _service_lock:
+		if _service is None:
+			_service = PasswordHashingService(
+				workers=settings.PASSWORD_HASHING_WORKERS,
+				max_pending=settings.PASSWORD_HASHING_MAX_PENDING,
+				timeout=settings.PASSWORD_HASHING_TIMEOUT,
+			)
+		return _service
+
+
+def reset_service():
+	"""Drop the current service (and its pool) so the next call re-reads settings."""
+	global _service
+	with _service_lock:
+		service, _service = _service, None
+	if service is not None:
+		service.shutdown()
+
+
+def make_password(password):
+	return get_service().run(hashers.make_password, password)
+
+
+def check_password(password, encoded):
+	return get_service().run(hashers.check_password, password, encoded)
+
+
+def check_user_password(user, raw_password) -> bool:
+	"""
+	Pool-backed equivalent of user.check_password(), including upgrading the
+	stored hash when the preferred hasher or its iteration count changed.
+	"""
+	if not hashers.is_password_usable(user.password):
+		return False
+	if not check_password(raw_password, user.password):
+		return False
+	hasher = hashers.identify_hasher(user.password)
+	preferred = hashers.get_hasher('default')
+	if hasher.algorithm != preferred.algorithm or preferred.must_update(user.password):
+		user.password = make_password(raw_password)
+		user.save(update_fields=['password'])
+	return True
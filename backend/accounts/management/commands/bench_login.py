@@ -0,0 +1,75 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import PasswordResetToken
+
+
+# Queries per attempt measured on the previous login implementation
+# (User.objects.get + plaintext token lookup + authenticate + exists()).
+BASELINE_QUERIES = {
+	'password': 4,
+	'wrong password': 3,
+	'unknown user': 2,
+	'blocked by temp password': 4,
+	'temp password': 3,
+}
+
+
+class Command(BaseCommand):
+	help = "Measure queries and latency per login attempt for each login path."
+
+	def add_arguments(self, parser):
+		parser.add_argument('--iterations', type=int, default=20)
+
+	def handle(self, *args, **options):
+		iterations = options['iterations']
+		client = Client(SERVER_NAME='localhost')
+		password = 'Bench-login-1'
+
+		# Everything runs in a transaction that is rolled back at the end
+		with transaction.atomic():
+			user = User.objects.create_user(username='bench-login-user', password=password)
+			blocked = User.objects.create_user(username='bench-login-blocked', password=password)
+			self._reset_token(blocked, 'BLOCKED1')
+
+			scenarios = [
+				('password', lambda: ('bench-login-user', password), None),
+				('wrong password', lambda: ('bench-login-user', 'not-the-password'), None),
+				('unknown user', lambda: ('bench-login-nobody', password), None),
+				('blocked by temp password', lambda: ('bench-login-blocked', password), None),
+				('temp password', lambda: ('bench-login-user', 'TEMP0001'), lambda: self._reset_token(user, 'TEMP0001')),
+			]
+
+			self.stdout.write(f"{'scenario':<26}{'before':>8}{'after':>8}{'p50 ms':>10}{'p95 ms':>10}")
+			for name, credentials, prepare in scenarios:
+				query_counts = []
+				timings = []
+				for _ in range(iterations):
+					if prepare:
+						prepare()
+					username, pw = credentials()
+					with CaptureQueriesContext(connection) as ctx:
+						start = time.perf_counter()
+						client.post('/api/auth/login/', {'username': username, 'password': pw}, content_type='application/json')
+						timings.append((time.perf_counter() - start) * 1000)
+					query_counts.append(len(ctx.captured_queries))
+				timings.sort()
+				p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+				self.stdout.write(
+					f"{name:<26}{BASELINE_QUERIES[name]:>8}{max(query_counts):>8}"
+					f"{statistics.median(timings):>10.2f}{p95:>10.2f}"
+				)
+			transaction.set_rollback(True)
+
+	def _reset_token(self, user, temp_password):
+		token = PasswordResetToken(user=user, expires_at=timezone.now() + timedelta(hours=1))
+		token.set_temp_password(temp_password)
+		token.save()
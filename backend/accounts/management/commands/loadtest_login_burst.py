@@ -0,0 +1,137 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from accounts import hashing
+from billing.models import Subscription
+from monitoring.stats import percentile
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+	help = (
+		"Measure task-list latency on its own and during a concurrent login burst. "
+		"Runs against a throwaway test database."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument('--duration', type=float, default=5.0, help="Seconds per phase")
+		parser.add_argument('--task-clients', type=int, default=4)
+		parser.add_argument('--login-clients', type=int, default=16)
+		parser.add_argument(
+			'--hashing-workers', type=int, default=None,
+			help="Override PASSWORD_HASHING_WORKERS (0 hashes inline, for comparison)",
+		)
+		parser.add_argument('--max-pending', type=int, default=None)
+
+	def handle(self, *args, **options):
+		# Test settings swap in a fast hasher; the burst only means something with the real one
+		overrides = {
+			'ALLOWED_HOSTS': ['*'],
+			'PASSWORD_HASHERS': ['django.contrib.auth.hashers.PBKDF2PasswordHasher'],
+		}
+		if options['hashing_workers'] is not None:
+			overrides['PASSWORD_HASHING_WORKERS'] = options['hashing_workers']
+		if options['max_pending'] is not None:
+			overrides['PASSWORD_HASHING_MAX_PENDING'] = options['max_pending']
+
+		old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+		try:
+			with override_settings(**overrides):
+				hashing.reset_service()
+				try:
+					self._run(options)
+				finally:
+					hashing.reset_service()
+		finally:
+			connection.creation.destroy_test_db(old_name, verbosity=0)
+
+	def _run(self, options):
+		from django.conf import settings
+
+		user = User.objects.create_user(username='loadtest-tasks', password='Loadtest-pass-1')
+		Subscription.objects.create(
+			user=user,
+			plan=Subscription.PLAN_MONTHLY,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=30),
+		)
+		Task.objects.bulk_create(
+			Task(user=user, title=f"Task {i}", due_date=timezone.now().date()) for i in range(50)
+		)
+		User.objects.create_user(username='loadtest-login', password='Loadtest-pass-2')
+		access = Client().post(
+			'/api/auth/login/',
+			{'username': 'loadtest-tasks', 'password': 'Loadtest-pass-1'},
+			content_type='application/json',
+		).json()['access']
+
+		self.stdout.write(
+			f"hashing workers={settings.PASSWORD_HASHING_WORKERS} "
+			f"max pending={settings.PASSWORD_HASHING_MAX_PENDING} "
+			f"task clients={options['task_clients']} login clients={options['login_clients']}"
+		)
+		self.stdout.write(
+			f"{'phase':<14}{'tasks p50':>10}{'p95':>8}{'p99':>8}{'tasks/s':>9}{'logins/s':>10}{'503s':>6}"
+		)
+		for phase, login_clients in (('tasks only', 0), ('login burst', options['login_clients'])):
+			stats = self._phase(access, options['task_clients'], login_clients, options['duration'])
+			latencies = sorted(stats['task_latencies'])
+			self.stdout.write(
+				f"{phase:<14}{percentile(latencies, 50):>10.1f}{percentile(latencies, 95):>8.1f}"
+				f"{percentile(latencies, 99):>8.1f}{len(latencies) / options['duration']:>9.1f}"
+				f"{stats['logins'] / options['duration']:>10.1f}{stats['rejected']:>6}"
+			)
+
+	def _phase(self, access, task_clients, login_clients, duration):
+		deadline = time.monotonic() + duration
+		lock = threading.Lock()
+		stats = {'task_latencies': [], 'logins': 0, 'rejected': 0}
+
+		def task_client():
+			client = Client(HTTP_AUTHORIZATION=f"Bearer {access}")
+			latencies = []
+			try:
+				while time.monotonic() < deadline:
+					start = time.perf_counter()
+					client.get('/api/tasks/')
+					latencies.append((time.perf_counter() - start) * 1000)
+			finally:
+				connections.close_all()
+			with lock:
+				stats['task_latencies'].extend(latencies)
+
+		def login_client():
+			client = Client()
+			logins = rejected = 0
+			try:
+				while time.monotonic() < deadline:
+					response = client.post(
+						'/api/auth/login/',
+						{'username': 'loadtest-login', 'password': 'Loadtest-pass-2'},
+						content_type='application/json',
+					)
+					if response.status_code == 503:
+						rejected += 1
+					else:
+						logins += 1
+			finally:
+				connections.close_all()
+			with lock:
+				stats['logins'] += logins
+				stats['rejected'] += rejected
+
+		threads = [threading.Thread(target=task_client) for _ in range(task_clients)]
+		threads += [threading.Thread(target=login_client) for _ in range(login_clients)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		return stats
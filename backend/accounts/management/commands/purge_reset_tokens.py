@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from accounts.tasks import purge_password_reset_tokens
+
+
+class Command(BaseCommand):
+	help = "Delete expired and used password-reset tokens and report how many were removed."
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=None)
+
+	def handle(self, *args, **options):
+		result = purge_password_reset_tokens(batch_size=options['batch_size'])
+		self.stdout.write(
+			f"Deleted {result['total_deleted']} tokens "
+			f"({result['expired_deleted']} expired, {result['used_deleted']} used) "
+			f"in {result['batches']} batches"
+		)
@@ -0,0 +1,43 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def hash_existing_temp_passwords(apps, schema_editor):
+    PasswordResetToken = apps.get_model('accounts', 'PasswordResetToken')
+    for token in PasswordResetToken.objects.only('id', 'temp_password_hash').iterator():
+        token.temp_password_hash = hmac.new(
+            settings.SECRET_KEY.encode(),
+            token.temp_password_hash.upper().encode(),
+            hashlib.sha256,
+        ).hexdigest()
+        token.save(update_fields=['temp_password_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='passwordresettoken',
+            old_name='temp_password',
+            new_name='temp_password_hash',
+        ),
+        migrations.AlterField(
+            model_name='passwordresettoken',
+            name='temp_password_hash',
+            field=models.CharField(max_length=64),
+        ),
+        # Plaintext temp passwords cannot be recovered from the hash, so this is one-way.
+        migrations.RunPython(hash_existing_temp_passwords, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='passwordresettoken',
+            index=models.Index(fields=['user', 'used', 'expires_at'], name='accounts_pa_user_id_195943_idx'),
+        ),
+    ]
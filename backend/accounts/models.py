@@ -5,7 +5,10 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from datetime import timedelta
+import hashlib
+import hmac
 import secrets
+import string
 
 
 User = get_user_model()
@@ -15,6 +18,8 @@ class Profile(models.Model):
 	user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='profile')
 	profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
 	updated_at = models.DateTimeField(auto_now=True)
+	# Secret path segment of the user's .ics feed; None until they ask for one
+	calendar_token = models.CharField(max_length=64, unique=True, null=True, blank=True)
 
 	def __str__(self) -> str:
 		return f"Profile({self.user.username})"
@@ -22,30 +27,58 @@ class Profile(models.Model):
 
 class PasswordResetToken(models.Model):
 	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='password_reset_tokens')
-	temp_password = models.CharField(max_length=8)
+	# HMAC of the upper-cased temp password; the plaintext only lives in the email
+	temp_password_hash = models.CharField(max_length=64)
 	created_at = models.DateTimeField(auto_now_add=True)
 	used = models.BooleanField(default=False)
 	expires_at = models.DateTimeField()
 
+	LIFETIME = timedelta(hours=24)
+
+	class Meta:
+		indexes = [
+			# Login looks up a user's active (unused, unexpired) token
+			models.Index(fields=['user', 'used', 'expires_at']),
+			# Purge job range-scans expired and used tokens across all users
+			models.Index(fields=['used', 'expires_at']),
+		]
+
 	def __str__(self) -> str:
 		return f"PasswordResetToken({self.user.username})"
 
 	def is_valid(self):
 		return not self.used and timezone.now() < self.expires_at
 
+	@staticmethod
+	def hash_temp_password(temp_password: str) -> str:
+		"""
+		Keyed digest of a temp password. Temp passwords are random and short-lived,
+		so a fast deterministic HMAC is enough and lets login compare in SQL.
+		Temp passwords are case-insensitive, hence the upper().
+		"""
+		return hmac.new(
+			settings.SECRET_KEY.encode(),
+			temp_password.upper().encode(),
+			hashlib.sha256,
+		).hexdigest()
+
+	def set_temp_password(self, temp_password: str):
+		self.temp_password_hash = self.hash_temp_password(temp_password)
+		# Kept in memory only, so the reset email can include it
+		self.temp_password = temp_password
+
+	def check_temp_password(self, temp_password: str) -> bool:
+		return hmac.compare_digest(self.temp_password_hash, self.hash_temp_password(temp_password))
+
 	@classmethod
 	def generate_temp_password(cls, user):
 		# Generate 8-character alphanumeric password (uppercase letters and numbers)
-		import string
-		import random
 		characters = string.ascii_uppercase + string.digits
-		temp_password = ''.join(random.choice(characters) for _ in range(8))
-		expires_at = timezone.now() + timedelta(hours=24)
-		return cls.objects.create(
-			user=user,
-			temp_password=temp_password,
-			expires_at=expires_at
-		)
+		temp_password = ''.join(secrets.choice(characters) for _ in range(8))
+		token = cls(user=user, expires_at=timezone.now() + cls.LIFETIME)
+		token.set_temp_password(temp_password)
+		token.save()
+		return token
 
 
 @receiver(post_save, sender=User)
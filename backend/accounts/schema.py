@@ -0,0 +1,16 @@
+"""
+OpenAPI extensions, loaded through SPECTACULAR_SETTINGS["PREPROCESSING_HOOKS"]
+when a schema is generated rather than at start-up, so web and worker
+processes never import drf-spectacular's schema machinery.
+"""
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+
+
+class ClaimsJWTScheme(SimpleJWTScheme):
+	"""Document ClaimsJWTAuthentication as the same bearer JWT scheme."""
+	target_class = 'accounts.authentication.ClaimsJWTAuthentication'
+
+
+def register_extensions(endpoints):
+	"""Preprocessing hook; importing this module is what registers the extensions above."""
+	return endpoints
@@ -2,12 +2,16 @@ from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
-from PIL import Image
-import os
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+import hashlib
 from django.core.files.uploadedfile import InMemoryUploadedFile
 import io
 from sys import getsizeof
+from . import hashing
 from .models import Profile
+from .authentication import add_user_claims
 
 
 class SignupSerializer(serializers.ModelSerializer):
@@ -22,11 +26,13 @@ class SignupSerializer(serializers.ModelSerializer):
 		fields = ("username", "email", "password")
 
 	def create(self, validated_data):
-		user = User.objects.create_user(
-			username=validated_data["username"],
-			email=validated_data["email"],
-			password=validated_data["password"],
+		# Same normalisation as create_user, but the hash comes from the hashing pool
+		user = User(
+			username=User.normalize_username(validated_data["username"]),
+			email=User.objects.normalize_email(validated_data["email"]),
 		)
+		user.password = hashing.make_password(validated_data["password"])
+		user.save()
 		return user
 
 
@@ -59,7 +65,14 @@ class ProfileSerializer(serializers.ModelSerializer):
 		"""
 		Optimize image by resizing and compressing.
 		Max size: 800x800px, Quality: 85%, Format: JPEG
+
+		The result is stored under a content-hash filename so its URL never
+		changes meaning and can be cached forever. Re-uploading the same
+		picture reuses the stored file instead of writing a copy.
 		"""
+		# Imported here: Pillow is costly to load and only uploads need it
+		from PIL import Image
+
 		try:
 			# Open image
 			img = Image.open(image)
@@ -82,19 +95,23 @@ class ProfileSerializer(serializers.ModelSerializer):
 			# Save to memory buffer
 			img_io = io.BytesIO()
 			img.save(img_io, format='JPEG', quality=85, optimize=True)
+			
+			# Name the file after its content so the URL is immutable
+			digest = hashlib.sha256(img_io.getbuffer()).hexdigest()[:32]
+			new_name = f"{digest}.jpg"
+			field = Profile._meta.get_field('profile_picture')
+			stored_name = field.generate_filename(self.instance, new_name)
+			if field.storage.exists(stored_name):
+				return stored_name
 			img_io.seek(0)
 			
 			# Create new InMemoryUploadedFile
-			original_name = image.name
-			name, ext = os.path.splitext(original_name)
-			new_name = f"{name}.jpg"
-			
 			optimized_image = InMemoryUploadedFile(
 				img_io,
 				'ImageField',
 				new_name,
 				'image/jpeg',
-				img_io.tell(),
+				img_io.getbuffer().nbytes,
 				None
 			)
 			
@@ -114,3 +131,21 @@ class ChangePasswordSerializer(serializers.Serializer):
 		return value
 
 
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+	"""
+	Refresh that re-reads username and subscription into the new access token,
+	so claims are never older than one access-token lifetime. This is also
+	where deleted or deactivated users lose access.
+	"""
+
+	def validate(self, attrs):
+		data = super().validate(attrs)
+		access = self.token_class.access_token_class(data["access"])
+		user = User.objects.select_related("subscription").filter(
+			id=access[api_settings.USER_ID_CLAIM]
+		).first()
+		if user is None or not user.is_active:
+			raise AuthenticationFailed("User not found", code="user_not_found")
+		add_user_claims(access, user)
+		data["access"] = str(access)
+		return data
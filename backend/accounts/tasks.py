@@ -0,0 +1,66 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from .models import PasswordResetToken
+
+logger = logging.getLogger(__name__)
+
+
+def _delete_in_batches(queryset, batch_size):
+	"""Delete rows matching `queryset` batch_size ids at a time; returns (deleted, batches)."""
+	deleted = 0
+	batches = 0
+	while True:
+		ids = list(queryset.values_list('id', flat=True)[:batch_size])
+		if not ids:
+			return deleted, batches
+		count, _ = PasswordResetToken.objects.filter(id__in=ids).delete()
+		deleted += count
+		batches += 1
+
+
+@shared_task
+def purge_password_reset_tokens(batch_size=None):
+	"""
+	Delete expired and used password-reset tokens in bounded batches.
+
+	Used tokens are kept for a grace period because change_password lets a user
+	who just logged in with a temp password set a new one without the old one.
+	Both passes are range scans on the (used, expires_at) index: every token
+	expires LIFETIME after it is created, so "created before the grace cutoff"
+	is the same as "expires before cutoff + LIFETIME".
+	"""
+	batch_size = batch_size or settings.PASSWORD_RESET_PURGE_BATCH_SIZE
+	now = timezone.now()
+	grace = timedelta(minutes=settings.PASSWORD_RESET_USED_GRACE_MINUTES)
+
+	expired_deleted, expired_batches = _delete_in_batches(
+		PasswordResetToken.objects.filter(used=False, expires_at__lt=now),
+		batch_size,
+	)
+	used_deleted, used_batches = _delete_in_batches(
+		PasswordResetToken.objects.filter(
+			used=True,
+			expires_at__lt=now - grace + PasswordResetToken.LIFETIME,
+		),
+		batch_size,
+	)
+
+	result = {
+		'expired_deleted': expired_deleted,
+		'used_deleted': used_deleted,
+		'total_deleted': expired_deleted + used_deleted,
+		'rows_scanned': expired_deleted + used_deleted,
+		'rows_written': expired_deleted + used_deleted,
+		'batches': expired_batches + used_batches,
+		'date': now.isoformat(),
+	}
+	logger.info(
+		"Purged %s password reset tokens (%s expired, %s used) in %s batches",
+		result['total_deleted'], expired_deleted, used_deleted, result['batches'],
+	)
+	return result
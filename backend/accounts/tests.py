@@ -1,18 +1,27 @@
 from datetime import timedelta
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from unittest.mock import patch, MagicMock
 from io import BytesIO
 from PIL import Image
+import shutil
+import tempfile
 
 from .models import Profile, PasswordResetToken
 
 User = get_user_model()
 
 
+def _create_reset_token(temp_password, **kwargs):
+	token = PasswordResetToken(**kwargs)
+	token.set_temp_password(temp_password)
+	token.save()
+	return token
+
+
 class ProfileModelTest(TestCase):
 	"""Unit tests for Profile model"""
 	
@@ -60,7 +69,7 @@ class PasswordResetTokenModelTest(TestCase):
 	
 	def test_is_valid(self):
 		"""Test token validity check"""
-		token = PasswordResetToken.objects.create(
+		token = _create_reset_token(
 			user=self.user,
 			temp_password='ABCD1234',
 			expires_at=timezone.now() + timedelta(hours=24),
@@ -81,12 +90,68 @@ class PasswordResetTokenModelTest(TestCase):
 	
 	def test_token_str_representation(self):
 		"""Test token string representation"""
-		token = PasswordResetToken.objects.create(
+		token = _create_reset_token(
 			user=self.user,
 			temp_password='ABCD1234',
 			expires_at=timezone.now() + timedelta(hours=24)
 		)
 		self.assertIn(self.user.username, str(token))
+	
+	def test_temp_password_stored_hashed(self):
+		"""Test that only a case-insensitive digest of the temp password is stored"""
+		token = PasswordResetToken.generate_temp_password(self.user)
+		stored = PasswordResetToken.objects.get(id=token.id)
+		self.assertNotEqual(stored.temp_password_hash, token.temp_password)
+		self.assertTrue(stored.check_temp_password(token.temp_password.lower()))
+		self.assertFalse(stored.check_temp_password('WRONG123'))
+
+
+class PurgePasswordResetTokensTest(TestCase):
+	"""Unit tests for the password-reset token purge job"""
+	
+	def setUp(self):
+		self.user = User.objects.create_user(
+			username='testuser',
+			email='test@example.com',
+			password='testpass123'
+		)
+	
+	def _token(self, used=False, created_ago=timedelta(0)):
+		return _create_reset_token(
+			user=self.user,
+			temp_password='ABCD1234',
+			used=used,
+			expires_at=timezone.now() - created_ago + PasswordResetToken.LIFETIME
+		)
+	
+	def test_purge_deletes_expired_and_old_used_tokens(self):
+		"""Test that expired and used tokens are purged in batches"""
+		from .tasks import purge_password_reset_tokens
+		active = self._token()
+		just_used = self._token(used=True, created_ago=timedelta(minutes=2))
+		self._token(created_ago=timedelta(hours=25))
+		self._token(created_ago=timedelta(hours=30))
+		self._token(used=True, created_ago=timedelta(hours=2))
+		
+		result = purge_password_reset_tokens(batch_size=1)
+		
+		self.assertEqual(result['expired_deleted'], 2)
+		self.assertEqual(result['used_deleted'], 1)
+		self.assertEqual(result['total_deleted'], 3)
+		self.assertEqual(result['batches'], 3)
+		remaining = set(PasswordResetToken.objects.values_list('id', flat=True))
+		self.assertEqual(remaining, {active.id, just_used.id})
+	
+	def test_purge_keeps_recently_used_token_for_change_password(self):
+		"""Test that a token used moments ago still allows change_password"""
+		from .tasks import purge_password_reset_tokens
+		self._token(used=True, created_ago=timedelta(minutes=1))
+		purge_password_reset_tokens()
+		
+		client = APIClient()
+		client.force_authenticate(user=self.user)
+		response = client.post('/api/auth/change-password/', {'new_password': 'newpass123'}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
 class SignupSerializerTest(TestCase):
@@ -191,6 +256,65 @@ class ProfileSerializerTest(TestCase):
 			self.assertTrue(updated_profile.profile_picture.name.endswith('.jpg'))
 
 
+class ProfilePictureMediaTest(APITestCase):
+	"""Content-hashed profile pictures and their cache headers"""
+	
+	def setUp(self):
+		self.media_root = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+		override = override_settings(MEDIA_ROOT=self.media_root)
+		override.enable()
+		self.addCleanup(override.disable)
+		self.user = User.objects.create_user(
+			username='testuser',
+			email='test@example.com',
+			password='testpass123'
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.user)
+	
+	def _upload(self, color='blue'):
+		img = Image.new('RGB', (100, 100), color=color)
+		img_io = BytesIO()
+		img.save(img_io, format='PNG')
+		from django.core.files.uploadedfile import SimpleUploadedFile
+		image_file = SimpleUploadedFile('avatar.png', img_io.getvalue(), content_type='image/png')
+		response = self.client.patch('/api/auth/profile/', {'profile_picture': image_file}, format='multipart')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.user.profile.refresh_from_db()
+		return self.user.profile.profile_picture.name
+	
+	def test_profile_picture_stored_under_content_hash(self):
+		"""Test that the same picture maps to the same hashed file"""
+		first = self._upload()
+		self.assertRegex(first, r'^profile_pictures/[0-9a-f]{32}\.jpg$')
+		self.assertEqual(self._upload(), first)
+		self.assertNotEqual(self._upload(color='red'), first)
+	
+	def test_hashed_media_is_immutable(self):
+		"""Test that hashed media is served with a long immutable cache lifetime"""
+		name = self._upload()
+		response = self.client.get(f'/media/{name}')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertIn('immutable', response['Cache-Control'])
+		self.assertIn('max-age=31536000', response['Cache-Control'])
+	
+	@override_settings(MEDIA_ACCEL_REDIRECT=True)
+	def test_accel_redirect_offloads_media_bytes(self):
+		"""Test that accel mode hands the file to nginx instead of reading it"""
+		name = self._upload()
+		response = self.client.get(f'/media/{name}')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{name}')
+		self.assertEqual(response['Content-Type'], 'image/jpeg')
+		self.assertEqual(response.content, b'')
+	
+	def test_media_path_traversal_rejected(self):
+		"""Test that paths outside MEDIA_ROOT are not served"""
+		response = self.client.get('/media/../core/settings.py')
+		self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
 class ChangePasswordSerializerTest(TestCase):
 	"""Unit tests for ChangePasswordSerializer"""
 	
@@ -402,7 +526,7 @@ class ChangePasswordViewTest(APITestCase):
 	def test_change_password_after_temp_password(self):
 		"""Test password change after using temp password"""
 		# Create a recently used temp password
-		token = PasswordResetToken.objects.create(
+		token = _create_reset_token(
 			user=self.user,
 			temp_password='TEMP1234',
 			expires_at=timezone.now() + timedelta(hours=24),
@@ -478,6 +602,38 @@ class PasswordResetViewTest(APITestCase):
 		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class PasswordHashingServiceTest(APITestCase):
+	"""Unit tests for the bounded password hashing service"""
+	
+	def test_process_pool_round_trip(self):
+		"""Test hashing and verifying in a worker process"""
+		from django.contrib.auth import hashers
+		from .hashing import PasswordHashingService
+		service = PasswordHashingService(workers=1, max_pending=2, timeout=30)
+		self.addCleanup(service.shutdown)
+		encoded = service.run(hashers.make_password, 'Secret-123')
+		self.assertTrue(service.run(hashers.check_password, 'Secret-123', encoded))
+		self.assertFalse(service.run(hashers.check_password, 'wrong', encoded))
+	
+	def test_saturated_service_rejects_immediately(self):
+		"""Test that login fails fast with 503 when the hashing queue is full"""
+		from .hashing import PasswordHashingService
+		User.objects.create_user(username='testuser', password='testpass123')
+		service = PasswordHashingService(workers=0, max_pending=1, timeout=5)
+		service._slots.acquire()
+		with patch('accounts.hashing.get_service', return_value=service):
+			response = self.client.post(
+				'/api/auth/login/', {'username': 'testuser', 'password': 'testpass123'}, format='json'
+			)
+		self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+		service._slots.release()
+		with patch('accounts.hashing.get_service', return_value=service):
+			response = self.client.post(
+				'/api/auth/login/', {'username': 'testuser', 'password': 'testpass123'}, format='json'
+			)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
 class LoginViewTest(APITestCase):
 	"""Unit tests for login endpoint"""
 	
@@ -501,9 +657,33 @@ class LoginViewTest(APITestCase):
 		self.assertIn('refresh', response.data)
 		self.assertFalse(response.data.get('temp_password_used', False))
 	
+	def test_failed_logins_send_user_login_failed(self):
+		"""Test that wrong passwords, unknown users and inactive users fire the signal like authenticate()"""
+		from django.contrib.auth.signals import user_logged_in, user_login_failed
+		failed, logged_in = [], []
+		handler = lambda sender, **kwargs: failed.append(kwargs['credentials'])
+		success = lambda sender, **kwargs: logged_in.append(kwargs['user'])
+		user_login_failed.connect(handler)
+		user_logged_in.connect(success)
+		self.addCleanup(user_login_failed.disconnect, handler)
+		self.addCleanup(user_logged_in.disconnect, success)
+		
+		self.client.post('/api/auth/login/', {'username': 'testuser', 'password': 'testpass123'}, format='json')
+		self.assertEqual(failed, [])
+		self.client.post('/api/auth/login/', {'username': 'testuser', 'password': 'wrong'}, format='json')
+		self.client.post('/api/auth/login/', {'username': 'nobody', 'password': 'wrong'}, format='json')
+		User.objects.filter(pk=self.user.pk).update(is_active=False)
+		self.client.post('/api/auth/login/', {'username': 'testuser', 'password': 'testpass123'}, format='json')
+		self.assertEqual([c['username'] for c in failed], ['testuser', 'nobody', 'testuser'])
+		self.assertNotIn('testpass123', str(failed))
+		# As before, the token login is not a session login: no user_logged_in, no last_login
+		self.assertEqual(logged_in, [])
+		self.user.refresh_from_db()
+		self.assertIsNone(self.user.last_login)
+	
 	def test_login_with_temp_password(self):
 		"""Test login with temporary password"""
-		token = PasswordResetToken.objects.create(
+		token = _create_reset_token(
 			user=self.user,
 			temp_password='TEMP1234',
 			expires_at=timezone.now() + timedelta(hours=24),
@@ -543,7 +723,7 @@ class LoginViewTest(APITestCase):
 	
 	def test_login_with_active_temp_password_blocks_old_password(self):
 		"""Test that active temp password blocks old password"""
-		PasswordResetToken.objects.create(
+		_create_reset_token(
 			user=self.user,
 			temp_password='TEMP1234',
 			expires_at=timezone.now() + timedelta(hours=24),
@@ -558,4 +738,136 @@ class LoginViewTest(APITestCase):
 		response = self.client.post('/api/auth/login/', data, format='json')
 		self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 		self.assertIn('temporary password', response.data['detail'].lower())
+	
+	def test_temp_password_cannot_be_reused(self):
+		"""Test that a temp password only logs in once"""
+		_create_reset_token(
+			user=self.user,
+			temp_password='TEMP1234',
+			expires_at=timezone.now() + timedelta(hours=24)
+		)
+		data = {'username': 'testuser', 'password': 'temp1234'}
+		response = self.client.post('/api/auth/login/', data, format='json')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		response = self.client.post('/api/auth/login/', data, format='json')
+		self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+	
+	def test_login_query_counts(self):
+		"""Test that login resolves user and reset-token state in one query"""
+		data = {'username': 'testuser', 'password': 'testpass123'}
+		with self.assertNumQueries(1):
+			response = self.client.post('/api/auth/login/', data, format='json')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		
+		with self.assertNumQueries(1):
+			response = self.client.post('/api/auth/login/', {'username': 'nobody', 'password': 'x'}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+		
+		_create_reset_token(
+			user=self.user,
+			temp_password='TEMP1234',
+			expires_at=timezone.now() + timedelta(hours=24)
+		)
+		with self.assertNumQueries(1):
+			response = self.client.post('/api/auth/login/', data, format='json')
+		self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+		
+		# Lookup plus the UPDATE that marks the token used
+		with self.assertNumQueries(2):
+			response = self.client.post('/api/auth/login/', {'username': 'testuser', 'password': 'TEMP1234'}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+
 
+class ClaimsJWTAuthenticationTest(APITestCase):
+	"""Unit tests for claims-based JWT user resolution"""
+	
+	def setUp(self):
+		from billing.models import Subscription
+		from .authentication import verified_tokens
+		verified_tokens.clear()
+		self.user = User.objects.create_user(
+			username='testuser',
+			email='test@example.com',
+			password='testpass123'
+		)
+		Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		self.client = APIClient()
+		response = self.client.post('/api/auth/login/', {'username': 'testuser', 'password': 'testpass123'}, format='json')
+		self.tokens = response.data
+		self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+	
+	def test_access_token_carries_user_and_subscription_claims(self):
+		"""Test that login embeds username and subscription claims"""
+		from rest_framework_simplejwt.tokens import AccessToken
+		token = AccessToken(self.tokens['access'])
+		self.assertEqual(token['username'], 'testuser')
+		self.assertEqual(token['sub_plan'], 'trial')
+		self.assertEqual(token['sub_end'], (timezone.now().date() + timedelta(days=14)).isoformat())
+	
+	def test_task_list_skips_user_and_subscription_queries(self):
+		"""Test that only the count and page queries run for a task list"""
+		from tasks.models import Task
+		Task.objects.create(user=self.user, title='Task', due_date=timezone.now().date())
+		with self.assertNumQueries(2):
+			response = self.client.get('/api/tasks/')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+	
+	def test_expired_subscription_claims_fall_back_to_database(self):
+		"""Test that stale negative claims are re-checked against the subscription row"""
+		from billing.models import Subscription
+		Subscription.objects.filter(user=self.user).update(end_date=timezone.now().date() - timedelta(days=1))
+		refresh = self.client.post('/api/auth/token/refresh/', {'refresh': self.tokens['refresh']}, format='json')
+		self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.data['access']}")
+		response = self.client.get('/api/tasks/')
+		self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+	
+	def test_profile_uses_full_user_row(self):
+		"""Test that endpoints opting into the full user still work"""
+		response = self.client.get('/api/auth/profile/')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data['email'], 'test@example.com')
+	
+	def test_refresh_rejects_deleted_user(self):
+		"""Test that a deleted user cannot mint new access tokens"""
+		self.user.delete()
+		response = self.client.post('/api/auth/token/refresh/', {'refresh': self.tokens['refresh']}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+	
+	def test_verified_token_cache_skips_reverification(self):
+		"""Test that a repeated access token is only decoded once"""
+		from rest_framework_simplejwt.authentication import JWTAuthentication
+		from .authentication import ClaimsJWTAuthentication
+		auth = ClaimsJWTAuthentication()
+		raw = self.tokens['access'].encode()
+		original = JWTAuthentication.get_validated_token
+		with patch.object(JWTAuthentication, 'get_validated_token', autospec=True, side_effect=original) as verify:
+			first = auth.get_validated_token(raw)
+			second = auth.get_validated_token(raw)
+		self.assertIs(first, second)
+		self.assertEqual(verify.call_count, 1)
+	
+	def test_expired_cached_token_is_rejected(self):
+		"""Test that a cached token past its expiry is not accepted"""
+		from rest_framework_simplejwt.exceptions import InvalidToken
+		from .authentication import ClaimsJWTAuthentication
+		auth = ClaimsJWTAuthentication()
+		raw = self.tokens['access'].encode()
+		auth.get_validated_token(raw)
+		later = timezone.now() + timedelta(days=1)
+		with patch('accounts.authentication.aware_utcnow', return_value=later), \
+				patch('rest_framework_simplejwt.tokens.aware_utcnow', return_value=later):
+			with self.assertRaises(InvalidToken):
+				auth.get_validated_token(raw)
+	
+	def test_schema_documents_bearer_authentication(self):
+		"""Test that the lazily registered extension still describes the JWT scheme"""
+		response = self.client.get('/api/schema/', {'format': 'json'})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		schema = response.json()
+		self.assertEqual(schema['components']['securitySchemes']['jwtAuth']['scheme'], 'bearer')
@@ -1,21 +1,28 @@
-from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_login_failed
 from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
 from django.core.mail import send_mail
 from django.conf import settings
+from django.urls import reverse
 from django.utils import timezone
 from rest_framework import permissions, status
-from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, parser_classes
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.tokens import RefreshToken
+from . import hashing
+from .authentication import add_user_claims
 from .models import Profile, PasswordResetToken
 from .serializers import SignupSerializer, ProfileSerializer, ChangePasswordSerializer
+import secrets
 import sys
 
 
 def _tokens_for_user(user: User):
 	refresh = RefreshToken.for_user(user)
+	add_user_claims(refresh, user)
 	return {"refresh": str(refresh), "access": str(refresh.access_token)}
 
 
@@ -32,6 +39,7 @@ def signup(request):
 
 
 @api_view(["GET", "PATCH"])
+@authentication_classes([JWTAuthentication])
 @permission_classes([permissions.IsAuthenticated])
 @parser_classes([JSONParser, MultiPartParser, FormParser])
 def profile_view(request):
@@ -47,7 +55,31 @@ def profile_view(request):
 	return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(["GET", "POST", "DELETE"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+def calendar_token(request):
+	"""
+	Subscription URL of the user's task calendar. POST issues a new token
+	(invalidating the old URL), DELETE turns the feed off.
+	"""
+	profile = request.user.profile
+	if request.method == "POST":
+		profile.calendar_token = secrets.token_urlsafe(32)
+		profile.save(update_fields=["calendar_token", "updated_at"])
+	elif request.method == "DELETE":
+		profile.calendar_token = None
+		profile.save(update_fields=["calendar_token", "updated_at"])
+		return Response(status=status.HTTP_204_NO_CONTENT)
+
+	calendar_url = None
+	if profile.calendar_token:
+		calendar_url = request.build_absolute_uri(reverse("tasks:calendar-feed", args=[profile.calendar_token]))
+	return Response({"calendar_url": calendar_url})
+
+
 @api_view(["DELETE"])
+@authentication_classes([JWTAuthentication])
 @permission_classes([permissions.IsAuthenticated])
 def delete_account(request):
 	request.user.delete()
@@ -55,6 +87,7 @@ def delete_account(request):
 
 
 @api_view(["POST"])
+@authentication_classes([JWTAuthentication])
 @permission_classes([permissions.IsAuthenticated])
 def change_password(request):
 	serializer = ChangePasswordSerializer(data=request.data)
@@ -74,13 +107,13 @@ def change_password(request):
 
 	if not recent_temp_used and old_password:
 		# Regular password change requires old password
-		if not request.user.check_password(old_password):
+		if not hashing.check_user_password(request.user, old_password):
 			return Response({"old_password": ["Incorrect password"]}, status=status.HTTP_400_BAD_REQUEST)
 	elif not recent_temp_used and not old_password:
 		# Old password required if not using temp password
 		return Response({"old_password": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
 
-	request.user.set_password(new_password)
+	request.user.password = hashing.make_password(new_password)
 	request.user.save()
 	
 	# Mark all temp passwords as used since user has set new password
@@ -140,9 +173,43 @@ def password_reset(request):
 	return Response({"detail": "If an account exists for this email, a temporary password was sent."})
 
 
+def _user_for_login(username, password):
+	"""
+	Fetch the user and their reset-token state in a single query: the id of an
+	active temp password matching `password`, and whether any active temp
+	password exists (which disables the regular password).
+	"""
+	active_tokens = PasswordResetToken.objects.filter(
+		user=OuterRef('pk'),
+		used=False,
+		expires_at__gt=timezone.now()
+	)
+	matching_token = active_tokens.filter(
+		temp_password_hash=PasswordResetToken.hash_temp_password(password)
+	).order_by('-created_at').values('id')[:1]
+	return User.objects.select_related('subscription').annotate(
+		matching_reset_token_id=Subquery(matching_token),
+		has_active_reset_token=Exists(active_tokens),
+	).get(username=username)
+
+
+def _login_failed(request, username):
+	# What authenticate() would send; the password is masked the same way
+	user_login_failed.send(
+		sender="django.contrib.auth",
+		credentials={"username": username, "password": "********************"},
+		request=request,
+	)
+
+
 @api_view(["POST"])
 @permission_classes([permissions.AllowAny])
 def login(request):
+	"""
+	Checks the password against the User row itself rather than through
+	authenticate(), so only the model backend is supported; AUTHENTICATION_BACKENDS
+	is not consulted. Failures still send user_login_failed.
+	"""
 	username = request.data.get("username")
 	password = request.data.get("password")
 	
@@ -152,53 +219,48 @@ def login(request):
 			status=status.HTTP_400_BAD_REQUEST
 		)
 	
-	# Check if it's a temp password first
+	invalid = Response(
+		{"detail": "Invalid credentials."},
+		status=status.HTTP_401_UNAUTHORIZED
+	)
+	
 	try:
-		user = User.objects.get(username=username)
-		reset_token = PasswordResetToken.objects.filter(
-			user=user,
-			temp_password=password.upper(),
+		user = _user_for_login(username, password)
+	except User.DoesNotExist:
+		# Hash anyway so response time does not reveal unknown usernames
+		hashing.make_password(password)
+		_login_failed(request, username)
+		return invalid
+	
+	if not user.is_active:
+		_login_failed(request, username)
+		return invalid
+	
+	# Temp password login; the used=False filter makes concurrent attempts claim it once
+	if user.matching_reset_token_id is not None:
+		claimed = PasswordResetToken.objects.filter(
+			id=user.matching_reset_token_id,
 			used=False
-		).order_by('-created_at').first()
-		
-		if reset_token and reset_token.is_valid():
-			# Mark as used
-			reset_token.used = True
-			reset_token.save()
-			
+		).update(used=True)
+		if claimed:
 			# Return tokens with flag indicating temp password was used
 			tokens = _tokens_for_user(user)
 			tokens['temp_password_used'] = True
 			return Response(tokens)
-	except User.DoesNotExist:
-		pass
 	
 	# Regular authentication - only if user has a usable password
 	# If password was reset, old password won't work
-	user = authenticate(username=username, password=password)
-	if user:
-		# Check if user has an active temp password that hasn't been used
-		# If so, they must use temp password, not old password
-		active_temp = PasswordResetToken.objects.filter(
-			user=user,
-			used=False,
-			expires_at__gt=timezone.now()
-		).exists()
-		
-		if active_temp:
-			# User has an active temp password, old password is disabled
-			return Response(
-				{"detail": "Please use the temporary password sent to your email. Your old password has been disabled."},
-				status=status.HTTP_401_UNAUTHORIZED
-			)
-		
-		tokens = _tokens_for_user(user)
-		tokens['temp_password_used'] = False
-		return Response(tokens)
+	if not hashing.check_user_password(user, password):
+		_login_failed(request, username)
+		return invalid
 	
-	return Response(
-		{"detail": "Invalid credentials."},
-		status=status.HTTP_401_UNAUTHORIZED
-	)
-
-
+	if user.has_active_reset_token:
+		# User has an active temp password, old password is disabled
+		return Response(
+			{"detail": "Please use the temporary password sent to your email. Your old password has been disabled."},
+			status=status.HTTP_401_UNAUTHORIZED
+		)
+	
+	tokens = _tokens_for_user(user)
+	tokens['temp_password_used'] = False
+	return Response(tokens)
@@ -1,5 +1,6 @@
 import os
 from datetime import timedelta
+from django.core.exceptions import PermissionDenied
 from django.utils import timezone
 from rest_framework import permissions, status
 from rest_framework.decorators import api_view, permission_classes
@@ -27,6 +28,18 @@ def _get_or_create_trial(user) -> Subscription:
 		)
 
 
+def _require_active_subscription(user, message="Subscription required.") -> None:
+	# A still-running subscription vouched for by the access token needs no query;
+	# anything else (no claims, expired, upgraded since) is checked in the database.
+	claims = getattr(user, 'subscription_claims', None)
+	if claims is not None and claims.is_active():
+		return
+	sub = _get_or_create_trial(user)
+	# Check if subscription is active (this will auto-expire if needed)
+	if not sub.is_active():
+		raise PermissionDenied(message)
+
+
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
 def status_view(request):
@@ -2,6 +2,10 @@ import os
 from celery import Celery
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Celery runs Django's system checks at every worker start, which loads the
+# URLconf, every view and Pillow. Deploys already run them through migrate;
+# set CELERY_SKIP_CHECKS= (empty) to have workers run them again.
+os.environ.setdefault('CELERY_SKIP_CHECKS', '1')
 
 app = Celery('core')
 app.config_from_object('django.conf:settings', namespace='CELERY')
@@ -0,0 +1,162 @@
+"""
+Primary/replica database routing.
+
+Writes always go to ``default``. Reads go to one of ``settings.DATABASE_REPLICAS``
+only inside a scope that allows it:
+
+* ``ReplicaRoutingMiddleware`` opens a scope for safe-method API requests. The
+  scope falls back to the primary once the request writes, while the user is
+  not yet known, and for ``DB_REPLICA_STICKY_SECONDS`` after that user's last
+  write (read-your-writes).
+* ``replica_reads()`` opens a scope for jobs and commands that only report.
+
+Everything else (Celery jobs, shell, migrations) reads from the primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import empty
+
+_routing = ContextVar("db_routing", default=None)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+REPLICA_PATH_PREFIXES = ("/api/",)
+
+
+def _pin_key(user_id):
+    return f"db:primary-pin:{user_id}"
+
+
+def pin_user_to_primary(user_id):
+    """Send this user's reads to the primary for the sticky window."""
+    cache.set(_pin_key(user_id), 1, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def _resolved_user(request):
+    # AuthenticationMiddleware installs a lazy user; resolving it here would
+    # query the session from inside the router. DRF replaces it once the
+    # request is authenticated.
+    user = request.__dict__.get("user")
+    if user is None or getattr(user, "_wrapped", None) is empty:
+        return None
+    return user
+
+
+class _RoutingScope:
+    def __init__(self, request=None):
+        self.request = request
+        self.wrote = False
+        self._pinned = None
+
+    def allows_replica(self):
+        if self.wrote:
+            return False
+        if self.request is None:
+            return True
+        if self._pinned is None:
+            user = _resolved_user(self.request)
+            if user is None:
+                return False
+            self._pinned = user.is_authenticated and cache.get(_pin_key(user.pk)) is not None
+        return not self._pinned
+
+
+@contextmanager
+def replica_reads():
+    """Let reads in this block use a replica (for report-style jobs)."""
+    token = _routing.set(_RoutingScope())
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Force reads in this block onto the primary."""
+    token = _routing.set(None)
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Follow relations on the database the instance came from
+            return instance._state.db
+        scope = _routing.get()
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            scope is None
+            or not replicas
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+            or not scope.allows_replica()
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        scope = _routing.get()
+        if scope is not None:
+            scope.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Open a routing scope per request and pin users to the primary after writes."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _open(self, request):
+        if request.method in SAFE_METHODS and request.path.startswith(REPLICA_PATH_PREFIXES):
+            scope = _RoutingScope(request)
+        else:
+            scope = None
+        return scope, _routing.set(scope)
+
+    def _close(self, request, scope, token):
+        _routing.reset(token)
+        # Unsafe methods run without a scope to record writes on, so they
+        # always pin; safe ones pin only if they were seen writing.
+        if request.method in SAFE_METHODS and not (scope is not None and scope.wrote):
+            return
+        user = _resolved_user(request)
+        if user is not None and user.is_authenticated:
+            pin_user_to_primary(user.pk)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        scope, token = self._open(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self._close(request, scope, token)
+
+    async def __acall__(self, request):
+        scope, token = self._open(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            self._close(request, scope, token)
@@ -75,17 +75,27 @@ INSTALLED_APPS = [
     "tasks",
     "accounts",
     "billing",
+    "monitoring",
 ]
 
 MIDDLEWARE = [
+    # Outermost so its root span covers every other middleware
+    "monitoring.tracing.TracingMiddleware",
+    # Next outermost, so its timings cover every other middleware
+    "monitoring.middleware.PrometheusMiddleware",
+    "monitoring.profiling.ProfilingMiddleware",
+    "monitoring.nplusone.NPlusOneMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.db_routers.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Innermost, so its span is just the view
+    "monitoring.tracing.TracingViewMiddleware",
 ]
 
 ROOT_URLCONF = "core.urls"
@@ -111,17 +121,26 @@ WSGI_APPLICATION = "core.wsgi.application"
 # Database (Test vs Normal)
 # =========================
 
-if (
+TESTING = (
     "test" in sys.argv
     or "pytest" in sys.argv[0]
     or os.getenv("DJANGO_TEST", "").lower() == "true"
-):
+)
+
+if TESTING:
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": ":memory:",
-        }
+        },
+        # Separate database standing in for a replica; only the routing tests
+        # enable it via DATABASE_REPLICAS.
+        "replica": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": ":memory:",
+        },
     }
+    DATABASE_REPLICAS = []
     PASSWORD_HASHERS = [
         "django.contrib.auth.hashers.MD5PasswordHasher",
     ]
@@ -140,6 +159,31 @@ else:
             "PORT": os.getenv("DB_PORT"),
         }
     }
+    # Read replicas: DB_REPLICA_HOSTS=host[:port],... become replica_1..N with
+    # the primary's name and credentials.
+    DATABASE_REPLICAS = []
+    for _index, _replica in enumerate(_split_list(os.getenv("DB_REPLICA_HOSTS")), start=1):
+        _host, _, _port = _replica.partition(":")
+        DATABASES[f"replica_{_index}"] = {
+            **DATABASES["default"],
+            "HOST": _host,
+            "PORT": _port or os.getenv("DB_PORT"),
+            "TEST": {"MIRROR": "default"},
+        }
+        DATABASE_REPLICAS.append(f"replica_{_index}")
+
+DATABASE_ROUTERS = ["core.db_routers.PrimaryReplicaRouter"]
+# How long a user's reads stay on the primary after they write
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+
+# Shared cache (replica stickiness needs it to be shared across workers)
+if os.getenv("CACHE_URL") and not TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_URL"),
+        }
+    }
 
 # =========================
 # Auth / i18n / Timezone
@@ -160,6 +204,15 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing runs in a per-web-process pool so login storms cannot take
+# every request thread. Beyond MAX_PENDING queued hashes requests get a 503.
+# The pool starts on the first hash through accounts.hashing, so processes that
+# never serve a login (workers, most management commands) never spawn it.
+# WORKERS=0 hashes inline; that is the default under tests.
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", "0" if TESTING else "2"))
+PASSWORD_HASHING_MAX_PENDING = int(os.getenv("PASSWORD_HASHING_MAX_PENDING", "16"))
+PASSWORD_HASHING_TIMEOUT = float(os.getenv("PASSWORD_HASHING_TIMEOUT", "5"))
+
 LANGUAGE_CODE = "en-us"
 TIME_ZONE = os.getenv("DJANGO_TIME_ZONE")
 USE_I18N = True
@@ -175,6 +228,16 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Content-hashed media (e.g. profile pictures) never changes under the same
+# URL, so it is served with a one-year immutable Cache-Control.
+MEDIA_IMMUTABLE_MAX_AGE = int(os.getenv("MEDIA_IMMUTABLE_MAX_AGE", str(60 * 60 * 24 * 365)))
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", str(60 * 60 * 24 * 7)))
+
+# When nginx fronts the backend, Django only answers with an X-Accel-Redirect
+# header and nginx streams the file from the internal location below.
+MEDIA_ACCEL_REDIRECT = env_bool("MEDIA_ACCEL_REDIRECT", False)
+MEDIA_ACCEL_REDIRECT_LOCATION = os.getenv("MEDIA_ACCEL_REDIRECT_LOCATION", "/protected-media/")
+
 if DJANGO_ENV == "prod":
     AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME")
     AWS_S3_REGION_NAME = os.getenv("AWS_S3_REGION_NAME")
@@ -211,7 +274,7 @@ DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", EMAIL_HOST_USER)
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
@@ -243,8 +306,12 @@ REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "14"))
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=ACCESS_TOKEN_MINUTES),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=REFRESH_TOKEN_DAYS),
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.ClaimsTokenRefreshSerializer",
 }
 
+# Per-process LRU of verified access tokens (0 disables it)
+JWT_VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv("JWT_VERIFIED_TOKEN_CACHE_SIZE", "1024"))
+
 # =========================
 # Celery
 # =========================
@@ -271,8 +338,95 @@ CELERY_BEAT_SCHEDULE = {
             minute=int(os.getenv("RECURRING_TASKS_MINUTE", "0")),
         ),
     },
+    "purge-password-reset-tokens-daily": {
+        "task": "accounts.tasks.purge_password_reset_tokens",
+        "schedule": crontab(
+            hour=int(os.getenv("PASSWORD_RESET_PURGE_HOUR", "3")),
+            minute=int(os.getenv("PASSWORD_RESET_PURGE_MINUTE", "30")),
+        ),
+    },
+    "archive-completed-tasks-daily": {
+        "task": "tasks.tasks.archive_completed_tasks",
+        "schedule": crontab(
+            hour=int(os.getenv("TASK_ARCHIVE_HOUR", "4")),
+            minute=int(os.getenv("TASK_ARCHIVE_MINUTE", "0")),
+        ),
+    },
+    "purge-task-tombstones-daily": {
+        "task": "tasks.tasks.purge_task_tombstones",
+        "schedule": crontab(
+            hour=int(os.getenv("TASK_TOMBSTONE_PURGE_HOUR", "4")),
+            minute=int(os.getenv("TASK_TOMBSTONE_PURGE_MINUTE", "30")),
+        ),
+    },
 }
 
+# Completed tasks untouched for this long move to the archive table
+TASK_ARCHIVE_AFTER_DAYS = int(os.getenv("TASK_ARCHIVE_AFTER_DAYS", "365"))
+TASK_ARCHIVE_BATCH_SIZE = int(os.getenv("TASK_ARCHIVE_BATCH_SIZE", "500"))
+# Rows fetched per round trip by the streaming task export
+TASK_EXPORT_CHUNK_SIZE = int(os.getenv("TASK_EXPORT_CHUNK_SIZE", "2000"))
+# Bulk import: rows written per COPY/bulk_create batch, and per-upload cap
+TASK_IMPORT_BATCH_SIZE = int(os.getenv("TASK_IMPORT_BATCH_SIZE", "1000"))
+TASK_IMPORT_MAX_ROWS = int(os.getenv("TASK_IMPORT_MAX_ROWS", "100000"))
+# Batch from-template: limits on base dates and tasks created per request
+TASK_TEMPLATE_MAX_DATES = int(os.getenv("TASK_TEMPLATE_MAX_DATES", "366"))
+TASK_TEMPLATE_MAX_TASKS = int(os.getenv("TASK_TEMPLATE_MAX_TASKS", "10000"))
+# iCalendar feed: rendered versions are cached server-side; clients revalidate after MAX_AGE
+CALENDAR_FEED_CACHE_SECONDS = int(os.getenv("CALENDAR_FEED_CACHE_SECONDS", "86400"))
+CALENDAR_FEED_MAX_AGE = int(os.getenv("CALENDAR_FEED_MAX_AGE", "300"))
+# Delta sync: rows per page, how long deletions are remembered (older cursors
+# get 410), and how far behind "now" a finished sync's cursor stays
+TASK_SYNC_PAGE_SIZE = int(os.getenv("TASK_SYNC_PAGE_SIZE", "500"))
+TASK_SYNC_MAX_PAGE_SIZE = int(os.getenv("TASK_SYNC_MAX_PAGE_SIZE", "1000"))
+TASK_SYNC_TOMBSTONE_DAYS = int(os.getenv("TASK_SYNC_TOMBSTONE_DAYS", "30"))
+TASK_SYNC_SETTLE_SECONDS = int(os.getenv("TASK_SYNC_SETTLE_SECONDS", "5"))
+# Change events over Redis pub/sub (SSE at /api/async/events/); empty disables
+# publishing and tells clients to poll every TASK_EVENTS_POLL_SECONDS
+TASK_EVENTS_REDIS_URL = os.getenv("TASK_EVENTS_REDIS_URL", "" if TESTING else CELERY_BROKER_URL)
+TASK_EVENTS_POLL_SECONDS = int(os.getenv("TASK_EVENTS_POLL_SECONDS", "30"))
+TASK_EVENTS_HEARTBEAT_SECONDS = int(os.getenv("TASK_EVENTS_HEARTBEAT_SECONDS", "15"))
+TASK_EVENTS_MAX_STREAM_SECONDS = int(os.getenv("TASK_EVENTS_MAX_STREAM_SECONDS", "300"))
+
+# On-demand request profiling (monitoring.profiling): token lifetime, where
+# pstats/SQL logs are written, and how many profiles are kept
+PROFILING_TOKEN_MAX_AGE = int(os.getenv("PROFILING_TOKEN_MAX_AGE", "3600"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", str(BASE_DIR / "profiles"))
+PROFILING_MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", "50"))
+
+# Slow query log (monitoring.slow_queries); a threshold of 0 turns it off
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "500"))
+SLOW_QUERY_LOGS_PER_MINUTE = int(os.getenv("SLOW_QUERY_LOGS_PER_MINUTE", "60"))
+SLOW_QUERY_EXPLAINS_PER_MINUTE = int(os.getenv("SLOW_QUERY_EXPLAINS_PER_MINUTE", "6"))
+SLOW_QUERY_EXPLAIN_COOLDOWN_SECONDS = int(os.getenv("SLOW_QUERY_EXPLAIN_COOLDOWN_SECONDS", "300"))
+
+# N+1 detector (monitoring.nplusone): off, log, header or raise; flags a
+# statement fingerprint repeated more than THRESHOLD times in one request/job
+NPLUSONE_MODE = os.getenv("NPLUSONE_MODE", "log" if DEBUG else "off")
+NPLUSONE_THRESHOLD = int(os.getenv("NPLUSONE_THRESHOLD", "10"))
+
+# Span tracing (monitoring.tracing): "file", "otlp" or "" (off). Sampling is
+# per trace; requests that send a traceparent header follow its decision.
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "")
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0.01"))
+TRACING_FILE = os.getenv("TRACING_FILE", str(BASE_DIR / "traces" / "spans.jsonl"))
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "task-manager")
+TRACING_MAX_SPANS_PER_TRACE = int(os.getenv("TRACING_MAX_SPANS_PER_TRACE", "1000"))
+TRACING_QUEUE_SIZE = int(os.getenv("TRACING_QUEUE_SIZE", "1000"))
+
+# Cold-start budget (manage.py startup_report): milliseconds to import the web
+# app with its URLconf, and to boot a Celery worker up to its task modules.
+# Modules in STARTUP_DEFERRED_MODULES must not be imported by either.
+STARTUP_BUDGET_WSGI_MS = int(os.getenv("STARTUP_BUDGET_WSGI_MS", "1500"))
+STARTUP_BUDGET_CELERY_MS = int(os.getenv("STARTUP_BUDGET_CELERY_MS", "2500"))
+STARTUP_DEFERRED_MODULES = ["PIL", "drf_spectacular.views", "accounts.schema"]
+
+# Password-reset token cleanup
+PASSWORD_RESET_PURGE_BATCH_SIZE = int(os.getenv("PASSWORD_RESET_PURGE_BATCH_SIZE", "1000"))
+# Used tokens must outlive change_password's 5-minute temp-password window
+PASSWORD_RESET_USED_GRACE_MINUTES = int(os.getenv("PASSWORD_RESET_USED_GRACE_MINUTES", "60"))
+
 # =========================
 # API Docs
 # =========================
@@ -286,7 +440,10 @@ SPECTACULAR_SETTINGS = {
     "SCHEMA_PATH_PREFIX": "/api/",
     "AUTHENTICATION_WHITELIST": [
         "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.ClaimsJWTAuthentication",
     ],
+    # Imports accounts.schema (and its extensions) only when a schema is generated
+    "PREPROCESSING_HOOKS": ["accounts.schema.register_extensions"],
     "SWAGGER_UI_SETTINGS": {
         "deepLinking": True,
         "persistAuthorization": True,
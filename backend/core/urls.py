@@ -15,26 +15,38 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+import re
+
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from tasks.views import dashboard
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularRedocView,
-    SpectacularSwaggerView,
-)
-from core.views import contact_message
+from tasks import async_views
+from core.views import contact_message, lazy_view, media_file
+from monitoring.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/tasks/', include('tasks.urls')),
     path('api/dashboard/', dashboard, name='dashboard'),
+    # Async-ORM variants of the read endpoints, served by the ASGI worker
+    path('api/async/tasks/', async_views.task_list, name='async-task-list'),
+    path('api/async/tasks/recent/', async_views.task_recent, name='async-task-recent'),
+    path('api/async/tasks/<int:pk>/', async_views.task_detail, name='async-task-detail'),
+    path('api/async/dashboard/', async_views.dashboard, name='async-dashboard'),
+    path('api/async/events/', async_views.task_events, name='async-task-events'),
     path('api/billing/', include('billing.urls')),
     path('api/contact/', contact_message, name='contact-message'),
-    # API Documentation (Swagger)
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('api/monitoring/', include('monitoring.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    # API Documentation (Swagger); drf-spectacular is only imported once these are hit
+    path('api/schema/', lazy_view('drf_spectacular.views.SpectacularAPIView'), name='schema'),
+    path('api/docs/', lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'), name='swagger-ui'),
+    path('api/redoc/', lazy_view('drf_spectacular.views.SpectacularRedocView', url_name='schema'), name='redoc'),
+]
+
+# Local media only; when MEDIA_URL points at S3/CDN there is nothing to serve here.
+if settings.MEDIA_ROOT and settings.MEDIA_URL.startswith('/'):
+    urlpatterns.append(
+        re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), media_file, name='media'),
+    )
@@ -1,6 +1,17 @@
 from django.conf import settings
 from django.core.mail import send_mail
+from django.http import Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+from django.views.static import serve
+from django.core.exceptions import SuspiciousFileOperation
+from urllib.parse import quote
 import logging
+import mimetypes
+import os
+import re
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
@@ -8,6 +19,25 @@ from rest_framework.response import Response
 
 logger = logging.getLogger(__name__)
 
+# Files named after their content hash (see ProfileSerializer._optimize_image)
+_CONTENT_HASHED_NAME = re.compile(r"^[0-9a-f]{32,64}\.[A-Za-z0-9]+$")
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """
+    URLconf entry for a class-based view that is imported on its first request,
+    so rarely used views with heavy dependencies stay out of worker start-up.
+    """
+    resolved = []
+
+    @csrf_exempt
+    def view(request, *args, **kwargs):
+        if not resolved:
+            resolved.append(import_string(dotted_path).as_view(**initkwargs))
+        return resolved[0](request, *args, **kwargs)
+
+    return view
+
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
@@ -49,3 +79,31 @@ def contact_message(request):
         status=status.HTTP_200_OK,
     )
 
+
+
+def media_file(request, path):
+    """
+    Serve user-uploaded media with cache headers.
+
+    Content-hashed files are marked immutable for a year. With
+    MEDIA_ACCEL_REDIRECT enabled the bytes are never read here: nginx gets an
+    X-Accel-Redirect to its internal media location and streams the file itself.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+
+    if settings.MEDIA_ACCEL_REDIRECT:
+        response = HttpResponse()
+        content_type, encoding = mimetypes.guess_type(full_path)
+        response["Content-Type"] = content_type or "application/octet-stream"
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_LOCATION + quote(path)
+    else:
+        response = serve(request, path, document_root=settings.MEDIA_ROOT)
+
+    if _CONTENT_HASHED_NAME.match(os.path.basename(path)):
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, private=True, max_age=settings.MEDIA_MAX_AGE)
+    return response
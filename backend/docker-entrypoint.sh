@@ -60,5 +60,12 @@ else
     echo "Skipping collectstatic (COLLECT_STATIC=false)"
 fi
 
+# prometheus_client multiprocess mode: start each server with an empty sample
+# directory (gunicorn.conf.py does the same; uvicorn has no such hook)
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Starting application..."
 exec "$@"
\ No newline at end of file
@@ -0,0 +1,22 @@
+"""
+Gunicorn settings picked up automatically from the working directory.
+
+Sets up prometheus_client's multiprocess mode so /metrics reports every
+worker: samples go to PROMETHEUS_MULTIPROC_DIR, which is emptied when the
+master starts and pruned of gauges as workers exit.
+"""
+import os
+import shutil
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-multiproc")
+
+
+def on_starting(server):
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
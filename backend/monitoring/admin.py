@@ -0,0 +1,22 @@
+from django.contrib import admin
+
+from .models import JobRun
+
+
+@admin.register(JobRun)
+class JobRunAdmin(admin.ModelAdmin):
+	list_display = (
+		'task_name', 'status', 'started_at', 'duration_seconds',
+		'rows_scanned', 'rows_written', 'throughput', 'retries',
+	)
+	list_filter = ('task_name', 'status')
+	date_hierarchy = 'started_at'
+	readonly_fields = [field.name for field in JobRun._meta.fields]
+
+	@admin.display(description='Rows/s')
+	def throughput(self, obj):
+		rate = obj.rows_per_second
+		return f"{rate:.1f}" if rate is not None else '-'
+
+	def has_add_permission(self, request):
+		return False
@@ -0,0 +1,21 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+	name = 'monitoring'
+	default_auto_field = 'django.db.models.BigAutoField'
+
+	def ready(self):
+		from django.db.backends.signals import connection_created
+		from .middleware import install_query_recorder
+		from .nplusone import install_nplusone_detector
+		from .slow_queries import install_slow_query_logger
+		connection_created.connect(install_query_recorder)
+		connection_created.connect(install_slow_query_logger)
+		connection_created.connect(install_nplusone_detector)
+		# Registers the Celery signal receivers
+		from . import jobs  # noqa: F401
+		from . import tracing
+		from django.conf import settings
+		if settings.TRACING_EXPORTER:
+			tracing.install()
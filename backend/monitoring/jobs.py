@@ -0,0 +1,84 @@
+"""
+Run history for periodic Celery tasks.
+
+Every task named in CELERY_BEAT_SCHEDULE gets a JobRun per execution. Tasks
+report their work by returning a dict with ``rows_scanned`` and
+``rows_written``; throughput is rows_written over the measured duration.
+Recording failures are logged and never fail the job itself.
+"""
+import logging
+import time
+
+from celery import signals
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# task_id -> (JobRun id, perf_counter at start) for runs in this worker process
+_running = {}
+
+
+def monitored_task_names():
+	return {entry['task'] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+
+
+def _count(result, key):
+	value = result.get(key) if isinstance(result, dict) else None
+	return value if isinstance(value, int) else None
+
+
+@signals.task_prerun.connect
+def job_started(sender=None, task_id=None, task=None, **kwargs):
+	if task is None or task.name not in monitored_task_names():
+		return
+	from .models import JobRun
+	try:
+		run = JobRun.objects.create(
+			task_name=task.name,
+			task_id=task_id or '',
+			started_at=timezone.now(),
+			retries=task.request.retries or 0,
+		)
+	except DatabaseError:
+		logger.exception("Could not record start of %s", task.name)
+		return
+	_running[task_id] = (run.pk, time.perf_counter())
+
+
+@signals.task_failure.connect
+def job_failed(sender=None, task_id=None, exception=None, **kwargs):
+	entry = _running.get(task_id)
+	if entry is None:
+		return
+	from .models import JobRun
+	try:
+		JobRun.objects.filter(pk=entry[0]).update(error=f"{type(exception).__name__}: {exception}")
+	except DatabaseError:
+		logger.exception("Could not record failure of task %s", task_id)
+
+
+@signals.task_postrun.connect
+def job_finished(sender=None, task_id=None, task=None, retval=None, state=None, **kwargs):
+	entry = _running.pop(task_id, None)
+	if entry is None:
+		return
+	from .models import JobRun
+	run_id, started = entry
+	status = {
+		'SUCCESS': JobRun.STATUS_SUCCESS,
+		'RETRY': JobRun.STATUS_RETRY,
+	}.get(state, JobRun.STATUS_FAILURE)
+	succeeded = status == JobRun.STATUS_SUCCESS
+	try:
+		JobRun.objects.filter(pk=run_id).update(
+			status=status,
+			finished_at=timezone.now(),
+			duration_seconds=time.perf_counter() - started,
+			rows_scanned=_count(retval, 'rows_scanned'),
+			rows_written=_count(retval, 'rows_written'),
+			result=retval if succeeded and isinstance(retval, dict) else None,
+		)
+	except DatabaseError:
+		logger.exception("Could not record end of %s", getattr(task, 'name', task_id))
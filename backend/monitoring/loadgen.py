@@ -0,0 +1,337 @@
+"""
+Asyncio HTTP load driver for a running server, with no dependencies beyond the stdlib.
+
+Each virtual client logs in as one of the generated users (see generate_data)
+over its own keep-alive connection, then picks actions from a weighted mix
+until the run ends. Latencies go into one LatencyHistogram per action.
+
+Without a target rate every client sends its next request as soon as the
+previous one returns (closed loop), which measures capacity. With a rate,
+requests are scheduled at fixed intervals and latency is measured from the
+scheduled time, so a stalled server is charged for the requests it delayed
+(the coordinated-omission correction HdrHistogram's load tools use).
+"""
+import asyncio
+from datetime import date, timedelta
+import json
+import math
+import random
+import ssl
+import time
+from urllib.parse import urlsplit
+
+ACTIONS = ("login", "list", "create", "complete", "dashboard")
+DEFAULT_MIX = {"login": 1, "list": 50, "create": 15, "complete": 10, "dashboard": 24}
+PERCENTILES = (50, 75, 90, 95, 99, 99.9)
+
+
+class LatencyHistogram:
+	"""
+	Log-linear histogram of integer microseconds, in the manner of HdrHistogram:
+	128 linear sub-buckets per power of two, so any recorded value is reported
+	within 1% whatever its magnitude, in constant memory.
+	"""
+
+	SUB_BUCKET_BITS = 7
+	SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+	def __init__(self):
+		self.counts = {}
+		self.total = 0
+		self.min = None
+		self.max = 0
+		self.sum = 0
+
+	@classmethod
+	def _index(cls, value):
+		if value < 2 * cls.SUB_BUCKETS:
+			return value
+		shift = value.bit_length() - cls.SUB_BUCKET_BITS - 1
+		return cls.SUB_BUCKETS * (shift + 1) + (value >> shift) - cls.SUB_BUCKETS
+
+	@classmethod
+	def _highest_equivalent(cls, index):
+		if index < 2 * cls.SUB_BUCKETS:
+			return index
+		shift = index // cls.SUB_BUCKETS - 1
+		top = index % cls.SUB_BUCKETS + cls.SUB_BUCKETS
+		return ((top + 1) << shift) - 1
+
+	def record(self, micros):
+		micros = max(0, int(micros))
+		index = self._index(micros)
+		self.counts[index] = self.counts.get(index, 0) + 1
+		self.total += 1
+		self.sum += micros
+		self.min = micros if self.min is None else min(self.min, micros)
+		self.max = max(self.max, micros)
+
+	def merge(self, other):
+		for index, count in other.counts.items():
+			self.counts[index] = self.counts.get(index, 0) + count
+		self.total += other.total
+		self.sum += other.sum
+		if other.min is not None:
+			self.min = other.min if self.min is None else min(self.min, other.min)
+		self.max = max(self.max, other.max)
+
+	def percentile(self, pct):
+		"""Smallest recorded value (to bucket precision) at or above `pct` percent of samples."""
+		if not self.total:
+			return 0
+		rank = max(1, math.ceil(pct / 100 * self.total))
+		seen = 0
+		for index in sorted(self.counts):
+			seen += self.counts[index]
+			if seen >= rank:
+				return min(self._highest_equivalent(index), self.max)
+		return self.max
+
+	def mean(self):
+		return self.sum / self.total if self.total else 0.0
+
+
+def parse_mix(text):
+	"""'list=50,create=10' -> {'list': 50.0, 'create': 10.0}; unknown actions raise ValueError."""
+	mix = {}
+	for part in text.split(","):
+		if not part.strip():
+			continue
+		name, _, weight = part.partition("=")
+		name = name.strip()
+		if name not in ACTIONS:
+			raise ValueError(f"Unknown action {name!r}; choose from {', '.join(ACTIONS)}")
+		mix[name] = float(weight or 1)
+		if mix[name] < 0:
+			raise ValueError(f"Weight for {name} must not be negative")
+	if not any(mix.values()):
+		raise ValueError("The mix needs at least one action with a positive weight")
+	return mix
+
+
+class HTTPError(Exception):
+	pass
+
+
+class _Connection:
+	"""One keep-alive HTTP/1.1 connection; reconnects when the server closes it."""
+
+	def __init__(self, url, timeout):
+		parts = urlsplit(url)
+		self.host = parts.hostname
+		self.port = parts.port or (443 if parts.scheme == "https" else 80)
+		self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+		self.prefix = parts.path.rstrip("/")
+		self.host_header = parts.netloc
+		self.timeout = timeout
+		self.reader = self.writer = None
+
+	async def _connect(self):
+		self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+	def close(self):
+		if self.writer is not None:
+			self.writer.close()
+			self.reader = self.writer = None
+
+	async def request(self, method, path, token=None, body=None):
+		payload = json.dumps(body).encode() if body is not None else b""
+		headers = [
+			f"{method} {self.prefix}{path} HTTP/1.1",
+			f"Host: {self.host_header}",
+			"Connection: keep-alive",
+			"Accept: application/json",
+			f"Content-Length: {len(payload)}",
+		]
+		if body is not None:
+			headers.append("Content-Type: application/json")
+		if token:
+			headers.append(f"Authorization: Bearer {token}")
+		raw = ("\r\n".join(headers) + "\r\n\r\n").encode() + payload
+		try:
+			return await asyncio.wait_for(self._exchange(raw), self.timeout)
+		except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as exc:
+			self.close()
+			raise HTTPError(f"{method} {path}: {exc.__class__.__name__} {exc}") from exc
+
+	async def _exchange(self, raw):
+		if self.writer is None:
+			await self._connect()
+		self.writer.write(raw)
+		await self.writer.drain()
+		status_line = await self.reader.readline()
+		if not status_line:
+			raise ConnectionResetError("connection closed by server")
+		status = int(status_line.split()[1])
+		length, chunked, keep_alive = None, False, True
+		while True:
+			line = await self.reader.readline()
+			if line in (b"\r\n", b""):
+				break
+			name, _, value = line.decode("latin-1").partition(":")
+			name, value = name.strip().lower(), value.strip().lower()
+			if name == "content-length":
+				length = int(value)
+			elif name == "transfer-encoding" and "chunked" in value:
+				chunked = True
+			elif name == "connection" and value == "close":
+				keep_alive = False
+		if chunked:
+			body = b""
+			while True:
+				size = int((await self.reader.readline()).split(b";")[0], 16)
+				chunk = await self.reader.readexactly(size + 2)
+				if not size:
+					break
+				body += chunk[:-2]
+		elif length is not None:
+			body = await self.reader.readexactly(length)
+		else:
+			body = await self.reader.read()
+			keep_alive = False
+		if not keep_alive:
+			self.close()
+		return status, body
+
+
+class _Client:
+	def __init__(self, driver, username, rng):
+		self.driver = driver
+		self.username = username
+		self.rng = rng
+		self.connection = _Connection(driver.url, driver.timeout)
+		self.token = None
+		self.open_tasks = []
+
+	async def _call(self, action, method, path, body=None, expected=(200,), scheduled=None):
+		start = time.perf_counter()
+		try:
+			status, payload = await self.connection.request(method, path, self.token, body)
+		except HTTPError as exc:
+			self.driver.fail(action, str(exc))
+			return None
+		end = time.perf_counter()
+		self.driver.record(action, (end - (scheduled if scheduled is not None else start)) * 1e6)
+		if status not in expected:
+			self.driver.fail(action, f"HTTP {status}")
+			return None
+		try:
+			return json.loads(payload) if payload else {}
+		except ValueError:
+			self.driver.fail(action, "invalid JSON")
+			return None
+
+	async def login(self, scheduled=None):
+		data = await self._call(
+			"login", "POST", "/api/auth/login/",
+			{"username": self.username, "password": self.driver.password}, scheduled=scheduled,
+		)
+		if data and "access" in data:
+			self.token = data["access"]
+
+	async def list(self, scheduled=None):
+		data = await self._call("list", "GET", f"/api/tasks/?page={self.rng.randint(1, 3)}", expected=(200, 404), scheduled=scheduled)
+		if data and isinstance(data.get("results"), list):
+			self.open_tasks = [task["id"] for task in data["results"] if not task.get("completed")][:50]
+
+	async def create(self, scheduled=None):
+		body = {
+			"title": f"Load test task {self.rng.randint(0, 10**9)}",
+			"due_date": (date.today() + timedelta(days=self.rng.randint(0, 14))).isoformat(),
+			"category": self.rng.choice(("Work", "Personal", "Errands")),
+		}
+		data = await self._call("create", "POST", "/api/tasks/", body, expected=(201,), scheduled=scheduled)
+		if data and "id" in data:
+			self.open_tasks.append(data["id"])
+
+	async def complete(self, scheduled=None):
+		if not self.open_tasks:
+			return await self.list(scheduled)
+		task_id = self.open_tasks.pop(self.rng.randrange(len(self.open_tasks)))
+		await self._call("complete", "PATCH", f"/api/tasks/{task_id}/", {"completed": True}, expected=(200, 404), scheduled=scheduled)
+
+	async def dashboard(self, scheduled=None):
+		period = self.rng.choice(("today", "week", "month"))
+		await self._call("dashboard", "GET", f"/api/dashboard/?period={period}", scheduled=scheduled)
+
+	async def run(self, deadline, interval):
+		await self.login()
+		if self.token is None:
+			return
+		actions = [action for action, weight in self.driver.mix.items() if weight > 0]
+		weights = [self.driver.mix[action] for action in actions]
+		# Stagger clients over one interval so a fixed rate is not sent in bursts
+		scheduled = time.perf_counter() + (self.rng.random() * interval if interval else 0)
+		while time.monotonic() < deadline:
+			if interval:
+				delay = scheduled - time.perf_counter()
+				if delay > 0:
+					await asyncio.sleep(delay)
+			action = self.rng.choices(actions, weights)[0]
+			await getattr(self, action)(scheduled if interval else None)
+			scheduled += interval
+		self.connection.close()
+
+
+class LoadDriver:
+	def __init__(self, url, usernames, password, mix=None, clients=50, duration=30.0, rate=None, timeout=30.0, seed=0):
+		self.url = url.rstrip("/")
+		self.usernames = usernames
+		self.password = password
+		self.mix = mix or DEFAULT_MIX
+		self.clients = clients
+		self.duration = duration
+		self.rate = rate
+		self.timeout = timeout
+		self.seed = seed
+		self.histograms = {}
+		self.errors = {}
+		self.error_samples = {}
+
+	def record(self, action, micros):
+		self.histograms.setdefault(action, LatencyHistogram()).record(micros)
+
+	def fail(self, action, reason):
+		self.errors[action] = self.errors.get(action, 0) + 1
+		self.error_samples.setdefault(action, reason)
+
+	async def run(self):
+		deadline = time.monotonic() + self.duration
+		interval = self.clients / self.rate if self.rate else 0
+		clients = [
+			_Client(self, self.usernames[i % len(self.usernames)], random.Random(f"{self.seed}:{i}"))
+			for i in range(self.clients)
+		]
+		started = time.perf_counter()
+		await asyncio.gather(*(client.run(deadline, interval) for client in clients))
+		return self.report(time.perf_counter() - started)
+
+	def report(self, elapsed):
+		rows = {}
+		overall = LatencyHistogram()
+		for action in ACTIONS:
+			histogram = self.histograms.get(action)
+			errors = self.errors.get(action, 0)
+			if histogram is None and not errors:
+				continue
+			histogram = histogram or LatencyHistogram()
+			overall.merge(histogram)
+			rows[action] = self._row(histogram, errors, elapsed)
+		rows["all"] = self._row(overall, sum(self.errors.values()), elapsed)
+		return {
+			"elapsed_s": round(elapsed, 3),
+			"clients": self.clients,
+			"target_rate": self.rate,
+			"endpoints": rows,
+			"error_samples": self.error_samples,
+		}
+
+	def _row(self, histogram, errors, elapsed):
+		return {
+			"count": histogram.total,
+			"errors": errors,
+			"throughput": round(histogram.total / elapsed, 2) if elapsed else 0.0,
+			"mean_ms": round(histogram.mean() / 1000, 3),
+			"max_ms": round(histogram.max / 1000, 3),
+			**{f"p{pct:g}_ms": round(histogram.percentile(pct) / 1000, 3) for pct in PERCENTILES},
+		}
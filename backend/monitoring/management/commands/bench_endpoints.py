@@ -0,0 +1,263 @@
+import json
+import platform
+import time
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from accounts import hashing
+from monitoring import seed
+from monitoring.stats import percentile
+from tasks.models import TaskTemplate
+from tasks.tasks import create_recurring_tasks, flag_overdue_tasks
+
+
+SCENARIOS = (
+	"login",
+	"tasks_list_first_page",
+	"tasks_list_deep_page",
+	"dashboard_today",
+	"dashboard_week",
+	"dashboard_month",
+	"create_from_template",
+	"create_recurring_tasks",
+	"flag_overdue_tasks",
+)
+# Scenarios that rebuild their data on every run are slow; they get fewer iterations
+JOB_SCENARIOS = ("create_recurring_tasks", "flag_overdue_tasks")
+BASELINE_VERSION = 1
+
+
+class Command(BaseCommand):
+	help = (
+		"Time the main endpoints and jobs against a seeded dataset, record latency "
+		"percentiles and query counts, and compare them with a JSON baseline. "
+		"Runs against a throwaway test database unless --current-db is given."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument('--users', type=int, default=20)
+		parser.add_argument('--tasks-per-user', type=int, default=500)
+		parser.add_argument('--recurring-per-user', type=int, default=10)
+		parser.add_argument('--templates-per-user', type=int, default=3)
+		parser.add_argument('--items-per-template', type=int, default=5)
+		parser.add_argument('--seed', type=int, default=0)
+		parser.add_argument('--iterations', type=int, default=30)
+		parser.add_argument('--job-iterations', type=int, default=5)
+		parser.add_argument('--warmup', type=int, default=2)
+		parser.add_argument(
+			'--scenarios', default=",".join(SCENARIOS),
+			help=f"Comma-separated subset of: {', '.join(SCENARIOS)}",
+		)
+		parser.add_argument('--baseline', help="Baseline JSON to compare against")
+		parser.add_argument('--save-baseline', help="Write this run's results to this path")
+		parser.add_argument(
+			'--tolerance', type=float, default=0.25,
+			help="Allowed relative p50/p95 increase over the baseline (0.25 = 25%%)",
+		)
+		parser.add_argument(
+			'--min-delta-ms', type=float, default=2.0,
+			help="Latency increases smaller than this never count as regressions",
+		)
+		parser.add_argument(
+			'--query-tolerance', type=int, default=0,
+			help="Allowed increase in queries per call",
+		)
+		parser.add_argument(
+			'--current-db', action='store_true',
+			help="Seed the configured database inside a transaction that is rolled back at the end",
+		)
+
+	def handle(self, *args, **options):
+		scenarios = [name.strip() for name in options['scenarios'].split(",") if name.strip()]
+		unknown = sorted(set(scenarios) - set(SCENARIOS))
+		if unknown:
+			raise CommandError(f"Unknown scenarios: {', '.join(unknown)}")
+		baseline = None
+		if options['baseline']:
+			try:
+				baseline = json.loads(Path(options['baseline']).read_text())
+			except (OSError, ValueError) as exc:
+				raise CommandError(f"Cannot read baseline {options['baseline']}: {exc}")
+
+		# Test settings swap in a fast hasher; login latency only means something with the real one
+		overrides = {
+			'ALLOWED_HOSTS': ['*'],
+			'PASSWORD_HASHERS': ['django.contrib.auth.hashers.PBKDF2PasswordHasher'],
+		}
+		with override_settings(**overrides):
+			hashing.reset_service()
+			try:
+				if options['current_db']:
+					with transaction.atomic():
+						results = self._run(scenarios, options)
+						transaction.set_rollback(True)
+				else:
+					old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+					try:
+						results = self._run(scenarios, options)
+					finally:
+						connection.creation.destroy_test_db(old_name, verbosity=0)
+			finally:
+				hashing.reset_service()
+
+		if options['save_baseline']:
+			Path(options['save_baseline']).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+			self.stdout.write(f"Baseline written to {options['save_baseline']}")
+		if baseline is not None:
+			self._compare(baseline, results, options)
+
+	def _dataset(self, options):
+		return {
+			key: options[key]
+			for key in ('users', 'tasks_per_user', 'recurring_per_user', 'templates_per_user', 'items_per_template', 'seed')
+		}
+
+	def _run(self, scenarios, options):
+		dataset = self._dataset(options)
+		start = time.perf_counter()
+		users = seed.seed_users(options['users'])
+		counts = seed.seed_user_data(
+			users,
+			tasks_per_user=options['tasks_per_user'],
+			recurring_per_user=options['recurring_per_user'],
+			templates_per_user=options['templates_per_user'],
+			items_per_template=options['items_per_template'],
+			seed=options['seed'],
+		)
+		self.stdout.write(
+			f"Seeded {len(users)} users, {counts['tasks']} tasks, {counts['recurring']} recurring series, "
+			f"{counts['templates']} templates in {time.perf_counter() - start:.1f}s"
+		)
+
+		user = users[0]
+		login = Client().post(
+			'/api/auth/login/',
+			{'username': user.username, 'password': seed.DEFAULT_PASSWORD},
+			content_type='application/json',
+		)
+		if login.status_code != 200:
+			raise CommandError(f"Seeded user could not log in: {login.status_code}")
+		self.client = Client(HTTP_AUTHORIZATION=f"Bearer {login.json()['access']}")
+		self.user = user
+		self.template_id = TaskTemplate.objects.filter(user=user).values_list('id', flat=True).first()
+		self.deep_page = max(1, (options['tasks_per_user'] + options['recurring_per_user']) // 10 // 2)
+
+		self.stdout.write(f"{'scenario':<26}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}")
+		results = {}
+		for name in scenarios:
+			if name == "create_from_template" and self.template_id is None:
+				self.stdout.write(f"{name:<26}skipped: no templates seeded")
+				continue
+			iterations = options['job_iterations'] if name in JOB_SCENARIOS else options['iterations']
+			results[name] = self._measure(getattr(self, f"_call_{name}"), iterations, options['warmup'])
+			row = results[name]
+			self.stdout.write(
+				f"{name:<26}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['queries']:>9}"
+			)
+		return {
+			"version": BASELINE_VERSION,
+			"recorded_at": timezone.now().isoformat(),
+			"environment": {
+				"db_vendor": connection.vendor,
+				"python": platform.python_version(),
+				"django": django.get_version(),
+			},
+			"dataset": dataset,
+			"scenarios": results,
+		}
+
+	def _measure(self, call, iterations, warmup):
+		timings = []
+		query_counts = []
+		for i in range(warmup + iterations):
+			# Every call starts from the seeded state, so writes do not pile up across iterations
+			with transaction.atomic():
+				with CaptureQueriesContext(connection) as ctx:
+					start = time.perf_counter()
+					call()
+					elapsed = (time.perf_counter() - start) * 1000
+				transaction.set_rollback(True)
+			if i >= warmup:
+				timings.append(elapsed)
+				query_counts.append(len(ctx.captured_queries))
+		timings.sort()
+		return {
+			"iterations": iterations,
+			"p50_ms": round(percentile(timings, 50), 3),
+			"p95_ms": round(percentile(timings, 95), 3),
+			"p99_ms": round(percentile(timings, 99), 3),
+			"queries": max(query_counts),
+		}
+
+	def _check(self, response, expected=200):
+		if response.status_code != expected:
+			raise CommandError(f"{response.request['PATH_INFO']} returned {response.status_code}")
+
+	def _call_login(self):
+		self._check(Client().post(
+			'/api/auth/login/',
+			{'username': self.user.username, 'password': seed.DEFAULT_PASSWORD},
+			content_type='application/json',
+		))
+
+	def _call_tasks_list_first_page(self):
+		self._check(self.client.get('/api/tasks/'))
+
+	def _call_tasks_list_deep_page(self):
+		self._check(self.client.get('/api/tasks/', {'page': self.deep_page}))
+
+	def _call_dashboard_today(self):
+		self._check(self.client.get('/api/dashboard/', {'period': 'today'}))
+
+	def _call_dashboard_week(self):
+		self._check(self.client.get('/api/dashboard/', {'period': 'week'}))
+
+	def _call_dashboard_month(self):
+		self._check(self.client.get('/api/dashboard/', {'period': 'month'}))
+
+	def _call_create_from_template(self):
+		self._check(self.client.post(
+			'/api/tasks/from-template/',
+			{'template_id': self.template_id, 'base_date': timezone.localdate().isoformat()},
+			content_type='application/json',
+		), expected=201)
+
+	def _call_create_recurring_tasks(self):
+		create_recurring_tasks()
+
+	def _call_flag_overdue_tasks(self):
+		flag_overdue_tasks()
+
+	def _compare(self, baseline, results, options):
+		if baseline.get("version") != BASELINE_VERSION:
+			raise CommandError(f"Baseline version {baseline.get('version')} is not {BASELINE_VERSION}; record a new one.")
+		if baseline.get("dataset") != results["dataset"]:
+			raise CommandError(
+				f"Baseline was recorded with {baseline.get('dataset')}; rerun with the same volumes or save a new baseline."
+			)
+		if baseline.get("environment", {}).get("db_vendor") != results["environment"]["db_vendor"]:
+			self.stderr.write("Warning: baseline was recorded on a different database backend.")
+
+		tolerance = options['tolerance']
+		regressions = []
+		for name, current in results["scenarios"].items():
+			previous = baseline.get("scenarios", {}).get(name)
+			if previous is None:
+				continue
+			if current["queries"] > previous["queries"] + options['query_tolerance']:
+				regressions.append(f"{name}: {current['queries']} queries, baseline {previous['queries']}")
+			for key in ("p50_ms", "p95_ms"):
+				limit = max(previous[key] * (1 + tolerance), previous[key] + options['min_delta_ms'])
+				if current[key] > limit:
+					regressions.append(f"{name}: {key} {current[key]:.1f}, baseline {previous[key]:.1f} (limit {limit:.1f})")
+		if regressions:
+			for line in regressions:
+				self.stderr.write(f"REGRESSION {line}")
+			raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}")
+		self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
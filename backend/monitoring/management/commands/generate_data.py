@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+
+from accounts.models import Profile
+from billing.models import Subscription
+from monitoring import seed
+from tasks.models import Task, TaskTemplate, TaskTemplateItem
+
+# Rows held in memory per chunk of users before they are written
+_ROWS_PER_CHUNK = 100000
+
+
+def _seed_chunk(start, count, password_hash, params):
+	"""Seed users `start` .. `start + count - 1` and their data in one transaction."""
+	with transaction.atomic():
+		users = seed.seed_users(count, prefix=params['prefix'], start=start, password_hash=password_hash)
+		counts = seed.seed_user_data(
+			users,
+			tasks_per_user=params['tasks_per_user'],
+			recurring_per_user=params['recurring_per_user'],
+			templates_per_user=params['templates_per_user'],
+			items_per_template=params['items_per_template'],
+			seed=params['seed'],
+		)
+	return dict(counts, users=len(users))
+
+
+class Command(BaseCommand):
+	help = (
+		"Generate users with profiles and subscriptions, tasks, recurring series and "
+		"templates for load testing. Output is deterministic for a given --seed."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument('--users', type=int, default=1000)
+		parser.add_argument('--tasks-per-user', type=int, default=200)
+		parser.add_argument('--recurring-per-user', type=int, default=5)
+		parser.add_argument('--templates-per-user', type=int, default=2)
+		parser.add_argument('--items-per-template', type=int, default=5)
+		parser.add_argument('--seed', type=int, default=0)
+		parser.add_argument('--prefix', default='load', help="Usernames are <prefix>-0000000, <prefix>-0000001, ...")
+		parser.add_argument('--password', default=seed.DEFAULT_PASSWORD, help="Password for every generated user")
+		parser.add_argument(
+			'--workers', type=int, default=os.cpu_count() or 1,
+			help="Worker processes (SQLite always uses one)",
+		)
+		parser.add_argument('--chunk-users', type=int, default=None, help="Users per unit of work")
+		parser.add_argument('--force', action='store_true', help="Run even with DEBUG off")
+
+	def handle(self, *args, **options):
+		if not settings.DEBUG and not options['force']:
+			raise CommandError("DEBUG is off; pass --force if this really is a load-test database.")
+		if User.objects.filter(username__startswith=f"{options['prefix']}-").exists():
+			raise CommandError(f"Users named {options['prefix']}-* already exist; pick another --prefix.")
+
+		total = options['users']
+		# A series brings a few dozen instances at most; ten is a fair average
+		rows_per_user = max(1, options['tasks_per_user'] + options['recurring_per_user'] * 10)
+		chunk = options['chunk_users'] or max(1, min(1000, _ROWS_PER_CHUNK // rows_per_user))
+		chunks = [(start, min(chunk, total - start)) for start in range(0, total, chunk)]
+		workers = max(1, min(options['workers'], len(chunks)))
+		if connection.vendor == 'sqlite' or 'fork' not in multiprocessing.get_all_start_methods():
+			workers = 1
+		# Hashed once here; every worker reuses it
+		password_hash = make_password(options['password'])
+		params = {
+			key: options[key]
+			for key in ('prefix', 'tasks_per_user', 'recurring_per_user', 'templates_per_user', 'items_per_template', 'seed')
+		}
+
+		self.stdout.write(
+			f"Generating {total} users in {len(chunks)} chunks with {workers} worker(s) "
+			f"on {connection.vendor}"
+		)
+		started = time.perf_counter()
+		totals = {}
+		if workers == 1:
+			results = (_seed_chunk(start, count, password_hash, params) for start, count in chunks)
+			self._collect(results, totals, started)
+		else:
+			# Children must not share the parent's database connection
+			connections.close_all()
+			context = multiprocessing.get_context('fork')
+			with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+				futures = [pool.submit(_seed_chunk, start, count, password_hash, params) for start, count in chunks]
+				self._collect((future.result() for future in as_completed(futures)), totals, started)
+
+		if connection.vendor == 'postgresql':
+			with connection.cursor() as cursor:
+				tables = [model._meta.db_table for model in (User, Profile, Subscription, Task, TaskTemplate, TaskTemplateItem)]
+				cursor.execute(f"ANALYZE {', '.join(connection.ops.quote_name(table) for table in tables)}")
+		elapsed = time.perf_counter() - started
+		rows = sum(totals.values())
+		self.stdout.write(self.style.SUCCESS(
+			f"Created {totals.get('users', 0)} users, {totals.get('tasks', 0)} tasks, "
+			f"{totals.get('recurring', 0)} recurring series, {totals.get('templates', 0)} templates "
+			f"({totals.get('template_items', 0)} items) in {elapsed:.1f}s, {rows / max(elapsed, 1e-9):,.0f} rows/s"
+		))
+
+	def _collect(self, results, totals, started):
+		for counts in results:
+			for key, value in counts.items():
+				totals[key] = totals.get(key, 0) + value
+			self.stdout.write(
+				f"  {totals['users']} users, {totals['tasks']} tasks ({time.perf_counter() - started:.1f}s)"
+			)
@@ -0,0 +1,75 @@
+import asyncio
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring import seed
+from monitoring.loadgen import DEFAULT_MIX, PERCENTILES, LoadDriver, parse_mix
+
+
+class Command(BaseCommand):
+	help = (
+		"Replay a login/list/create/complete/dashboard mix against a running server "
+		"with concurrent async clients, and report throughput and latency percentiles "
+		"per endpoint. Log in as users made by generate_data."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument('--url', default='http://localhost:8089', help="Base URL of the server under test")
+		parser.add_argument('--clients', type=int, default=50, help="Concurrent virtual clients")
+		parser.add_argument('--duration', type=float, default=30.0, help="Seconds to run")
+		parser.add_argument(
+			'--rate', type=float, default=None,
+			help="Target requests/s across all clients; default sends as fast as the server answers",
+		)
+		parser.add_argument(
+			'--mix', default=",".join(f"{action}={weight}" for action, weight in DEFAULT_MIX.items()),
+			help="Relative weights, e.g. list=50,create=15,complete=10,dashboard=24,login=1",
+		)
+		parser.add_argument('--users', type=int, default=100, help="Generated users to spread clients over")
+		parser.add_argument('--prefix', default='load', help="generate_data --prefix the users were made with")
+		parser.add_argument('--password', default=seed.DEFAULT_PASSWORD)
+		parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in seconds")
+		parser.add_argument('--seed', type=int, default=0)
+		parser.add_argument('--json', help="Also write the report to this path")
+
+	def handle(self, *args, **options):
+		try:
+			mix = parse_mix(options['mix'])
+		except ValueError as exc:
+			raise CommandError(str(exc))
+		if options['clients'] < 1 or options['users'] < 1:
+			raise CommandError("--clients and --users must be at least 1")
+
+		driver = LoadDriver(
+			options['url'],
+			[seed.username(options['prefix'], i) for i in range(options['users'])],
+			options['password'],
+			mix=mix,
+			clients=options['clients'],
+			duration=options['duration'],
+			rate=options['rate'],
+			timeout=options['timeout'],
+			seed=options['seed'],
+		)
+		self.stdout.write(
+			f"{options['clients']} clients for {options['duration']:g}s against {options['url']}"
+			+ (f" at {options['rate']:g} req/s" if options['rate'] else "")
+		)
+		report = asyncio.run(driver.run())
+
+		header = f"{'endpoint':<11}{'count':>8}{'errors':>8}{'req/s':>9}{'mean':>9}"
+		header += "".join(f"{f'p{pct:g}':>9}" for pct in PERCENTILES) + f"{'max':>9}"
+		self.stdout.write(header + "   (ms)")
+		for action, row in report['endpoints'].items():
+			line = f"{action:<11}{row['count']:>8}{row['errors']:>8}{row['throughput']:>9.1f}{row['mean_ms']:>9.1f}"
+			line += "".join(f"{row[f'p{pct:g}_ms']:>9.1f}" for pct in PERCENTILES) + f"{row['max_ms']:>9.1f}"
+			self.stdout.write(line)
+		for action, reason in report['error_samples'].items():
+			self.stderr.write(f"{action}: first error {reason}")
+
+		if options['json']:
+			Path(options['json']).write_text(json.dumps(report, indent=2) + "\n")
+		if not report['endpoints']['all']['count']:
+			raise CommandError("No request succeeded; is the server up and were the users generated?")
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.profiling import make_token
+
+
+class Command(BaseCommand):
+	help = "Print a signed token that turns on request profiling for one user's requests."
+
+	def add_arguments(self, parser):
+		parser.add_argument('username')
+
+	def handle(self, *args, **options):
+		User = get_user_model()
+		try:
+			user = User.objects.get(username=options['username'])
+		except User.DoesNotExist:
+			raise CommandError(f"No user named {options['username']!r}")
+		self.stdout.write(make_token(user))
+		self.stderr.write(
+			f"Valid for {settings.PROFILING_TOKEN_MAX_AGE}s. Send it as X-Profile-Token "
+			f"or ?_profile=; profiled responses carry X-Profile-Id."
+		)
@@ -0,0 +1,127 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What each process imports before it can do work: gunicorn loads the WSGI
+# app and, on the first request, the URLconf; a worker sets Django up and
+# imports the task modules (Celery's Django fixup also runs system checks,
+# which load the URLconf too).
+TARGETS = {
+	"wsgi": (
+		"import core.wsgi\n"
+		"from django.urls import get_resolver\n"
+		"get_resolver().url_patterns\n"
+	),
+	"celery": (
+		"import django\n"
+		"import core.celery\n"
+		"django.setup()\n"
+		"core.celery.app.loader.import_default_modules()\n"
+	),
+}
+_TIMED = (
+	"import sys, time\n"
+	"started = time.perf_counter()\n"
+	"{boot}"
+	"print((time.perf_counter() - started) * 1000)\n"
+	"print(','.join(sorted(sys.modules)))\n"
+)
+
+
+def parse_importtime(text):
+	"""`python -X importtime` stderr -> [(module, self_us, cumulative_us)] in import order."""
+	rows = []
+	for line in text.splitlines():
+		if not line.startswith("import time:"):
+			continue
+		self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+		if not self_us.strip().isdigit():
+			continue
+		rows.append((name.strip(), int(self_us), int(cumulative_us)))
+	return rows
+
+
+class Command(BaseCommand):
+	help = (
+		"Measure how long the web app and a Celery worker take to import, in fresh "
+		"interpreters, and fail if either is over its budget or eagerly imports a "
+		"module listed in STARTUP_DEFERRED_MODULES."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument('--target', choices=sorted(TARGETS), action='append', help="Default: all")
+		parser.add_argument('--runs', type=int, default=5, help="Timed runs per target; the median is checked")
+		parser.add_argument('--top', type=int, default=15, help="Packages to list by import time")
+		parser.add_argument(
+			'--budget-ms', type=float, default=None,
+			help="Override STARTUP_BUDGET_<TARGET>_MS for every target; 0 only reports",
+		)
+		parser.add_argument('--json', help="Also write the report to this path")
+
+	def _run(self, code, *flags):
+		env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+		result = subprocess.run(
+			[sys.executable, *flags, "-c", code],
+			cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+		)
+		if result.returncode:
+			raise CommandError(f"Boot failed:\n{result.stderr.strip()}")
+		return result
+
+	def handle(self, *args, **options):
+		if options['runs'] < 1:
+			raise CommandError("--runs must be at least 1")
+		report, failures = {}, []
+		for target in options['target'] or sorted(TARGETS):
+			code = _TIMED.format(boot=TARGETS[target])
+			# The -X importtime run also warms the bytecode cache for the timed ones
+			profiled = self._run(code, "-X", "importtime")
+			rows = parse_importtime(profiled.stderr)
+			timings = [float(self._run(code).stdout.splitlines()[0]) for _ in range(options['runs'])]
+			loaded = set(profiled.stdout.splitlines()[1].split(","))
+
+			packages = {}
+			for name, self_us, _ in rows:
+				package = name.split(".")[0]
+				packages[package] = packages.get(package, 0) + self_us
+			top = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:options['top']]
+			eager = [
+				module for module in settings.STARTUP_DEFERRED_MODULES
+				if module in loaded
+			]
+			budget = options['budget_ms']
+			if budget is None:
+				budget = getattr(settings, f"STARTUP_BUDGET_{target.upper()}_MS")
+			median = statistics.median(timings)
+			report[target] = {
+				"median_ms": round(median, 1),
+				"min_ms": round(min(timings), 1),
+				"max_ms": round(max(timings), 1),
+				"budget_ms": budget,
+				"modules": len(rows),
+				"packages_ms": {package: round(us / 1000, 1) for package, us in top},
+				"eager_deferred_modules": eager,
+			}
+
+			self.stdout.write(
+				f"{target}: {median:.0f}ms median of {len(timings)} "
+				f"(min {min(timings):.0f}, max {max(timings):.0f}), {len(rows)} modules, "
+				f"budget {budget:g}ms" if budget else f"{target}: {median:.0f}ms median, no budget"
+			)
+			for package, us in top:
+				self.stdout.write(f"  {us / 1000:8.1f}ms  {package}")
+			if budget and median > budget:
+				failures.append(f"{target} took {median:.0f}ms, over its {budget:g}ms budget")
+			if eager:
+				failures.append(f"{target} imports {', '.join(eager)} at start-up")
+
+		if options['json']:
+			Path(options['json']).write_text(json.dumps(report, indent=2) + "\n")
+		if failures:
+			raise CommandError("; ".join(failures))
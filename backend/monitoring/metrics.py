@@ -0,0 +1,93 @@
+"""
+Prometheus metrics for the web processes.
+
+With PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py does this for the WSGI
+server, the compose files for the uvicorn one), every worker writes its
+samples to that directory and /metrics aggregates them, so a scrape sees the
+whole server rather than whichever worker answered. The two servers keep
+separate directories: async routes are reported by the ASGI service's own
+/metrics.
+"""
+import os
+from datetime import timedelta
+
+from django.db.models import Count
+from django.utils import timezone
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+REQUESTS = Counter(
+	"http_requests_total", "HTTP requests by route and status.", ["method", "route", "status"],
+)
+LATENCY = Histogram(
+	"http_request_duration_seconds", "Time spent in Django per request.", ["method", "route"],
+	buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+	"http_response_size_bytes", "Response body size (non-streaming responses).", ["method", "route"],
+	buckets=SIZE_BUCKETS,
+)
+DB_QUERIES = Histogram(
+	"http_request_db_queries", "SQL queries run per request.", ["method", "route"],
+	buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME = Histogram(
+	"http_request_db_duration_seconds", "Total SQL time per request.", ["method", "route"],
+	buckets=LATENCY_BUCKETS,
+)
+
+
+class JobRunCollector:
+	"""
+	Periodic job health read from JobRun at scrape time. The jobs run in the
+	Celery worker, whose own metrics nobody scrapes, so the table is the
+	shared state.
+	"""
+
+	def collect(self):
+		from .jobs import monitored_task_names
+		from .models import JobRun
+		duration = GaugeMetricFamily("celery_job_last_duration_seconds", "Duration of the last finished run.", labels=["task"])
+		rows = GaugeMetricFamily("celery_job_last_rows_written", "Rows written by the last finished run.", labels=["task"])
+		throughput = GaugeMetricFamily("celery_job_last_rows_per_second", "Write throughput of the last finished run.", labels=["task"])
+		failed = GaugeMetricFamily("celery_job_last_run_failed", "1 if the last finished run failed.", labels=["task"])
+		last_success = GaugeMetricFamily(
+			"celery_job_last_success_timestamp_seconds", "Start time of the last successful run.", labels=["task"]
+		)
+		runs = GaugeMetricFamily("celery_job_runs_last_7d", "Runs started in the last 7 days by status.", labels=["task", "status"])
+
+		for name in sorted(monitored_task_names()):
+			last = JobRun.objects.filter(task_name=name).exclude(status=JobRun.STATUS_RUNNING).first()
+			if last is not None:
+				failed.add_metric([name], float(last.status == JobRun.STATUS_FAILURE))
+				if last.duration_seconds is not None:
+					duration.add_metric([name], last.duration_seconds)
+				if last.rows_written is not None:
+					rows.add_metric([name], last.rows_written)
+				if last.rows_per_second is not None:
+					throughput.add_metric([name], last.rows_per_second)
+			success = JobRun.objects.filter(task_name=name, status=JobRun.STATUS_SUCCESS).values_list("started_at", flat=True).first()
+			if success is not None:
+				last_success.add_metric([name], success.timestamp())
+		recent = JobRun.objects.filter(started_at__gte=timezone.now() - timedelta(days=7))
+		for row in recent.values("task_name", "status").annotate(n=Count("id")).order_by():
+			runs.add_metric([row["task_name"], row["status"]], row["n"])
+		yield from (duration, rows, throughput, failed, last_success, runs)
+
+
+def render():
+	"""Exposition text and content type for the current process or, in multiprocess mode, all workers."""
+	if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+		registry = CollectorRegistry()
+		multiprocess.MultiProcessCollector(registry)
+	else:
+		registry = REGISTRY
+	jobs = CollectorRegistry(auto_describe=False)
+	jobs.register(JobRunCollector())
+	return generate_latest(registry) + generate_latest(jobs), CONTENT_TYPE_LATEST
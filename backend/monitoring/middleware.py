@@ -0,0 +1,105 @@
+from contextvars import ContextVar
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics
+
+_request_stats = ContextVar("request_db_stats", default=None)
+
+# Keeps label cardinality bounded: 404s and the like share one route label
+UNRESOLVED_ROUTE = "<unresolved>"
+
+
+class _Stats:
+	__slots__ = ("request", "queries", "db_seconds")
+
+	def __init__(self, request):
+		self.request = request
+		self.queries = 0
+		self.db_seconds = 0.0
+
+
+def current_request():
+	"""The request being handled in this context, if any."""
+	stats = _request_stats.get()
+	return stats.request if stats is not None else None
+
+
+def _record_query(execute, sql, params, many, context):
+	stats = _request_stats.get()
+	if stats is None:
+		return execute(sql, params, many, context)
+	start = time.perf_counter()
+	try:
+		return execute(sql, params, many, context)
+	finally:
+		stats.queries += 1
+		stats.db_seconds += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+	"""
+	connection_created receiver: time every query on the connection.
+
+	Installed per connection rather than with a per-request execute_wrapper()
+	block so queries that async views run through sync_to_async threads are
+	counted too; the request's totals travel in a ContextVar, which asgiref
+	copies into those threads.
+	"""
+	if _record_query not in connection.execute_wrappers:
+		connection.execute_wrappers.append(_record_query)
+
+
+def _route(request):
+	match = getattr(request, "resolver_match", None)
+	if match is None:
+		return UNRESOLVED_ROUTE
+	return "/" + match.route if match.route else match.view_name
+
+
+class PrometheusMiddleware:
+	"""Record latency, response size and SQL cost per route. Place it first in MIDDLEWARE."""
+
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		if iscoroutinefunction(self.get_response):
+			markcoroutinefunction(self)
+
+	def _observe(self, request, response, stats, started):
+		method = request.method
+		route = _route(request)
+		metrics.REQUESTS.labels(method, route, response.status_code).inc()
+		metrics.LATENCY.labels(method, route).observe(time.perf_counter() - started)
+		if not response.streaming:
+			metrics.RESPONSE_SIZE.labels(method, route).observe(len(response.content))
+		# Streaming bodies query after this point; only the setup is counted
+		metrics.DB_QUERIES.labels(method, route).observe(stats.queries)
+		metrics.DB_TIME.labels(method, route).observe(stats.db_seconds)
+
+	def __call__(self, request):
+		if iscoroutinefunction(self):
+			return self.__acall__(request)
+		stats = _Stats(request)
+		token = _request_stats.set(stats)
+		started = time.perf_counter()
+		try:
+			response = self.get_response(request)
+		finally:
+			_request_stats.reset(token)
+		self._observe(request, response, stats, started)
+		return response
+
+	async def __acall__(self, request):
+		stats = _Stats(request)
+		token = _request_stats.set(stats)
+		started = time.perf_counter()
+		try:
+			response = await self.get_response(request)
+		finally:
+			_request_stats.reset(token)
+		self._observe(request, response, stats, started)
+		return response
@@ -0,0 +1,43 @@
+from django.db import models
+
+
+class JobRun(models.Model):
+	"""One execution of a periodic Celery task, written by the hooks in monitoring.jobs."""
+
+	STATUS_RUNNING = 'running'
+	STATUS_SUCCESS = 'success'
+	STATUS_FAILURE = 'failure'
+	STATUS_RETRY = 'retry'
+	STATUS_CHOICES = [
+		(STATUS_RUNNING, 'Running'),
+		(STATUS_SUCCESS, 'Success'),
+		(STATUS_FAILURE, 'Failure'),
+		(STATUS_RETRY, 'Retry'),
+	]
+
+	task_name = models.CharField(max_length=200)
+	task_id = models.CharField(max_length=64)
+	status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+	started_at = models.DateTimeField()
+	finished_at = models.DateTimeField(blank=True, null=True)
+	duration_seconds = models.FloatField(blank=True, null=True)
+	rows_scanned = models.IntegerField(blank=True, null=True)
+	rows_written = models.IntegerField(blank=True, null=True)
+	retries = models.IntegerField(default=0)
+	error = models.TextField(blank=True)
+	result = models.JSONField(blank=True, null=True)
+
+	class Meta:
+		ordering = ['-started_at']
+		indexes = [
+			models.Index(fields=['task_name', 'started_at']),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.task_name} @ {self.started_at:%Y-%m-%d %H:%M} ({self.status})"
+
+	@property
+	def rows_per_second(self):
+		if not self.rows_written or not self.duration_seconds:
+			return None
+		return self.rows_written / self.duration_seconds
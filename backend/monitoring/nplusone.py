@@ -0,0 +1,166 @@
+"""
+N+1 query detector for development and staging.
+
+While a request or Celery task runs, every statement is reduced to a
+fingerprint (literals and IN-lists collapsed) and counted. A fingerprint
+seen more than NPLUSONE_THRESHOLD times is reported together with the
+innermost project frame that issued it, according to NPLUSONE_MODE:
+
+* ``log``    - warning on the ``monitoring.nplusone`` logger
+* ``header`` - log, and an X-NPlusOne response header (requests only)
+* ``raise``  - NPlusOneError at the offending query, for tests and local runs
+* ``off``    - no tracking at all (the production default)
+"""
+from collections import Counter
+from contextvars import ContextVar
+import logging
+import os
+import re
+import sysconfig
+import traceback
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from celery import signals
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_tracker = ContextVar("nplusone_tracker", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \((?:\s*(?:%s|\?|\d+)\s*,?)+\)", re.IGNORECASE)
+_SAVEPOINT = re.compile(r"^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b", re.IGNORECASE)
+_IGNORED_PATHS = (os.path.normpath(sysconfig.get_paths()["stdlib"]) + os.sep, os.path.dirname(__file__) + os.sep)
+_PACKAGE_DIRS = (f"{os.sep}site-packages{os.sep}", f"{os.sep}dist-packages{os.sep}")
+
+
+class NPlusOneError(Exception):
+	pass
+
+
+def fingerprint(sql):
+	sql = _STRING.sub("?", sql)
+	sql = _IN_LIST.sub("IN (...)", sql)
+	return _NUMBER.sub("?", sql)
+
+
+def _calling_frame():
+	"""Innermost frame in project code, skipping Django, libraries and this app."""
+	for frame in reversed(traceback.extract_stack()):
+		path = os.path.normpath(frame.filename)
+		if not path.startswith(_IGNORED_PATHS) and not any(part in path for part in _PACKAGE_DIRS):
+			return f"{frame.filename}:{frame.lineno} in {frame.name}"
+	return "<unknown>"
+
+
+class _Tracker:
+	def __init__(self, origin, mode, threshold):
+		self.origin = origin
+		self.mode = mode
+		self.threshold = threshold
+		self.counts = Counter()
+		self.frames = {}
+
+	def record(self, sql):
+		if _SAVEPOINT.match(sql):
+			return
+		key = fingerprint(sql)
+		self.counts[key] += 1
+		if self.counts[key] == self.threshold + 1:
+			self.frames[key] = _calling_frame()
+			if self.mode == "raise":
+				raise NPlusOneError(self._describe(key))
+
+	def _describe(self, key):
+		return f"{self.origin}: {self.counts[key]}x {key[:200]} at {self.frames[key]}"
+
+	def findings(self):
+		return [self._describe(key) for key in self.frames]
+
+
+def _nplusone_wrapper(execute, sql, params, many, context):
+	tracker = _tracker.get()
+	if tracker is not None:
+		tracker.record(sql)
+	return execute(sql, params, many, context)
+
+
+def install_nplusone_detector(sender, connection, **kwargs):
+	"""connection_created receiver; see install_query_recorder."""
+	if _nplusone_wrapper not in connection.execute_wrappers:
+		connection.execute_wrappers.append(_nplusone_wrapper)
+
+
+def _start(origin):
+	mode = settings.NPLUSONE_MODE
+	if mode == "off":
+		return None, None
+	tracker = _Tracker(origin, mode, settings.NPLUSONE_THRESHOLD)
+	return tracker, _tracker.set(tracker)
+
+
+def _finish(tracker, token):
+	_tracker.reset(token)
+	findings = tracker.findings()
+	for finding in findings:
+		logger.warning("Repeated query %s", finding)
+	return findings
+
+
+class NPlusOneMiddleware:
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		if iscoroutinefunction(self.get_response):
+			markcoroutinefunction(self)
+
+	def _report(self, tracker, token, response):
+		findings = _finish(tracker, token)
+		if findings and tracker.mode == "header":
+			response["X-NPlusOne"] = " | ".join(findings)[:4000]
+		return response
+
+	def __call__(self, request):
+		if iscoroutinefunction(self):
+			return self.__acall__(request)
+		tracker, token = _start(f"{request.method} {request.path}")
+		if tracker is None:
+			return self.get_response(request)
+		try:
+			response = self.get_response(request)
+		except BaseException:
+			_tracker.reset(token)
+			raise
+		return self._report(tracker, token, response)
+
+	async def __acall__(self, request):
+		tracker, token = _start(f"{request.method} {request.path}")
+		if tracker is None:
+			return await self.get_response(request)
+		try:
+			response = await self.get_response(request)
+		except BaseException:
+			_tracker.reset(token)
+			raise
+		return self._report(tracker, token, response)
+
+
+# Celery: one tracker per task run, reported when it ends
+_task_tokens = {}
+
+
+@signals.task_prerun.connect
+def _task_started(sender=None, task_id=None, task=None, **kwargs):
+	tracker, token = _start(f"task {getattr(task, 'name', task_id)}")
+	if tracker is not None:
+		_task_tokens[task_id] = (tracker, token)
+
+
+@signals.task_postrun.connect
+def _task_finished(sender=None, task_id=None, **kwargs):
+	entry = _task_tokens.pop(task_id, None)
+	if entry is not None:
+		_finish(*entry)
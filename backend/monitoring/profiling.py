@@ -0,0 +1,164 @@
+"""
+Opt-in profiling of single requests.
+
+Staff mint a short-lived signed token for a user (``manage.py profile_token``
+or POST /api/monitoring/profile-token/). A request that carries it in the
+X-Profile-Token header or the ``_profile`` query parameter, and is made by
+that user, runs under cProfile with every SQL statement and its timing
+recorded. Both are saved under PROFILING_DIR and the response names them in
+X-Profile-Id; staff download them from /api/monitoring/profiles/<id>/.
+
+Requests without a token pay one header lookup. One request per process is
+profiled at a time: cProfile sees every thread, and on Python 3.12+ only one
+profiler may be active per process. A tokened request that finds the
+profiler busy is served unprofiled with X-Profile-Skipped: busy. Async
+requests are never profiled (a profile of the event loop would mix in every
+other coroutine) and get X-Profile-Skipped: async.
+"""
+import cProfile
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+
+HEADER = "HTTP_X_PROFILE_TOKEN"
+QUERY_PARAM = "_profile"
+SKIPPED_HEADER = "X-Profile-Skipped"
+_SALT = "monitoring.profiling"
+ARTIFACTS = {
+	"pstats": (".prof", "application/octet-stream"),
+	"sql": (".sql.json", "application/json"),
+}
+# Held while a request is profiled; see the module docstring
+_profiling = threading.Lock()
+
+
+def make_token(user):
+	return signing.TimestampSigner(salt=_SALT).sign(str(user.pk))
+
+
+def _token_user_id(token):
+	try:
+		value = signing.TimestampSigner(salt=_SALT).unsign(token, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+	except signing.BadSignature:
+		return None
+	return int(value)
+
+
+def artifact_path(profile_id, kind):
+	suffix, _ = ARTIFACTS[kind]
+	return Path(settings.PROFILING_DIR) / f"{profile_id}{suffix}"
+
+
+class _QueryLog:
+	def __init__(self):
+		self.queries = []
+
+	def __call__(self, alias):
+		def wrapper(execute, sql, params, many, context):
+			start = time.perf_counter()
+			try:
+				return execute(sql, params, many, context)
+			finally:
+				self.queries.append({
+					"alias": alias,
+					"sql": sql,
+					"params": repr(params)[:500],
+					"many": many,
+					"ms": round((time.perf_counter() - start) * 1000, 3),
+				})
+		return wrapper
+
+
+def _prune(directory, keep):
+	files = sorted(directory.glob("*.prof"), key=os.path.getmtime)
+	for stale in files[:-keep] if keep else files:
+		for kind in ARTIFACTS:
+			artifact_path(stale.name[:-len(".prof")], kind).unlink(missing_ok=True)
+
+
+def _save(request, profiler, query_log, elapsed):
+	directory = Path(settings.PROFILING_DIR)
+	directory.mkdir(parents=True, exist_ok=True)
+	profile_id = uuid.uuid4().hex
+	profiler.dump_stats(artifact_path(profile_id, "pstats"))
+	with open(artifact_path(profile_id, "sql"), "w") as fh:
+		json.dump({
+			"method": request.method,
+			"path": request.get_full_path(),
+			"user_id": request.user.pk,
+			"elapsed_ms": round(elapsed * 1000, 3),
+			"query_count": len(query_log.queries),
+			"query_ms": round(sum(q["ms"] for q in query_log.queries), 3),
+			"queries": query_log.queries,
+		}, fh, indent=1)
+	_prune(directory, settings.PROFILING_MAX_PROFILES)
+	return profile_id
+
+
+class ProfilingMiddleware:
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		if iscoroutinefunction(self.get_response):
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if iscoroutinefunction(self):
+			return self.__acall__(request)
+		token = request.META.get(HEADER) or request.GET.get(QUERY_PARAM)
+		if not token:
+			return self.get_response(request)
+		user_id = _token_user_id(token)
+		if user_id is None:
+			return self.get_response(request)
+		if not _profiling.acquire(blocking=False):
+			response = self.get_response(request)
+			response[SKIPPED_HEADER] = "busy"
+			return response
+		try:
+			return self._profile(request, user_id)
+		finally:
+			_profiling.release()
+
+	def _profile(self, request, user_id):
+		profiler = cProfile.Profile()
+		try:
+			profiler.enable()
+		except ValueError:
+			# Another profiling tool (a debugger, coverage) holds sys.monitoring
+			response = self.get_response(request)
+			response[SKIPPED_HEADER] = "unavailable"
+			return response
+		query_log = _QueryLog()
+		try:
+			with ExitStack() as stack:
+				for alias in connections:
+					stack.enter_context(connections[alias].execute_wrapper(query_log(alias)))
+				start = time.perf_counter()
+				response = self.get_response(request)
+				elapsed = time.perf_counter() - start
+		finally:
+			profiler.disable()
+		# DRF authenticates inside the view and copies the user back onto the request
+		user = getattr(request, "user", None)
+		if user is not None and user.is_authenticated and user.pk == user_id:
+			response["X-Profile-Id"] = _save(request, profiler, query_log, elapsed)
+		return response
+
+	async def __acall__(self, request):
+		token = request.META.get(HEADER) or request.GET.get(QUERY_PARAM)
+		response = await self.get_response(request)
+		if token and _token_user_id(token) is not None:
+			response[SKIPPED_HEADER] = "async"
+		return response
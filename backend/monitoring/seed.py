@@ -0,0 +1,244 @@
+"""
+Deterministic synthetic data for benchmarks and load tests.
+
+The same seed and volumes always produce the same rows (ids aside), so
+numbers measured on two checkouts are comparable, and the rows for user N do
+not depend on how users are split across worker processes. Rows are written
+in chunks with bulk_create, or with COPY on PostgreSQL for the large tables
+(tasks.bulk.insert_rows).
+Both skip model signals: profiles and subscriptions are created explicitly,
+and no task events or tombstones are produced.
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from accounts.models import Profile
+from billing.models import Subscription
+from tasks.bulk import insert_rows
+from tasks.models import Task, TaskTemplate, TaskTemplateItem
+
+BATCH_SIZE = 2000
+DEFAULT_PASSWORD = "Bench-pass-1"
+
+CATEGORIES = ("Work", "Personal", "Shopping", "Health", "Finance", "Errands", "Study", "")
+CATEGORY_WEIGHTS = (30, 20, 10, 8, 7, 10, 5, 10)
+LABELS = [value for value, _ in Task.LABEL_CHOICES]
+LABEL_WEIGHTS = (55, 15, 10, 10, 10)
+RECURRENCE_TYPES = ("daily", "weekly", "monthly", "yearly", "custom")
+# How far back a series starts, in days, so each type has a history of instances
+_SERIES_AGE = {"daily": (14, 60), "weekly": (28, 180), "monthly": (60, 365), "yearly": (400, 1100), "custom": (14, 90)}
+_MAX_INSTANCES = 100
+# One user in ten of each: (plan, expired)
+_SUBSCRIPTIONS = (
+	(Subscription.PLAN_MONTHLY, False),
+	(Subscription.PLAN_MONTHLY, False),
+	(Subscription.PLAN_MONTHLY, False),
+	(Subscription.PLAN_MONTHLY, False),
+	(Subscription.PLAN_MONTHLY, False),
+	(Subscription.PLAN_MONTHLY, False),
+	(Subscription.PLAN_YEARLY, False),
+	(Subscription.PLAN_YEARLY, False),
+	(Subscription.PLAN_TRIAL, False),
+	(Subscription.PLAN_MONTHLY, True),
+)
+_PLAN_DAYS = {Subscription.PLAN_TRIAL: 14, Subscription.PLAN_MONTHLY: 30, Subscription.PLAN_YEARLY: 365}
+
+
+def username(prefix, index):
+	return f"{prefix}-{index:07d}"
+
+
+@contextmanager
+def explicit_timestamps(*models):
+	"""Let bulk_create keep the created_at/updated_at values set on the instances."""
+	fields = [
+		field for model in models for field in model._meta.concrete_fields
+		if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+	]
+	saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+	for field in fields:
+		field.auto_now = field.auto_now_add = False
+	try:
+		yield
+	finally:
+		for field, auto_now, auto_now_add in saved:
+			field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def seed_users(count, prefix="bench", password=DEFAULT_PASSWORD, start=0, password_hash=None):
+	"""
+	Users `start` .. `start + count - 1` with a profile and a subscription each:
+	mostly active monthly plans, some yearly and trial, and one in ten expired.
+	Every index divisible by ten gets an active monthly plan.
+	"""
+	today = timezone.localdate()
+	# One hash for everyone: hashing per user would dominate seeding time
+	password_hash = password_hash or make_password(password)
+	users = User.objects.bulk_create(
+		[
+			User(username=username(prefix, start + i), email=f"{username(prefix, start + i)}@example.com", password=password_hash)
+			for i in range(count)
+		],
+		batch_size=BATCH_SIZE,
+	)
+	Profile.objects.bulk_create([Profile(user=user) for user in users], batch_size=BATCH_SIZE)
+	subscriptions = []
+	for i, user in enumerate(users):
+		plan, expired = _SUBSCRIPTIONS[(start + i) % len(_SUBSCRIPTIONS)]
+		days = _PLAN_DAYS[plan]
+		start_date = today - timedelta(days=days + 5 if expired else (start + i) % days)
+		subscriptions.append(Subscription(
+			user=user,
+			plan=plan,
+			status=Subscription.STATUS_EXPIRED if expired else Subscription.STATUS_ACTIVE,
+			start_date=start_date,
+			end_date=start_date + timedelta(days=days),
+		))
+	Subscription.objects.bulk_create(subscriptions, batch_size=BATCH_SIZE)
+	return users
+
+
+def _timestamp(rng, now, days_ago):
+	return now - timedelta(days=days_ago, seconds=rng.randint(0, 86399))
+
+
+def build_tasks(rng, user_id, count, today):
+	"""
+	One-off tasks due mostly within a few weeks of today (roughly normal, from
+	90 days ago to 60 ahead), created up to two weeks before they are due.
+	Most past tasks are done; undone past ones are usually already flagged.
+	"""
+	now = timezone.now()
+	tasks = []
+	for i in range(count):
+		offset = max(-90, min(60, round(rng.gauss(-5, 25))))
+		due_date = today + timedelta(days=offset)
+		created_at = _timestamp(rng, now, max(0, -offset + rng.randint(0, 14)))
+		completed = rng.random() < (0.75 if offset < 0 else 0.1)
+		tasks.append(Task(
+			user_id=user_id,
+			title=f"Task {i}",
+			description="" if rng.random() < 0.6 else f"Notes for task {i}",
+			category=rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0],
+			label=rng.choices(LABELS, LABEL_WEIGHTS)[0],
+			due_date=due_date,
+			completed=completed,
+			overdue_notified=offset < 0 and not completed and rng.random() < 0.8,
+			created_at=created_at,
+			updated_at=created_at if not completed else min(now, created_at + timedelta(days=rng.randint(0, 7))),
+		))
+	return tasks
+
+
+def build_series(rng, user_id, index, today):
+	"""
+	A recurring parent and its materialized instances (parent_task unset). Each
+	series is a few days behind, so create_recurring_tasks has work to do.
+	"""
+	now = timezone.now()
+	recurrence_type = RECURRENCE_TYPES[index % len(RECURRENCE_TYPES)]
+	age = rng.randint(*_SERIES_AGE[recurrence_type])
+	parent = Task(
+		user_id=user_id,
+		title=f"Recurring {recurrence_type} {index}",
+		category=rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0],
+		label=rng.choices(LABELS, LABEL_WEIGHTS)[0],
+		due_date=today - timedelta(days=age),
+		is_recurring=True,
+		recurrence_type=recurrence_type,
+		recurrence_interval=rng.randint(2, 5) if recurrence_type == "custom" else rng.choice((1, 1, 1, 2)),
+		recurrence_days=sorted(rng.sample(range(7), rng.randint(1, 3))) if recurrence_type == "weekly" else [],
+		recurrence_count=rng.choice((None, None, None, 10, 30)),
+		created_at=_timestamp(rng, now, age),
+	)
+	parent.updated_at = parent.created_at
+
+	materialized_until = today - timedelta(days=rng.randint(0, 3))
+	instances = []
+	next_date = parent.calculate_next_recurrence()
+	while (
+		next_date and next_date <= materialized_until and len(instances) < _MAX_INSTANCES
+		and not (parent.recurrence_count and len(instances) >= parent.recurrence_count)
+	):
+		created_at = _timestamp(rng, now, (today - next_date).days)
+		instances.append(Task(
+			user_id=user_id,
+			title=parent.title,
+			category=parent.category,
+			label=parent.label,
+			due_date=next_date,
+			completed=next_date < today and rng.random() < 0.8,
+			created_at=created_at,
+			updated_at=created_at,
+		))
+		parent.next_recurrence_date = next_date
+		next_date = parent.calculate_next_recurrence()
+	parent.next_recurrence_date = next_date
+	parent.recurrence_created_count = len(instances)
+	return parent, instances
+
+
+def build_templates(rng, user_id, count):
+	return [
+		TaskTemplate(user_id=user_id, name=f"Template {i}", category=rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0])
+		for i in range(count)
+	]
+
+
+def build_template_items(rng, template, count):
+	return [
+		TaskTemplateItem(
+			template=template,
+			title=f"{template.name} step {i}",
+			label=rng.choices(LABELS, LABEL_WEIGHTS)[0],
+			due_date_offset=rng.randint(0, 14),
+			order=i,
+		)
+		for i in range(count)
+	]
+
+
+def seed_user_data(users, tasks_per_user=0, recurring_per_user=0, templates_per_user=0, items_per_template=5, seed=0):
+	"""Tasks, recurring series and templates for `users`; returns row counts."""
+	today = timezone.localdate()
+	tasks, parents, series, templates = [], [], [], []
+	rngs = {}
+	for user in users:
+		# Seeded per user so a subset of users reproduces the same rows
+		rng = rngs[user.id] = random.Random(f"{seed}:{user.username}")
+		tasks.extend(build_tasks(rng, user.id, tasks_per_user, today))
+		for index in range(recurring_per_user):
+			parent, instances = build_series(rng, user.id, index, today)
+			parents.append(parent)
+			series.append(instances)
+		templates.extend(build_templates(rng, user.id, templates_per_user))
+
+	with explicit_timestamps(Task, TaskTemplate):
+		Task.objects.bulk_create(parents, batch_size=BATCH_SIZE)
+		for parent, instances in zip(parents, series):
+			for instance in instances:
+				instance.parent_task_id = parent.id
+		tasks.extend(instance for instances in series for instance in instances)
+		insert_rows(Task, tasks, batch_size=BATCH_SIZE)
+		now = timezone.now()
+		for template in templates:
+			template.created_at = template.updated_at = now
+		TaskTemplate.objects.bulk_create(templates, batch_size=BATCH_SIZE)
+
+	items = [
+		item
+		for template in templates
+		for item in build_template_items(rngs[template.user_id], template, items_per_template)
+	]
+	insert_rows(TaskTemplateItem, items, batch_size=BATCH_SIZE)
+	return {
+		"tasks": len(tasks),
+		"recurring": len(parents),
+		"templates": len(templates),
+		"template_items": len(items),
+	}
@@ -0,0 +1,162 @@
+"""
+Slow query log.
+
+Every statement slower than SLOW_QUERY_THRESHOLD_MS is logged on the
+``monitoring.slow_queries`` logger with its parameters and origin (the view
+handling the request, or the Celery task). Slow SELECTs also get their plan:
+``EXPLAIN (ANALYZE, BUFFERS)`` on PostgreSQL, ``EXPLAIN QUERY PLAN`` on SQLite.
+
+EXPLAIN ANALYZE runs the statement a second time, so plans are rate-limited
+per process (SLOW_QUERY_EXPLAINS_PER_MINUTE) and each distinct statement is
+explained at most once per SLOW_QUERY_EXPLAIN_COOLDOWN_SECONDS. Log lines
+themselves are capped at SLOW_QUERY_LOGS_PER_MINUTE; past that they are only
+counted.
+"""
+from contextlib import nullcontext
+from contextvars import ContextVar
+import hashlib
+import logging
+import threading
+import time
+
+from celery import signals
+from django.conf import settings
+from django.db import transaction
+from prometheus_client import Counter
+
+from .middleware import current_request
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_THRESHOLD_MS.", ["origin"])
+
+_task_name = ContextVar("slow_query_task", default=None)
+_explaining = ContextVar("slow_query_explaining", default=False)
+# Bounds the per-statement cooldown table
+_MAX_TRACKED_STATEMENTS = 1000
+
+
+class _RateLimiter:
+	"""At most `per_minute` events in any fixed one-minute window, per process."""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._window = 0
+		self._count = 0
+
+	def allow(self, per_minute):
+		window = int(time.monotonic() // 60)
+		with self._lock:
+			if window != self._window:
+				self._window, self._count = window, 0
+			if self._count >= per_minute:
+				return False
+			self._count += 1
+			return True
+
+
+_log_limiter = _RateLimiter()
+_explain_limiter = _RateLimiter()
+_explained_at = {}
+_explained_lock = threading.Lock()
+
+
+@signals.task_prerun.connect
+def _task_started(sender=None, task=None, **kwargs):
+	_task_name.set(getattr(task, "name", None))
+
+
+@signals.task_postrun.connect
+def _task_finished(**kwargs):
+	_task_name.set(None)
+
+
+def current_origin():
+	task = _task_name.get()
+	if task:
+		return f"task:{task}"
+	request = current_request()
+	if request is None:
+		return "other"
+	match = getattr(request, "resolver_match", None)
+	return f"view:{match.view_name}" if match is not None else f"path:{request.path}"
+
+
+def _cooldown_passed(sql):
+	key = hashlib.sha1(sql.encode()).hexdigest()
+	now = time.monotonic()
+	with _explained_lock:
+		last = _explained_at.get(key)
+		if last is not None and now - last < settings.SLOW_QUERY_EXPLAIN_COOLDOWN_SECONDS:
+			return False
+		if len(_explained_at) >= _MAX_TRACKED_STATEMENTS:
+			_explained_at.clear()
+		_explained_at[key] = now
+		return True
+
+
+def _explain(connection, sql, params):
+	if connection.vendor == "postgresql":
+		statement = f"EXPLAIN (ANALYZE, BUFFERS) {sql}"
+	elif connection.vendor == "sqlite":
+		statement = f"EXPLAIN QUERY PLAN {sql}"
+	else:
+		return None
+	token = _explaining.set(True)
+	# Inside the caller's transaction, a failed EXPLAIN (e.g. statement_timeout
+	# on the re-run) would abort it on PostgreSQL; a savepoint contains that
+	savepoint = transaction.atomic(using=connection.alias) if connection.in_atomic_block else nullcontext()
+	try:
+		with savepoint, connection.cursor() as cursor:
+			cursor.execute(statement, params)
+			return "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+	except Exception as exc:  # the plan is best effort; never fail the caller
+		return f"<EXPLAIN failed: {exc}>"
+	finally:
+		_explaining.reset(token)
+
+
+def _can_explain(connection, sql, many):
+	return (
+		not many
+		and sql.lstrip()[:6].upper() == "SELECT"
+		# A failed statement leaves PostgreSQL's transaction unusable
+		and not connection.needs_rollback
+	)
+
+
+def _slow_query_wrapper(execute, sql, params, many, context):
+	threshold_ms = settings.SLOW_QUERY_THRESHOLD_MS
+	if not threshold_ms or _explaining.get():
+		return execute(sql, params, many, context)
+	start = time.perf_counter()
+	result = execute(sql, params, many, context)
+	elapsed_ms = (time.perf_counter() - start) * 1000
+	if elapsed_ms < threshold_ms:
+		return result
+
+	origin = current_origin()
+	SLOW_QUERIES.labels(origin).inc()
+	if not _log_limiter.allow(settings.SLOW_QUERY_LOGS_PER_MINUTE):
+		return result
+	connection = context["connection"]
+	plan = None
+	if (
+		_can_explain(connection, sql, many)
+		and _cooldown_passed(sql)
+		and _explain_limiter.allow(settings.SLOW_QUERY_EXPLAINS_PER_MINUTE)
+	):
+		plan = _explain(connection, sql, params)
+	logger.warning(
+		"Slow query %.1f ms [%s] on %s\nSQL: %s\nParams: %r%s",
+		elapsed_ms, origin, connection.alias, sql, params,
+		f"\nPlan:\n{plan}" if plan else "",
+		extra={"duration_ms": elapsed_ms, "origin": origin, "sql": sql},
+	)
+	return result
+
+
+def install_slow_query_logger(sender, connection, **kwargs):
+	"""connection_created receiver; see install_query_recorder."""
+	if _slow_query_wrapper not in connection.execute_wrappers:
+		connection.execute_wrappers.append(_slow_query_wrapper)
@@ -0,0 +1,9 @@
+"""Small statistics helpers shared by the benchmark and load-test commands."""
+
+
+def percentile(sorted_values, pct):
+	"""Nearest-rank `pct` percentile of an already sorted list; 0.0 when it is empty."""
+	if not sorted_values:
+		return 0.0
+	index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+	return sorted_values[index]
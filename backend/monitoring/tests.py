@@ -0,0 +1,607 @@
+from datetime import date, timedelta
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from billing.models import Subscription
+from tasks.models import Task
+from . import metrics
+
+User = get_user_model()
+
+
+class PrometheusMiddlewareTest(TestCase):
+	"""Tests for request metrics and the /metrics endpoint"""
+
+	def setUp(self):
+		self.user = User.objects.create_user(username='testuser1', password='Test1234#')
+		Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		Task.objects.create(user=self.user, title='Task', due_date=date.today())
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.user)
+
+	def _sample(self, name, **labels):
+		from prometheus_client import REGISTRY
+		return REGISTRY.get_sample_value(name, labels) or 0
+
+	def test_records_latency_size_and_queries_per_route(self):
+		"""Test that a request is counted under its route with its SQL query count"""
+		labels = {'method': 'GET', 'route': '/api/dashboard/'}
+		before_requests = self._sample('http_requests_total', status='200', **labels)
+		before_queries = self._sample('http_request_db_queries_sum', **labels)
+		before_latency = self._sample('http_request_duration_seconds_count', **labels)
+		response = self.client.get('/api/dashboard/')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(self._sample('http_requests_total', status='200', **labels), before_requests + 1)
+		self.assertEqual(self._sample('http_request_duration_seconds_count', **labels), before_latency + 1)
+		self.assertGreater(self._sample('http_request_db_queries_sum', **labels), before_queries)
+		self.assertGreater(self._sample('http_response_size_bytes_sum', **labels), 0)
+
+	def test_unresolved_paths_share_one_route_label(self):
+		"""Test that 404s for arbitrary paths do not create new label values"""
+		self.client.get('/no/such/path/1')
+		self.client.get('/no/such/path/2')
+		self.assertGreaterEqual(
+			self._sample('http_requests_total', method='GET', route='<unresolved>', status='404'), 2
+		)
+
+	def test_metrics_endpoint_serves_exposition_format(self):
+		"""Test that /metrics returns Prometheus text including the request histograms"""
+		self.client.get('/api/dashboard/')
+		response = self.client.get('/metrics')
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(response['Content-Type'].startswith('text/plain'))
+		self.assertIn(b'http_request_duration_seconds_bucket{', response.content)
+		self.assertIn(metrics.DB_TIME._name.encode(), response.content)
+
+
+class JobRunTest(TestCase):
+	"""Tests for periodic job run history"""
+
+	def test_periodic_task_run_is_recorded(self):
+		"""Test that a beat-scheduled task leaves a JobRun with timings and row counts"""
+		from tasks.tasks import flag_overdue_tasks
+		from .models import JobRun
+		user = User.objects.create_user(username='testuser1', password='Test1234#')
+		Task.objects.create(user=user, title='Late', due_date=date.today() - timedelta(days=2))
+		flag_overdue_tasks.apply()
+		run = JobRun.objects.get(task_name='tasks.tasks.flag_overdue_tasks')
+		self.assertEqual(run.status, JobRun.STATUS_SUCCESS)
+		self.assertEqual((run.rows_scanned, run.rows_written), (1, 1))
+		self.assertIsNotNone(run.duration_seconds)
+		self.assertEqual(run.result['overdue_tasks_flagged'], 1)
+
+	def test_failed_run_is_recorded_and_exported(self):
+		"""Test that failures keep the error and show up on /metrics"""
+		from unittest.mock import patch
+		from tasks.tasks import archive_completed_tasks
+		from .models import JobRun
+		with patch('tasks.tasks._archivable_tasks', side_effect=RuntimeError('boom')):
+			result = archive_completed_tasks.apply(throw=False)
+		self.assertTrue(result.failed())
+		run = JobRun.objects.get(task_name='tasks.tasks.archive_completed_tasks')
+		self.assertEqual(run.status, JobRun.STATUS_FAILURE)
+		self.assertEqual(run.error, 'RuntimeError: boom')
+		body = self.client.get('/metrics').content.decode()
+		self.assertIn('celery_job_last_run_failed{task="tasks.tasks.archive_completed_tasks"} 1.0', body)
+		self.assertIn('celery_job_runs_last_7d{status="failure",task="tasks.tasks.archive_completed_tasks"} 1.0', body)
+
+	def test_unscheduled_tasks_are_ignored(self):
+		"""Test that only beat-scheduled tasks are recorded"""
+		from tasks.tasks import flag_overdue_tasks
+		from .models import JobRun
+		with override_settings(CELERY_BEAT_SCHEDULE={}):
+			flag_overdue_tasks.apply()
+		self.assertFalse(JobRun.objects.exists())
+
+
+class RequestProfilingTest(TestCase):
+	"""Tests for token-gated per-request profiling"""
+
+	def setUp(self):
+		self.profile_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.profile_dir, True)
+		overrides = override_settings(PROFILING_DIR=self.profile_dir)
+		overrides.enable()
+		self.addCleanup(overrides.disable)
+		self.staff = User.objects.create_user(username='staff', password='Test1234#', is_staff=True)
+		self.user = User.objects.create_user(username='testuser1', password='Test1234#')
+		Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		Task.objects.create(user=self.user, title='Task', due_date=date.today())
+		staff_client = APIClient()
+		staff_client.force_authenticate(user=self.staff)
+		self.staff_client = staff_client
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.user)
+
+	def _token(self, username):
+		response = self.staff_client.post('/api/monitoring/profile-token/', {'username': username}, format='json')
+		self.assertEqual(response.status_code, 200)
+		return response.data['token']
+
+	def test_profiled_request_stores_pstats_and_sql(self):
+		"""Test that a tokened request is profiled and staff can download the results"""
+		import json
+		import pstats
+		token = self._token('testuser1')
+		response = self.client.get('/api/dashboard/', HTTP_X_PROFILE_TOKEN=token)
+		self.assertEqual(response.status_code, 200)
+		profile_id = response['X-Profile-Id']
+		download = self.staff_client.get(f'/api/monitoring/profiles/{profile_id}/sql/')
+		self.assertEqual(download.status_code, 200)
+		log = json.loads(b''.join(download.streaming_content))
+		self.assertEqual(log['path'], '/api/dashboard/')
+		self.assertEqual(log['query_count'], len(log['queries']))
+		self.assertGreater(log['query_count'], 0)
+		stats = pstats.Stats(f'{self.profile_dir}/{profile_id}.prof')
+		self.assertTrue(any('dashboard' in func[2] for func in stats.stats))
+		self.assertEqual(self.client.get(f'/api/monitoring/profiles/{profile_id}/sql/').status_code, 403)
+
+	def test_requests_without_valid_token_are_not_profiled(self):
+		"""Test that missing, forged and other users' tokens leave the request alone"""
+		import os
+		self.assertNotIn('X-Profile-Id', self.client.get('/api/dashboard/'))
+		self.assertNotIn('X-Profile-Id', self.client.get('/api/dashboard/?_profile=forged'))
+		staff_token = self._token('staff')
+		self.assertNotIn('X-Profile-Id', self.client.get('/api/dashboard/', HTTP_X_PROFILE_TOKEN=staff_token))
+		self.assertEqual(os.listdir(self.profile_dir), [])
+
+	def test_overlapping_request_is_served_unprofiled(self):
+		"""Test that a second tokened request while one is profiled skips profiling instead of failing"""
+		from .profiling import _profiling
+		token = self._token('testuser1')
+		with _profiling:
+			response = self.client.get('/api/dashboard/', HTTP_X_PROFILE_TOKEN=token)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response['X-Profile-Skipped'], 'busy')
+		self.assertNotIn('X-Profile-Id', response)
+		self.assertIn('X-Profile-Id', self.client.get('/api/dashboard/', HTTP_X_PROFILE_TOKEN=token))
+
+	def test_profiler_that_cannot_start_is_skipped(self):
+		"""Test that enable() failing (another profiler active) still serves the request"""
+		import cProfile
+		from unittest.mock import patch
+		token = self._token('testuser1')
+		error = ValueError('Another profiling tool is already active')
+		with patch.object(cProfile.Profile, 'enable', side_effect=error):
+			response = self.client.get('/api/dashboard/', HTTP_X_PROFILE_TOKEN=token)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response['X-Profile-Skipped'], 'unavailable')
+		self.assertIn('X-Profile-Id', self.client.get('/api/dashboard/', HTTP_X_PROFILE_TOKEN=token))
+
+	async def test_async_requests_say_they_were_not_profiled(self):
+		"""Test that async views pass through with a header explaining why"""
+		import os
+		from asgiref.sync import sync_to_async
+		from django.test import AsyncClient
+		from rest_framework_simplejwt.tokens import AccessToken
+		token = await sync_to_async(self._token)('testuser1')
+		access = await sync_to_async(AccessToken.for_user)(self.user)
+		response = await AsyncClient().get(
+			'/api/async/dashboard/', headers={'Authorization': f'Bearer {access}', 'X-Profile-Token': token},
+		)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response['X-Profile-Skipped'], 'async')
+		self.assertEqual(os.listdir(self.profile_dir), [])
+
+	def test_only_staff_can_mint_tokens(self):
+		"""Test that regular users cannot enable profiling"""
+		response = self.client.post('/api/monitoring/profile-token/', {'username': 'testuser1'}, format='json')
+		self.assertEqual(response.status_code, 403)
+
+
+class SlowQueryLogTest(TestCase):
+	"""Tests for the slow query log"""
+
+	def setUp(self):
+		from unittest.mock import patch
+		from . import slow_queries
+		self.user = User.objects.create_user(username='testuser1', password='Test1234#')
+		Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		# Fresh limits, so the setup's own queries do not count against them
+		for name, value in (
+			('_log_limiter', slow_queries._RateLimiter()),
+			('_explain_limiter', slow_queries._RateLimiter()),
+			('_explained_at', {}),
+		):
+			patcher = patch.object(slow_queries, name, value)
+			patcher.start()
+			self.addCleanup(patcher.stop)
+		# Each test makes every statement slow with a method-level override, so
+		# setUp and the savepoint teardown are not logged
+
+	@override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_EXPLAINS_PER_MINUTE=100)
+	def test_slow_select_in_view_is_logged_with_plan(self):
+		"""Test that a slow SELECT names its view and carries the query plan"""
+		client = APIClient()
+		client.force_authenticate(user=self.user)
+		with self.assertLogs('monitoring.slow_queries', 'WARNING') as logs:
+			client.get('/api/tasks/')
+		task_logs = [line for line in logs.output if 'FROM "tasks_task"' in line]
+		self.assertTrue(task_logs)
+		self.assertIn('[view:tasks:task-list]', task_logs[0])
+		self.assertIn('Plan:', task_logs[0])
+
+	@override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_EXPLAINS_PER_MINUTE=100)
+	def test_celery_task_origin_and_explain_cooldown(self):
+		"""Test that job queries name the task and each statement is explained once"""
+		from tasks.tasks import flag_overdue_tasks
+		with self.assertLogs('monitoring.slow_queries', 'WARNING') as logs:
+			flag_overdue_tasks.apply()
+			flag_overdue_tasks.apply()
+		job_logs = [line for line in logs.output if 'tasks.tasks.flag_overdue_tasks' in line]
+		self.assertTrue(job_logs)
+		counts = [line for line in job_logs if 'SELECT COUNT(*)' in line]
+		self.assertEqual(len([line for line in counts if 'Plan:' in line]), 2)  # two distinct count queries
+		self.assertGreater(len(counts), 2)
+
+	@override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_EXPLAINS_PER_MINUTE=100)
+	def test_explain_inside_a_transaction_runs_in_a_savepoint(self):
+		"""Test that a failing EXPLAIN cannot abort the caller's transaction"""
+		from django.db import connection, transaction
+		from django.test.utils import CaptureQueriesContext
+		with self.assertLogs('monitoring.slow_queries', 'WARNING'), transaction.atomic():
+			with CaptureQueriesContext(connection) as ctx:
+				User.objects.filter(username='testuser1').first()
+		statements = [query['sql'] for query in ctx.captured_queries]
+		explain = next(i for i, sql in enumerate(statements) if sql.startswith('EXPLAIN'))
+		self.assertTrue(statements[explain - 1].startswith('SAVEPOINT'))
+		self.assertTrue(statements[explain + 1].startswith('RELEASE SAVEPOINT'))
+
+	@override_settings(
+		SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_EXPLAINS_PER_MINUTE=100, SLOW_QUERY_LOGS_PER_MINUTE=1,
+	)
+	def test_log_lines_are_rate_limited(self):
+		"""Test that the log stops after the per-minute cap"""
+		with self.assertLogs('monitoring.slow_queries', 'WARNING') as logs:
+			for _ in range(5):
+				User.objects.count()
+		self.assertEqual(len(logs.output), 1)
+
+
+class NPlusOneDetectorTest(TestCase):
+	"""Tests for the repeated-query detector"""
+
+	def setUp(self):
+		self.user = User.objects.create_user(username='testuser1', password='Test1234#')
+		Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.user)
+
+	def test_fingerprint_collapses_literals_and_in_lists(self):
+		"""Test that statements differing only in values share a fingerprint"""
+		from .nplusone import fingerprint
+		self.assertEqual(
+			fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'a' LIMIT 21"),
+			fingerprint("SELECT * FROM t WHERE id IN (%s) AND name = 'bb' LIMIT 5"),
+		)
+
+	@override_settings(NPLUSONE_MODE='header', NPLUSONE_THRESHOLD=3)
+	def test_header_mode_names_the_calling_frame(self):
+		"""Test that a per-row query loop is reported in the response header"""
+		from unittest.mock import patch
+		from tasks.models import TaskTemplate
+		for i in range(5):
+			TaskTemplate.objects.create(user=self.user, name=f'T{i}')
+		# Drop the prefetch to reintroduce a per-template items query
+		with patch('tasks.views.TaskTemplateViewSet.get_queryset', lambda view: TaskTemplate.objects.filter(user=self.user)):
+			with self.assertLogs('monitoring.nplusone', 'WARNING'):
+				response = self.client.get('/api/tasks/templates/')
+		self.assertIn('X-NPlusOne', response)
+		self.assertIn('tasks_tasktemplateitem', response['X-NPlusOne'])
+		self.assertNotIn('X-NPlusOne', self.client.get('/api/tasks/'))
+
+	@override_settings(NPLUSONE_MODE='raise', NPLUSONE_THRESHOLD=2)
+	def test_raise_mode_in_celery_task(self):
+		"""Test that raise mode stops a job at the repeated query with its frame"""
+		from .nplusone import NPlusOneError
+		from tasks.tasks import create_recurring_tasks
+		for i in range(4):
+			Task.objects.create(
+				user=self.user, title=f'Daily {i}', due_date=date.today() - timedelta(days=3),
+				is_recurring=True, recurrence_type='daily',
+			)
+		with self.assertRaises(NPlusOneError) as ctx:
+			create_recurring_tasks.apply()
+		self.assertIn('task tasks.tasks.create_recurring_tasks', str(ctx.exception))
+		self.assertIn('tasks/tasks.py', str(ctx.exception))
+
+	def test_off_by_default_outside_debug(self):
+		"""Test that nothing is tracked when the mode is off"""
+		from .nplusone import _tracker
+		self.assertIsNone(_tracker.get())
+		self.assertNotIn('X-NPlusOne', self.client.get('/api/tasks/'))
+
+
+class EndpointBenchmarkTest(TestCase):
+	"""Tests for the seeded endpoint benchmark and its baseline check"""
+
+	def setUp(self):
+		self.work_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.work_dir, True)
+		self.baseline = f'{self.work_dir}/baseline.json'
+
+	def _bench(self, **options):
+		from io import StringIO
+		from django.core.management import call_command
+		call_command(
+			'bench_endpoints', '--current-db', users=2, tasks_per_user=25, recurring_per_user=5,
+			templates_per_user=1, iterations=2, job_iterations=1, warmup=0,
+			scenarios='tasks_list_first_page,dashboard_week,create_from_template,create_recurring_tasks',
+			stdout=StringIO(), stderr=StringIO(), **options
+		)
+
+	def test_records_baseline_and_leaves_no_data(self):
+		"""Test that a run writes percentiles and query counts and rolls its dataset back"""
+		import json
+		self._bench(save_baseline=self.baseline)
+		with open(self.baseline) as f:
+			baseline = json.load(f)
+		self.assertEqual(baseline['dataset']['tasks_per_user'], 25)
+		row = baseline['scenarios']['create_recurring_tasks']
+		self.assertGreater(row['queries'], 5)
+		self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+		self.assertFalse(User.objects.exists())
+		self.assertFalse(Task.objects.exists())
+		self._bench(baseline=self.baseline, tolerance=100.0, min_delta_ms=10000)
+
+	def test_fails_on_regression(self):
+		"""Test that more queries than the baseline, or a different dataset, fail the run"""
+		import json
+		from django.core.management.base import CommandError
+		self._bench(save_baseline=self.baseline)
+		with open(self.baseline) as f:
+			baseline = json.load(f)
+		baseline['scenarios']['dashboard_week']['queries'] -= 1
+		with open(self.baseline, 'w') as f:
+			json.dump(baseline, f)
+		with self.assertRaisesMessage(CommandError, '1 regression(s)'):
+			self._bench(baseline=self.baseline, tolerance=100.0, min_delta_ms=10000)
+		with self.assertRaisesMessage(CommandError, 'same volumes'):
+			self._bench(baseline=self.baseline, seed=1)
+
+
+class GenerateDataTest(TestCase):
+	"""Tests for the synthetic data generator"""
+
+	def _generate(self, **options):
+		from io import StringIO
+		from django.core.management import call_command
+		options = dict(dict(users=4, tasks_per_user=30, recurring_per_user=5, templates_per_user=2, items_per_template=3), **options)
+		call_command('generate_data', '--force', stdout=StringIO(), **options)
+
+	def _snapshot(self):
+		return sorted(Task.objects.values_list(
+			'user__username', 'title', 'due_date', 'category', 'label', 'completed', 'recurrence_type',
+			'parent_task__title',
+		))
+
+	def test_generates_every_kind_of_row(self):
+		"""Test that users get profiles, subscriptions, tasks, series of every type and templates"""
+		from accounts.models import Profile
+		from tasks.models import TaskTemplate, TaskTemplateItem
+		self._generate()
+		self.assertEqual(User.objects.filter(username__startswith='load-').count(), 4)
+		self.assertEqual(Profile.objects.count(), 4)
+		self.assertEqual(Subscription.objects.count(), 4)
+		self.assertEqual(Task.objects.filter(is_recurring=False, parent_task__isnull=True).count(), 120)
+		self.assertEqual(
+			set(Task.objects.filter(is_recurring=True).values_list('recurrence_type', flat=True)),
+			{'daily', 'weekly', 'monthly', 'yearly', 'custom'},
+		)
+		self.assertTrue(Task.objects.filter(parent_task__isnull=False).exists())
+		self.assertEqual(TaskTemplate.objects.count(), 8)
+		self.assertEqual(TaskTemplateItem.objects.count(), 24)
+		self.assertGreater(len({task.created_at.date() for task in Task.objects.all()}), 1)
+
+	def test_output_is_deterministic(self):
+		"""Test that the same seed gives the same rows however the users are chunked"""
+		self._generate()
+		first = self._snapshot()
+		User.objects.filter(username__startswith='load-').delete()
+		self._generate(chunk_users=1)
+		self.assertEqual(self._snapshot(), first)
+		User.objects.filter(username__startswith='load-').delete()
+		self._generate(seed=1)
+		self.assertNotEqual(self._snapshot(), first)
+
+	def test_refuses_existing_prefix(self):
+		"""Test that generating twice under one prefix is rejected"""
+		from django.core.management.base import CommandError
+		self._generate(users=1)
+		with self.assertRaises(CommandError):
+			self._generate(users=1)
+
+
+class LoadDriverTest(LiveServerTestCase):
+	"""Tests for the async HTTP load driver against a live server"""
+
+	def test_histogram_percentiles_are_within_one_percent(self):
+		"""Test that the log-linear histogram reports values to 1% precision"""
+		from .loadgen import LatencyHistogram
+		histogram = LatencyHistogram()
+		for value in range(1, 100001):
+			histogram.record(value)
+		for pct in (50, 90, 99, 99.9):
+			expected = pct / 100 * 100000
+			self.assertAlmostEqual(histogram.percentile(pct), expected, delta=expected * 0.01)
+		self.assertEqual(histogram.percentile(100), 100000)
+		self.assertEqual(histogram.min, 1)
+
+	def test_mix_runs_against_server(self):
+		"""Test that every action in the mix is exercised with per-user logins"""
+		import asyncio
+		from monitoring import seed
+		from .loadgen import LoadDriver
+		# One client: the live server shares a single in-memory SQLite connection across its threads
+		users = seed.seed_users(2, prefix='load', password='Load-pass-1')
+		seed.seed_user_data(users, tasks_per_user=20)
+		driver = LoadDriver(
+			self.live_server_url, [user.username for user in users], 'Load-pass-1',
+			mix={'login': 1, 'list': 3, 'create': 2, 'complete': 2, 'dashboard': 2}, clients=1, duration=1.5,
+		)
+		report = asyncio.run(driver.run())
+		self.assertEqual(driver.error_samples, {})
+		for action in ('login', 'list', 'create', 'complete', 'dashboard', 'all'):
+			self.assertGreater(report['endpoints'][action]['count'], 0, action)
+		self.assertTrue(Task.objects.filter(title__startswith='Load test task').exists())
+		row = report['endpoints']['all']
+		self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+		self.assertLessEqual(row['p99_ms'], row['max_ms'])
+
+
+class TracingTest(TestCase):
+	"""Tests for span tracing and its file exporter"""
+
+	def setUp(self):
+		from . import tracing
+		self.tracing = tracing
+		work_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, work_dir, True)
+		self.trace_file = f'{work_dir}/spans.jsonl'
+		overrides = override_settings(TRACING_EXPORTER='file', TRACING_FILE=self.trace_file, TRACING_SAMPLE_RATE=1.0)
+		overrides.enable()
+		self.addCleanup(overrides.disable)
+		tracing.install()
+		self.user = User.objects.create_user(username='testuser1', password='Test1234#')
+		Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		Task.objects.create(user=self.user, title='Task', due_date=date.today())
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.user)
+
+	def _spans(self):
+		import json
+		import os
+		self.tracing.flush()
+		if not os.path.exists(self.trace_file):
+			return []
+		with open(self.trace_file) as f:
+			return [
+				span
+				for line in f
+				for resource in json.loads(line)['resourceSpans']
+				for scope in resource['scopeSpans']
+				for span in scope['spans']
+			]
+
+	def test_request_trace_covers_view_serializer_and_sql(self):
+		"""Test that a sampled request exports a root, view, serializer and query spans"""
+		response = self.client.get('/api/tasks/')
+		self.assertEqual(response.status_code, 200)
+		spans = self._spans()
+		self.assertEqual({span['traceId'] for span in spans}, {response['X-Trace-Id']})
+		root = next(span for span in spans if 'parentSpanId' not in span)
+		self.assertTrue(root['name'].startswith('GET /api/tasks/'))
+		self.assertEqual(root['kind'], self.tracing.SERVER)
+		view = next(span for span in spans if span['name'].startswith('view '))
+		self.assertEqual(view['parentSpanId'], root['spanId'])
+		names = {span['name'] for span in spans}
+		self.assertIn('serialize TaskSerializer[]', names)
+		self.assertIn('db.query', names)
+
+	def test_traceparent_reaches_celery_task(self):
+		"""Test that a task enqueued inside a trace joins it through the message header"""
+		from celery import signals
+		from tasks.tasks import flag_overdue_tasks
+		tracing = self.tracing
+		root = tracing._start_root('enqueue', tracing.SERVER, None, {})
+		token = tracing._current.set(root)
+		headers = {'id': 'task-1'}
+		signals.before_task_publish.send(sender='tasks.tasks.flag_overdue_tasks', headers=headers)
+		signals.after_task_publish.send(sender='tasks.tasks.flag_overdue_tasks', headers=headers)
+		tracing._current.reset(token)
+		tracing._finish_root(root)
+
+		# As a worker would run it: no active span, context only in the headers
+		flag_overdue_tasks.apply(headers={'traceparent': headers['traceparent']})
+		spans = self._spans()
+		self.assertEqual({span['traceId'] for span in spans}, {root.trace_id})
+		publish = next(span for span in spans if span['name'].startswith('celery.publish'))
+		run = next(span for span in spans if span['name'] == 'celery.task tasks.tasks.flag_overdue_tasks')
+		self.assertEqual(publish['parentSpanId'], root.span_id)
+		self.assertEqual(run['parentSpanId'], publish['spanId'])
+		self.assertTrue(any(span.get('parentSpanId') == run['spanId'] for span in spans))
+
+	def test_sampling_decision_is_followed(self):
+		"""Test that unsampled requests export nothing and an upstream traceparent wins"""
+		with override_settings(TRACING_SAMPLE_RATE=0.0):
+			response = self.client.get('/api/tasks/')
+			self.assertNotIn('X-Trace-Id', response)
+			self.assertEqual(self._spans(), [])
+			parent = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+			response = self.client.get('/api/tasks/', HTTP_TRACEPARENT=parent)
+		self.assertEqual(response['X-Trace-Id'], '0af7651916cd43dd8448eb211c80319c')
+		root = next(span for span in self._spans() if span['kind'] == self.tracing.SERVER)
+		self.assertEqual(root['parentSpanId'], 'b7ad6b7169203331')
+
+
+class StartupReportTest(TestCase):
+	"""Tests for the cold-start import report"""
+
+	def test_parses_importtime_output(self):
+		"""Test that the header is skipped and self/cumulative times are read"""
+		from .management.commands.startup_report import parse_importtime
+		text = (
+			"import time: self [us] | cumulative | imported package\n"
+			"import time:       120 |        120 |   json.decoder\n"
+			"import time:       300 |        420 | json\n"
+		)
+		self.assertEqual(parse_importtime(text), [('json.decoder', 120, 120), ('json', 300, 420)])
+
+	def test_reports_boot_and_keeps_deferred_modules_out(self):
+		"""Test that both processes boot without Pillow or the schema views"""
+		import json
+		from io import StringIO
+		from django.core.management import call_command
+		path = f"{tempfile.mkdtemp()}/startup.json"
+		self.addCleanup(shutil.rmtree, path.rsplit('/', 1)[0])
+		call_command('startup_report', runs=1, budget_ms=0, json=path, stdout=StringIO())
+		with open(path) as handle:
+			report = json.load(handle)
+		self.assertEqual(set(report), {'wsgi', 'celery'})
+		for target in report.values():
+			self.assertGreater(target['median_ms'], 0)
+			self.assertIn('django', target['packages_ms'])
+			self.assertEqual(target['eager_deferred_modules'], [])
+
+	def test_fails_over_budget(self):
+		"""Test that a boot slower than the budget is an error"""
+		from io import StringIO
+		from django.core.management import call_command
+		from django.core.management.base import CommandError
+		with self.assertRaisesRegex(CommandError, 'over its 1ms budget'):
+			call_command('startup_report', target=['wsgi'], runs=1, budget_ms=1, stdout=StringIO())
@@ -0,0 +1,534 @@
+"""
+Lightweight span tracing for requests and Celery tasks.
+
+A sampled request gets a trace: a root span covering the whole middleware
+stack, a view span, and child spans for serializer work, SQL statements,
+cache calls and Celery dispatch. Time in the root span but outside the view
+span is middleware. Tasks enqueued while a trace is active carry a W3C
+``traceparent`` header, so the worker's span joins the same trace; tasks
+enqueued outside a request start their own trace.
+
+Sampling is decided once per trace: an incoming ``traceparent`` header
+decides for requests, the message header for tasks, TRACING_SAMPLE_RATE
+otherwise. Unsampled traces record nothing but still propagate their
+decision, so a job is never sampled without the request that enqueued it.
+
+Finished traces are written by a background thread, as OTLP/JSON
+(ExportTraceServiceRequest) either one per line to TRACING_FILE (what an
+OpenTelemetry collector's otlpjsonfile receiver reads) or POSTed to
+TRACING_OTLP_ENDPOINT. TRACING_EXPORTER is ``file``, ``otlp`` or empty (off).
+"""
+from contextvars import ContextVar
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from celery import signals
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .middleware import _route
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT, PRODUCER, CONSUMER = 1, 2, 3, 4, 5
+# OTLP status codes
+STATUS_OK, STATUS_ERROR = 1, 2
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_MAX_STATEMENT = 2000
+
+_current = ContextVar("tracing_span", default=None)
+
+
+def _new_id(bits):
+	return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+class SpanContext:
+	"""Where a trace stands: its id, the active span's id and the sampling decision."""
+
+	__slots__ = ("trace_id", "span_id", "sampled")
+
+	def __init__(self, trace_id, span_id, sampled):
+		self.trace_id = trace_id
+		self.span_id = span_id
+		self.sampled = sampled
+
+	def traceparent(self):
+		return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value):
+	match = _TRACEPARENT.match((value or "").strip().lower())
+	if match is None or set(match.group(1)) == {"0"} or set(match.group(2)) == {"0"}:
+		return None
+	return SpanContext(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+
+class _Trace:
+	"""The spans of one trace recorded in this process, exported together."""
+
+	__slots__ = ("trace_id", "spans", "dropped")
+
+	def __init__(self, trace_id):
+		self.trace_id = trace_id
+		self.spans = []
+		self.dropped = 0
+
+
+class Span(SpanContext):
+	__slots__ = ("trace", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "status", "status_message")
+
+	def __init__(self, trace, name, kind, parent_id, attributes):
+		super().__init__(trace.trace_id, _new_id(64), True)
+		self.trace = trace
+		self.parent_id = parent_id
+		self.name = name
+		self.kind = kind
+		self.attributes = attributes
+		self.status = None
+		self.status_message = ""
+		self.start_ns = time.time_ns()
+		self.end_ns = None
+
+	def set_attribute(self, key, value):
+		self.attributes[key] = value
+
+	def set_error(self, exc):
+		self.status = STATUS_ERROR
+		self.status_message = f"{type(exc).__name__}: {exc}"[:500]
+
+	def end(self):
+		self.end_ns = time.time_ns()
+		trace = self.trace
+		if len(trace.spans) < settings.TRACING_MAX_SPANS_PER_TRACE:
+			trace.spans.append(self)
+		else:
+			trace.dropped += 1
+
+
+def current_span():
+	"""The active Span or unsampled SpanContext in this context, if any."""
+	return _current.get()
+
+
+def _start_root(name, kind, parent, attributes):
+	"""A local root: a Span if the trace is sampled, else a bare SpanContext to propagate."""
+	if parent is None:
+		parent = SpanContext(_new_id(128), None, random.random() < settings.TRACING_SAMPLE_RATE)
+	if not parent.sampled:
+		return SpanContext(parent.trace_id, parent.span_id or _new_id(64), False)
+	return Span(_Trace(parent.trace_id), name, kind, parent.span_id, attributes)
+
+
+def _finish_root(root):
+	if isinstance(root, Span):
+		root.end()
+		if root.trace.dropped:
+			root.set_attribute("tracing.dropped_spans", root.trace.dropped)
+		_exporter.submit(root.trace.spans)
+
+
+def start_span(name, kind=INTERNAL, **attributes):
+	"""Child of the active span, or None when nothing is being sampled."""
+	parent = _current.get()
+	if parent is None or not parent.sampled:
+		return None
+	return Span(parent.trace, name, kind, parent.span_id, attributes)
+
+
+class span:
+	"""
+	Context manager and decorator recording a child span of the active one;
+	free when the current trace is not sampled.
+	"""
+
+	def __init__(self, name, kind=INTERNAL, **attributes):
+		self.name = name
+		self.kind = kind
+		self.attributes = attributes
+		self._stack = []
+
+	def __enter__(self):
+		child = start_span(self.name, self.kind, **dict(self.attributes))
+		self._stack.append((child, _current.set(child) if child is not None else None))
+		return child
+
+	def __exit__(self, exc_type, exc, tb):
+		child, token = self._stack.pop()
+		if child is not None:
+			_current.reset(token)
+			if exc is not None:
+				child.set_error(exc)
+			child.end()
+		return False
+
+	def __call__(self, func):
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			with span(self.name, self.kind, **self.attributes):
+				return func(*args, **kwargs)
+		return wrapper
+
+
+# Export
+
+def _otlp_value(value):
+	if isinstance(value, bool):
+		return {"boolValue": value}
+	if isinstance(value, int):
+		return {"intValue": str(value)}
+	if isinstance(value, float):
+		return {"doubleValue": value}
+	return {"stringValue": str(value)}
+
+
+def _otlp_span(item):
+	data = {
+		"traceId": item.trace_id,
+		"spanId": item.span_id,
+		"name": item.name,
+		"kind": item.kind,
+		"startTimeUnixNano": str(item.start_ns),
+		"endTimeUnixNano": str(item.end_ns),
+		"attributes": [{"key": key, "value": _otlp_value(value)} for key, value in item.attributes.items()],
+	}
+	if item.parent_id:
+		data["parentSpanId"] = item.parent_id
+	if item.status is not None:
+		data["status"] = {"code": item.status, "message": item.status_message}
+	return data
+
+
+def otlp_payload(spans):
+	"""An OTLP/JSON ExportTraceServiceRequest for `spans`."""
+	return {
+		"resourceSpans": [{
+			"resource": {"attributes": [
+				{"key": "service.name", "value": {"stringValue": settings.TRACING_SERVICE_NAME}},
+				{"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+			]},
+			"scopeSpans": [{"scope": {"name": __name__}, "spans": [_otlp_span(item) for item in spans]}],
+		}],
+	}
+
+
+class _Exporter:
+	"""Writes finished traces from a daemon thread; drops them when the queue is full."""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._queue = None
+		self._pid = None
+		self.dropped = 0
+
+	def _ensure_thread(self):
+		# Started lazily, and again in forked children (gunicorn and Celery workers)
+		with self._lock:
+			if self._pid != os.getpid():
+				self._queue = queue.Queue(maxsize=settings.TRACING_QUEUE_SIZE)
+				self._pid = os.getpid()
+				threading.Thread(target=self._run, args=(self._queue,), name="trace-exporter", daemon=True).start()
+			return self._queue
+
+	def submit(self, spans):
+		if not settings.TRACING_EXPORTER or not spans:
+			return
+		try:
+			self._ensure_thread().put_nowait(spans)
+		except queue.Full:
+			self.dropped += 1
+
+	def flush(self, timeout=5.0):
+		"""Wait until everything submitted so far is written (tests, shutdown)."""
+		pending = self._queue if self._pid == os.getpid() else None
+		if pending is None:
+			return
+		deadline = time.monotonic() + timeout
+		while pending.unfinished_tasks and time.monotonic() < deadline:
+			time.sleep(0.01)
+
+	def _run(self, pending):
+		while True:
+			spans = pending.get()
+			try:
+				self._write(otlp_payload(spans))
+			except Exception:  # an exporter problem must never reach the application
+				logger.exception("Trace export failed")
+			finally:
+				pending.task_done()
+
+	def _write(self, payload):
+		body = json.dumps(payload, separators=(",", ":"))
+		if settings.TRACING_EXPORTER == "file":
+			path = settings.TRACING_FILE
+			os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+			with open(path, "a") as f:
+				f.write(body + "\n")
+		elif settings.TRACING_EXPORTER == "otlp":
+			request = urllib.request.Request(
+				settings.TRACING_OTLP_ENDPOINT, data=body.encode(), headers={"Content-Type": "application/json"}
+			)
+			with urllib.request.urlopen(request, timeout=5) as response:
+				response.read()
+
+
+_exporter = _Exporter()
+flush = _exporter.flush
+
+
+# Requests
+
+class TracingMiddleware:
+	"""Root span per request. Place it first in MIDDLEWARE so it covers every other middleware."""
+
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		if not settings.TRACING_EXPORTER:
+			raise MiddlewareNotUsed()
+		self.get_response = get_response
+		if iscoroutinefunction(self.get_response):
+			markcoroutinefunction(self)
+
+	def _start(self, request):
+		root = _start_root(
+			f"{request.method} {request.path}", SERVER,
+			parse_traceparent(request.META.get("HTTP_TRACEPARENT")),
+			{"http.method": request.method, "http.target": request.path},
+		)
+		return root, _current.set(root)
+
+	def _finish(self, request, root, token, response=None, exc=None):
+		_current.reset(token)
+		if isinstance(root, Span):
+			route = _route(request)
+			root.name = f"{request.method} {route}"
+			root.set_attribute("http.route", route)
+			if response is not None:
+				root.set_attribute("http.status_code", response.status_code)
+				if response.status_code >= 500:
+					root.status = STATUS_ERROR
+				response["X-Trace-Id"] = root.trace_id
+			if exc is not None:
+				root.set_error(exc)
+			_finish_root(root)
+		return response
+
+	def __call__(self, request):
+		if iscoroutinefunction(self):
+			return self.__acall__(request)
+		root, token = self._start(request)
+		try:
+			response = self.get_response(request)
+		except BaseException as exc:
+			self._finish(request, root, token, exc=exc)
+			raise
+		return self._finish(request, root, token, response)
+
+	async def __acall__(self, request):
+		root, token = self._start(request)
+		try:
+			response = await self.get_response(request)
+		except BaseException as exc:
+			self._finish(request, root, token, exc=exc)
+			raise
+		return self._finish(request, root, token, response)
+
+
+class TracingViewMiddleware:
+	"""View span: URL resolution, view middleware and the view. Place it last in MIDDLEWARE."""
+
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		if not settings.TRACING_EXPORTER:
+			raise MiddlewareNotUsed()
+		self.get_response = get_response
+		if iscoroutinefunction(self.get_response):
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if iscoroutinefunction(self):
+			return self.__acall__(request)
+		with span("view") as child:
+			response = self.get_response(request)
+			if child is not None:
+				match = getattr(request, "resolver_match", None)
+				child.name = f"view {match.view_name if match is not None else request.path}"
+			return response
+
+	async def __acall__(self, request):
+		with span("view") as child:
+			response = await self.get_response(request)
+			if child is not None:
+				match = getattr(request, "resolver_match", None)
+				child.name = f"view {match.view_name if match is not None else request.path}"
+			return response
+
+
+# ORM, serializers, cache
+
+def _trace_query(execute, sql, params, many, context):
+	parent = _current.get()
+	if parent is None or not parent.sampled:
+		return execute(sql, params, many, context)
+	connection = context["connection"]
+	with span(
+		"db.query", CLIENT,
+		**{"db.system": connection.vendor, "db.alias": connection.alias, "db.statement": sql[:_MAX_STATEMENT]},
+	) as child:
+		if many:
+			child.set_attribute("db.executemany", True)
+		return execute(sql, params, many, context)
+
+
+def install_query_tracer(sender, connection, **kwargs):
+	"""connection_created receiver; see install_query_recorder."""
+	if _trace_query not in connection.execute_wrappers:
+		connection.execute_wrappers.append(_trace_query)
+
+
+def _traced(func, name_for):
+	if getattr(func, "_traced", False):
+		return func
+
+	@functools.wraps(func)
+	def wrapper(self, *args, **kwargs):
+		parent = _current.get()
+		if parent is None or not parent.sampled:
+			return func(self, *args, **kwargs)
+		with span(name_for(self, args)):
+			return func(self, *args, **kwargs)
+	wrapper._traced = True
+	return wrapper
+
+
+def _serializer_name(serializer):
+	child = getattr(serializer, "child", None)
+	return f"{type(child).__name__}[]" if child is not None else type(serializer).__name__
+
+
+def _instrument_serializers():
+	from rest_framework import serializers
+	for cls in (serializers.Serializer, serializers.ListSerializer):
+		prop = cls.__dict__["data"]
+		cls.data = property(_traced(prop.fget, lambda self, args: f"serialize {_serializer_name(self)}"))
+	base = serializers.BaseSerializer
+	base.is_valid = _traced(base.is_valid, lambda self, args: f"validate {_serializer_name(self)}")
+	base.save = _traced(base.save, lambda self, args: f"save {_serializer_name(self)}")
+
+
+_CACHE_METHODS = (
+	"get", "set", "add", "delete", "touch", "incr", "decr", "has_key",
+	"get_many", "set_many", "delete_many", "get_or_set", "clear",
+)
+
+
+def _instrument_caches():
+	from django.core.cache import caches
+	for alias in settings.CACHES:
+		cls = type(caches[alias])
+		for method in _CACHE_METHODS:
+			func = getattr(cls, method, None)
+			if func is not None:
+				setattr(cls, method, _traced(func, lambda self, args, method=method: f"cache.{method}"))
+
+
+_installed = False
+
+
+def install():
+	"""Hook tracing into every connection, DRF serializers and cache backends. Idempotent."""
+	global _installed
+	if _installed:
+		return
+	_installed = True
+	from django.db import connections
+	from django.db.backends.signals import connection_created
+	connection_created.connect(install_query_tracer)
+	for connection in connections.all(initialized_only=True):
+		install_query_tracer(None, connection)
+	_instrument_serializers()
+	_instrument_caches()
+
+
+# Celery: dispatch spans and context propagation on the producer side, a span per run on the worker
+
+_publishing = {}
+_runs = {}
+
+
+@signals.before_task_publish.connect
+def _task_publishing(sender=None, headers=None, **kwargs):
+	parent = _current.get()
+	if parent is None or headers is None:
+		return
+	producer = start_span(f"celery.publish {sender}", PRODUCER, **{"celery.task": str(sender)})
+	headers["traceparent"] = (producer or parent).traceparent()
+	if producer is not None:
+		_publishing[headers.get("id")] = producer
+
+
+@signals.after_task_publish.connect
+def _task_published(sender=None, headers=None, **kwargs):
+	producer = _publishing.pop((headers or {}).get("id"), None)
+	if producer is not None:
+		producer.end()
+
+
+def _message_context(task):
+	request = getattr(task, "request", None)
+	value = getattr(request, "traceparent", None) or (getattr(request, "headers", None) or {}).get("traceparent")
+	return parse_traceparent(value)
+
+
+@signals.task_prerun.connect
+def _task_started(sender=None, task_id=None, task=None, **kwargs):
+	if not settings.TRACING_EXPORTER or task is None:
+		return
+	name = f"celery.task {task.name}"
+	attributes = {"celery.task": task.name, "celery.task_id": task_id or ""}
+	parent = _current.get()
+	if parent is not None:
+		# Eager or nested call: part of the caller's trace
+		run, local_root = start_span(name, CONSUMER, **attributes), False
+		if run is None:
+			return
+	else:
+		run, local_root = _start_root(name, CONSUMER, _message_context(task), attributes), True
+	_runs[task_id] = (run, _current.set(run), local_root)
+
+
+@signals.task_failure.connect
+def _task_failed(sender=None, task_id=None, exception=None, **kwargs):
+	entry = _runs.get(task_id)
+	if entry is not None and isinstance(entry[0], Span) and exception is not None:
+		entry[0].set_error(exception)
+
+
+@signals.task_postrun.connect
+def _task_finished(sender=None, task_id=None, state=None, **kwargs):
+	entry = _runs.pop(task_id, None)
+	if entry is None:
+		return
+	run, token, local_root = entry
+	_current.reset(token)
+	if isinstance(run, Span) and state:
+		run.set_attribute("celery.state", state)
+	if local_root:
+		_finish_root(run)
+	else:
+		run.end()
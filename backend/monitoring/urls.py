@@ -0,0 +1,10 @@
+from django.urls import path, re_path
+from .views import profile_download, profile_token
+
+
+app_name = "monitoring"
+
+urlpatterns = [
+	path("profile-token/", profile_token, name="profile_token"),
+	re_path(r"^profiles/(?P<profile_id>[0-9a-f]{32})/(?P<kind>pstats|sql)/$", profile_download, name="profile_download"),
+]
@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.http import FileResponse, Http404, HttpResponse
+from django.views.decorators.http import require_safe
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .metrics import render
+from .profiling import ARTIFACTS, artifact_path, make_token
+
+
+@require_safe
+def metrics_view(request):
+	"""Prometheus scrape endpoint. Not routed by nginx; scrape the app port directly."""
+	body, content_type = render()
+	return HttpResponse(body, content_type=content_type)
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAdminUser])
+def profile_token(request):
+	"""Mint a profiling token for `username` (default: the caller)."""
+	username = request.data.get("username") or request.user.username
+	try:
+		user = get_user_model().objects.get(username=username)
+	except get_user_model().DoesNotExist:
+		return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+	return Response({"token": make_token(user), "header": "X-Profile-Token"})
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAdminUser])
+def profile_download(request, profile_id, kind):
+	if kind not in ARTIFACTS:
+		raise Http404
+	path = artifact_path(profile_id, kind)
+	if not path.is_file():
+		raise Http404
+	_, content_type = ARTIFACTS[kind]
+	return FileResponse(open(path, "rb"), as_attachment=True, filename=path.name, content_type=content_type)
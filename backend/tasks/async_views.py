@@ -0,0 +1,230 @@
+"""
+Async (ASGI) variants of the read-only task endpoints.
+
+These mirror TaskViewSet list/retrieve/recent and the dashboard view and
+return the same payloads, but use the async ORM so a request waiting on the
+database does not hold a worker thread. DRF 3.15 views are sync-only, so
+these are plain Django async views with authentication and pagination done
+by hand. They are routed under /api/async/ and served by the ASGI worker.
+"""
+from datetime import date, timedelta
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from accounts.authentication import ClaimsJWTAuthentication
+from billing.models import Subscription
+from billing.views import _get_or_create_trial, _require_active_subscription
+from .events import event_stream
+from .models import ArchivedTask, Task
+from .serializers import TaskSerializer
+
+
+SUBSCRIPTION_REQUIRED = "Subscription required. Please subscribe to continue using tasks."
+
+
+def _json(data, status=200):
+	return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+async def _authenticate(request):
+	authenticator = ClaimsJWTAuthentication()
+	header = authenticator.get_header(request)
+	raw_token = authenticator.get_raw_token(header) if header is not None else None
+	if raw_token is None:
+		raise exceptions.NotAuthenticated()
+	# Signature and expiry checks are CPU-only (and usually an LRU hit)
+	token = authenticator.get_validated_token(raw_token)
+	if 'username' in token:
+		return authenticator.get_user(token)
+	# Tokens minted before claims existed need the auth_user lookup
+	return await sync_to_async(authenticator.get_user)(token)
+
+
+async def _require_subscription(user, message=SUBSCRIPTION_REQUIRED):
+	claims = getattr(user, 'subscription_claims', None)
+	if claims is not None and claims.is_active():
+		return
+	await sync_to_async(_require_active_subscription)(user, message)
+
+
+def async_api_view(view):
+	"""Authenticate the request and map API errors to DRF-shaped JSON responses."""
+
+	@wraps(view)
+	async def wrapper(request, *args, **kwargs):
+		if request.method != 'GET':
+			return _json({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+		try:
+			request.user = await _authenticate(request)
+			return await view(request, *args, **kwargs)
+		except exceptions.APIException as exc:
+			response = _json({'detail': exc.detail}, status=exc.status_code)
+			if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+				response['WWW-Authenticate'] = 'Bearer realm="api"'
+			return response
+		except PermissionDenied as exc:
+			return _json({'detail': str(exc) or exceptions.PermissionDenied.default_detail}, status=403)
+		except Http404:
+			return _json({'detail': 'No Task matches the given query.'}, status=404)
+
+	return wrapper
+
+
+def _accept_query_token(view):
+	"""Let EventSource, which cannot send headers, pass the access token as ?access_token=."""
+
+	@wraps(view)
+	async def wrapper(request, *args, **kwargs):
+		token = request.GET.get('access_token')
+		if token and 'HTTP_AUTHORIZATION' not in request.META:
+			request.META['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+		return await view(request, *args, **kwargs)
+
+	return wrapper
+
+
+async def _paginate(request, queryset, page_size):
+	"""Async counterpart of PageNumberPagination's response shape."""
+	try:
+		page_number = int(request.GET.get('page', 1))
+	except ValueError:
+		page_number = 0
+	count = await queryset.acount()
+	last_page = max(1, -(-count // page_size))
+	if page_number < 1 or page_number > last_page:
+		raise exceptions.NotFound("Invalid page.")
+
+	offset = (page_number - 1) * page_size
+	results = [
+		TaskSerializer(task).data
+		async for task in queryset[offset:offset + page_size].aiterator()
+	]
+
+	url = request.build_absolute_uri()
+	next_url = replace_query_param(url, 'page', page_number + 1) if page_number < last_page else None
+	if page_number <= 1:
+		previous_url = None
+	elif page_number == 2:
+		previous_url = remove_query_param(url, 'page')
+	else:
+		previous_url = replace_query_param(url, 'page', page_number - 1)
+	return {'count': count, 'next': next_url, 'previous': previous_url, 'results': results}
+
+
+@async_api_view
+async def task_list(request):
+	await _require_subscription(request.user)
+	qs = Task.objects.filter(user=request.user)
+	due_date_param = request.GET.get("due_date")
+	if due_date_param:
+		qs = qs.filter(due_date=due_date_param)
+	return _json(await _paginate(request, qs, api_settings.PAGE_SIZE))
+
+
+@async_api_view
+async def task_detail(request, pk):
+	await _require_subscription(request.user)
+	try:
+		task = await Task.objects.aget(pk=pk, user=request.user)
+	except Task.DoesNotExist:
+		raise Http404
+	return _json(TaskSerializer(task).data)
+
+
+@async_api_view
+async def task_recent(request):
+	recent_qs = Task.objects.filter(user=request.user).order_by("-created_at")
+	return _json(await _paginate(request, recent_qs, 10))
+
+
+@async_api_view
+async def dashboard(request):
+	user = request.user
+	period = request.GET.get("period", "today")
+	sub = await Subscription.objects.filter(user_id=user.id).afirst()
+	if sub is None:
+		sub = await sync_to_async(_get_or_create_trial)(user)
+
+	# is_active() may write the auto-expiry, so it runs off the event loop
+	await sync_to_async(sub.is_active)()
+	if sub.plan == Subscription.PLAN_TRIAL:
+		trial_days_remaining = sub.days_remaining()
+	else:
+		trial_days_remaining = 0
+
+	today = date.today()
+	if period == "today":
+		start = today
+	elif period == "week":
+		start = today - timedelta(days=6)
+	else:
+		start = today - timedelta(days=29)
+
+	tasks_qs = Task.objects.filter(user=user, created_at__date__gte=start, created_at__date__lte=today)
+	sources = [tasks_qs]
+	if ArchivedTask.may_contain_created_since(start):
+		sources.append(ArchivedTask.objects.filter(user=user, created_at__date__gte=start, created_at__date__lte=today))
+
+	total = completed = 0
+	tasks_by_category = {}
+	dates = {}
+	for qs in sources:
+		stats = await qs.aaggregate(
+			total=Count("id"),
+			completed=Count("id", filter=Q(completed=True))
+		)
+		total += stats['total']
+		completed += stats['completed']
+		async for item in qs.values("category").annotate(count=Count("id")).aiterator():
+			key = item["category"] or "Uncategorized"
+			tasks_by_category[key] = tasks_by_category.get(key, 0) + item["count"]
+		async for item in qs.values("due_date").annotate(
+			total=Count("id"),
+			completed=Count("id", filter=Q(completed=True))
+		).aiterator():
+			entry = dates.setdefault(item["due_date"], {"total": 0, "completed": 0})
+			entry["total"] += item["total"]
+			entry["completed"] += item["completed"]
+
+	tasks_by_date = [
+		{"date": due_date.isoformat(), "total": entry["total"], "completed": entry["completed"]}
+		for due_date, entry in dates.items()
+	]
+	overdue_tasks = [
+		{"id": task.id, "title": task.title, "due_date": task.due_date.isoformat()}
+		async for task in Task.objects.filter(
+			user=user, completed=False, overdue_notified=True
+		).only("id", "title", "due_date").aiterator()
+	]
+
+	return _json({
+		"total_tasks": total,
+		"completed_tasks": completed,
+		"pending_tasks": total - completed,
+		"completion_rate": int((completed / total) * 100) if total > 0 else 0,
+		"tasks_by_category": tasks_by_category,
+		"tasks_by_date": tasks_by_date,
+		"trial_days_remaining": trial_days_remaining,
+		"subscription_plan": sub.plan,
+		"subscription_status": sub.status,
+		"overdue_tasks": overdue_tasks,
+	})
+
+
+@_accept_query_token
+@async_api_view
+async def task_events(request):
+	"""Server-sent events announcing changes to the user's tasks and templates."""
+	await _require_subscription(request.user)
+	response = StreamingHttpResponse(event_stream(request.user.id), content_type='text/event-stream')
+	response['Cache-Control'] = 'no-cache'
+	response['X-Accel-Buffering'] = 'no'
+	return response
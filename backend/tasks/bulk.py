@@ -0,0 +1,76 @@
+"""
+Bulk row loading for the task importer and the synthetic data seeder.
+
+insert_rows() writes model instances with COPY ... FROM STDIN on PostgreSQL
+and bulk_create elsewhere. COPY uses CSV format: every concrete column but
+the primary key, None as an empty unquoted field (NULL), and FORCE_NOT_NULL
+on NOT NULL columns so an empty string stays an empty string. On nullable
+text columns an empty string is loaded as NULL. Neither path sends model
+signals or fills auto_now fields; set timestamps on the instances.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from django.db import connection
+from django.db.models import JSONField
+
+COPY_BATCH_SIZE = 50000
+
+
+def _copy_fields(model):
+	return [field for field in model._meta.concrete_fields if not field.primary_key]
+
+
+def _copy_value(field, value):
+	if value is None:
+		return None  # csv writes "", which COPY reads as NULL
+	if isinstance(field, JSONField):
+		return json.dumps(value)
+	if isinstance(value, bool):
+		return "t" if value else "f"
+	if isinstance(value, (date, datetime)):
+		return value.isoformat()
+	return value
+
+
+def copy_statement(model):
+	quote = connection.ops.quote_name
+	fields = _copy_fields(model)
+	options = "FORMAT csv"
+	not_null = [field.column for field in fields if not field.null]
+	if not_null:
+		options += f", FORCE_NOT_NULL ({', '.join(quote(column) for column in not_null)})"
+	return "COPY {} ({}) FROM STDIN WITH ({})".format(
+		quote(model._meta.db_table),
+		", ".join(quote(field.column) for field in fields),
+		options,
+	)
+
+
+def copy_buffer(model, objs):
+	"""The CSV that copy_statement(model) reads for `objs`."""
+	fields = _copy_fields(model)
+	buffer = io.StringIO()
+	writer = csv.writer(buffer)
+	for obj in objs:
+		writer.writerow([_copy_value(field, getattr(obj, field.attname)) for field in fields])
+	buffer.seek(0)
+	return buffer
+
+
+def copy_rows(model, objs):
+	"""Load `objs` with COPY (PostgreSQL only); their ids are not set."""
+	statement = copy_statement(model)
+	with connection.cursor() as cursor:
+		for start in range(0, len(objs), COPY_BATCH_SIZE):
+			cursor.copy_expert(statement, copy_buffer(model, objs[start:start + COPY_BATCH_SIZE]))
+
+
+def insert_rows(model, objs, batch_size=None):
+	"""Insert rows whose ids are not needed afterwards: COPY on PostgreSQL, bulk_create elsewhere."""
+	if connection.vendor == "postgresql":
+		copy_rows(model, objs)
+	else:
+		model.objects.bulk_create(objs, batch_size=batch_size)
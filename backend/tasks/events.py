@@ -0,0 +1,201 @@
+"""
+Per-user change notifications over Redis pub/sub, streamed to browsers as SSE.
+
+Writers publish a small event on ``task-events:<user_id>`` once their
+transaction commits. Every ASGI worker keeps one pub/sub connection (the hub)
+and fans messages out to the streams open in that process, so any web node
+sees changes made on any other. Events only say *that* something changed;
+clients fetch the details from /api/tasks/changes/.
+
+When Redis is not configured or not reachable, streams send a ``poll`` event
+whose ``retry`` makes EventSource reconnect after TASK_EVENTS_POLL_SECONDS,
+which is the polling interval clients should fall back to meanwhile.
+"""
+import asyncio
+import json
+import logging
+import time
+import weakref
+from functools import partial
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Reconnect delay after a stream ends normally (it is closed every
+# TASK_EVENTS_MAX_STREAM_SECONDS so connections rebalance across workers)
+RECONNECT_MS = 2000
+# Events buffered per stream; a client that far behind refetches anyway
+_QUEUE_SIZE = 100
+# After a failed publish, skip Redis for this long instead of paying the timeout per write
+_PUBLISH_BACKOFF_SECONDS = 30
+
+_client = None
+_publish_down_until = 0.0
+
+
+def channel_for(user_id):
+	return f"task-events:{user_id}"
+
+
+def _redis():
+	global _client
+	if _client is None:
+		_client = redis.Redis.from_url(
+			settings.TASK_EVENTS_REDIS_URL, socket_connect_timeout=0.25, socket_timeout=0.25
+		)
+	return _client
+
+
+def _publish(channel, message):
+	global _publish_down_until
+	if time.monotonic() < _publish_down_until:
+		return
+	try:
+		_redis().publish(channel, message)
+	except redis.RedisError as exc:
+		_publish_down_until = time.monotonic() + _PUBLISH_BACKOFF_SECONDS
+		logger.warning("Task event publish failed, pausing for %ss: %s", _PUBLISH_BACKOFF_SECONDS, exc)
+
+
+def publish_change(user_id, kind, action, object_id=None):
+	"""Tell `user_id`'s open streams that a `kind` ("task"/"template") changed, after commit."""
+	if not settings.TASK_EVENTS_REDIS_URL:
+		return
+	message = json.dumps({"type": kind, "action": action, "id": object_id})
+	transaction.on_commit(partial(_publish, channel_for(user_id), message))
+
+
+class _Hub:
+	"""One pub/sub connection per event loop, shared by every stream on it."""
+
+	def __init__(self, url):
+		self.url = url
+		self.queues = {}
+		self.pubsub = None
+		self.reader = None
+
+	async def subscribe(self, channel):
+		if self.pubsub is None:
+			self.pubsub = aioredis.from_url(self.url, decode_responses=True, socket_connect_timeout=1).pubsub()
+		queue = asyncio.Queue(maxsize=_QUEUE_SIZE)
+		listeners = self.queues.setdefault(channel, set())
+		first = not listeners
+		listeners.add(queue)
+		if first:
+			try:
+				await self.pubsub.subscribe(channel)
+			except (redis.RedisError, OSError):
+				self._fail()
+				raise
+		if self.reader is None or self.reader.done():
+			self.reader = asyncio.create_task(self._read(self.pubsub))
+		return queue
+
+	def unsubscribe(self, channel, queue):
+		listeners = self.queues.get(channel)
+		if not listeners:
+			return
+		listeners.discard(queue)
+		if not listeners:
+			del self.queues[channel]
+			# Not awaited: this runs while the stream is being torn down
+			asyncio.ensure_future(self._unsubscribe(self.pubsub, channel))
+
+	async def _unsubscribe(self, pubsub, channel):
+		if pubsub is not self.pubsub or channel in self.queues:
+			return
+		try:
+			await pubsub.unsubscribe(channel)
+		except (redis.RedisError, OSError):
+			pass
+
+	async def _read(self, pubsub):
+		try:
+			while self.queues and pubsub is self.pubsub:
+				message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+				if message is None or message["type"] != "message":
+					continue
+				for queue in list(self.queues.get(message["channel"], ())):
+					try:
+						queue.put_nowait(message["data"])
+					except asyncio.QueueFull:
+						pass
+		except (redis.RedisError, OSError) as exc:
+			logger.warning("Task event subscription lost: %s", exc)
+			self._fail()
+
+	def _fail(self):
+		"""Drop the connection and tell every open stream to fall back to polling."""
+		queues = [queue for listeners in self.queues.values() for queue in listeners]
+		self.queues = {}
+		pubsub, self.pubsub = self.pubsub, None
+		if pubsub is not None:
+			asyncio.ensure_future(pubsub.aclose())
+		for queue in queues:
+			while not queue.empty():
+				queue.get_nowait()
+			queue.put_nowait(None)
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def _hub():
+	loop = asyncio.get_running_loop()
+	hub = _hubs.get(loop)
+	if hub is None:
+		hub = _hubs[loop] = _Hub(settings.TASK_EVENTS_REDIS_URL)
+	return hub
+
+
+def _sse(event, data, retry=None):
+	prefix = f"retry: {retry}\n" if retry is not None else ""
+	return f"{prefix}event: {event}\ndata: {data}\n\n"
+
+
+def _poll_hint():
+	poll = settings.TASK_EVENTS_POLL_SECONDS
+	return _sse("poll", json.dumps({"interval": poll}), retry=poll * 1000)
+
+
+async def event_stream(user_id):
+	"""
+	SSE body for one client: ``ready`` (the client should sync now), then a
+	``change`` per published event with comment heartbeats in between.
+	"""
+	if not settings.TASK_EVENTS_REDIS_URL:
+		yield _poll_hint()
+		return
+	hub = _hub()
+	channel = channel_for(user_id)
+	try:
+		queue = await hub.subscribe(channel)
+	except (redis.RedisError, OSError):
+		yield _poll_hint()
+		return
+	try:
+		yield _sse("ready", "{}", retry=RECONNECT_MS)
+		loop = asyncio.get_running_loop()
+		deadline = loop.time() + settings.TASK_EVENTS_MAX_STREAM_SECONDS
+		while True:
+			remaining = deadline - loop.time()
+			if remaining <= 0:
+				return
+			try:
+				message = await asyncio.wait_for(
+					queue.get(), timeout=min(settings.TASK_EVENTS_HEARTBEAT_SECONDS, remaining)
+				)
+			except asyncio.TimeoutError:
+				# Keeps proxies from timing the connection out
+				yield ": keepalive\n\n"
+				continue
+			if message is None:
+				yield _poll_hint()
+				return
+			yield _sse("change", message)
+	finally:
+		hub.unsubscribe(channel, queue)
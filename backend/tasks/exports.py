@@ -0,0 +1,73 @@
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import TaskSerializer
+
+
+# Same columns as the API; the FK is exported as its raw id
+EXPORT_FIELDS = tuple(
+	"parent_task_id" if name == "parent_task" else name for name in TaskSerializer.Meta.fields
+)
+EXPORT_HEADER = TaskSerializer.Meta.fields
+
+
+class _Echo:
+	"""File-like object whose write() hands the line back instead of storing it."""
+
+	def write(self, value):
+		return value
+
+
+def _rows(querysets):
+	# values_list + iterator keeps one chunk of tuples in memory at a time and
+	# skips model/serializer construction, which dominates for large exports.
+	for queryset in querysets:
+		yield from queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=settings.TASK_EXPORT_CHUNK_SIZE)
+
+
+# Cells starting with these run as formulas in spreadsheet apps (CSV injection)
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_value(value):
+	if isinstance(value, list):
+		return json.dumps(value)
+	if value is None:
+		return ""
+	if hasattr(value, "isoformat"):
+		return value.isoformat()
+	if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+		return "'" + value
+	return value
+
+
+def _batched(lines, size=500):
+	# One write per few hundred rows instead of one per row
+	batch = []
+	for line in lines:
+		batch.append(line)
+		if len(batch) >= size:
+			yield "".join(batch)
+			batch = []
+	if batch:
+		yield "".join(batch)
+
+
+def iter_csv(querysets):
+	writer = csv.writer(_Echo())
+	yield writer.writerow(EXPORT_HEADER)
+	yield from _batched(writer.writerow([_csv_value(value) for value in row]) for row in _rows(querysets))
+
+
+def iter_ndjson(querysets):
+	encoder = JSONEncoder(ensure_ascii=False)
+	yield from _batched(encoder.encode(dict(zip(EXPORT_HEADER, row))) + "\n" for row in _rows(querysets))
+
+
+EXPORTERS = {
+	"csv": (iter_csv, "text/csv; charset=utf-8"),
+	"ndjson": (iter_ndjson, "application/x-ndjson; charset=utf-8"),
+}
@@ -0,0 +1,118 @@
+"""
+iCalendar (RFC 5545) rendering of a user's tasks for subscribed calendar apps.
+
+Each task becomes an all-day VEVENT. A recurring parent is emitted once with
+an RRULE built from its recurrence_* fields; its materialized instances are
+left out, since the calendar app expands the rule itself. Monthly rules on
+days 29-31 are approximate: the model clamps to the month end and carries
+the clamped day forward, which RRULE cannot express.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from .models import Task
+
+
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+_FREQUENCIES = {
+	"daily": "DAILY",
+	"weekly": "WEEKLY",
+	"monthly": "MONTHLY",
+	"yearly": "YEARLY",
+	# Model semantics for custom: every N days
+	"custom": "DAILY",
+}
+
+
+def _escape(text):
+	return (
+		text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+		.replace("\r\n", "\\n").replace("\n", "\\n")
+	)
+
+
+def _fold(line):
+	"""Split a content line into 75-octet pieces joined by CRLF + space."""
+	encoded = line.encode("utf-8")
+	if len(encoded) <= 75:
+		return line + "\r\n"
+	parts = []
+	limit = 75
+	while encoded:
+		cut = min(limit, len(encoded))
+		# Never split inside a multi-byte UTF-8 sequence
+		while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+			cut -= 1
+		parts.append(encoded[:cut].decode("utf-8"))
+		encoded = encoded[cut:]
+		limit = 74  # continuation lines start with a space
+	return "\r\n ".join(parts) + "\r\n"
+
+
+def _date(value):
+	return value.strftime("%Y%m%d")
+
+
+def _utc(value):
+	return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def rrule_for(task):
+	"""RRULE value for a recurring parent, or None if it does not recur."""
+	frequency = _FREQUENCIES.get(task.recurrence_type or "")
+	if not task.is_recurring or frequency is None:
+		return None
+	parts = [f"FREQ={frequency}"]
+	if task.recurrence_interval and task.recurrence_interval > 1:
+		parts.append(f"INTERVAL={task.recurrence_interval}")
+	if task.recurrence_type == "weekly" and task.recurrence_days:
+		parts.append("BYDAY=" + ",".join(WEEKDAYS[day] for day in sorted(set(task.recurrence_days)) if 0 <= day <= 6))
+	if task.recurrence_count:
+		# recurrence_count counts generated instances; the parent is one more occurrence
+		parts.append(f"COUNT={task.recurrence_count + 1}")
+	elif task.recurrence_end_date:
+		parts.append(f"UNTIL={_date(task.recurrence_end_date)}")
+	return ";".join(parts)
+
+
+def _event_lines(task, host):
+	summary = ("\u2713 " if task.completed else "") + task.title
+	lines = [
+		"BEGIN:VEVENT",
+		f"UID:task-{task.id}@{host}",
+		f"DTSTAMP:{_utc(task.updated_at)}",
+		f"LAST-MODIFIED:{_utc(task.updated_at)}",
+		f"CREATED:{_utc(task.created_at)}",
+		f"DTSTART;VALUE=DATE:{_date(task.due_date)}",
+		f"DTEND;VALUE=DATE:{_date(task.due_date + timedelta(days=1))}",
+		f"SUMMARY:{_escape(summary)}",
+		"TRANSP:TRANSPARENT",
+	]
+	if task.description:
+		lines.append(f"DESCRIPTION:{_escape(task.description)}")
+	if task.category:
+		lines.append(f"CATEGORIES:{_escape(task.category)}")
+	rule = rrule_for(task)
+	if rule:
+		lines.append(f"RRULE:{rule}")
+	lines.append("END:VEVENT")
+	return lines
+
+
+def feed_tasks(user_id):
+	"""Tasks that appear in the feed: all but instances of a still-recurring parent."""
+	return Task.objects.filter(user_id=user_id).exclude(parent_task__is_recurring=True).order_by("due_date", "id")
+
+
+def render_feed(tasks, host, name="Tasks"):
+	lines = [
+		"BEGIN:VCALENDAR",
+		"VERSION:2.0",
+		"PRODID:-//Task Manager//Tasks//EN",
+		"CALSCALE:GREGORIAN",
+		"METHOD:PUBLISH",
+		f"X-WR-CALNAME:{_escape(name)}",
+	]
+	for task in tasks:
+		lines.extend(_event_lines(task, host))
+	lines.append("END:VCALENDAR")
+	return "".join(_fold(line) for line in lines)
@@ -0,0 +1,271 @@
+"""
+Streaming task import.
+
+Parsers read the upload incrementally and yield ``(row_number, data)`` pairs;
+rows are validated with TaskSerializer and written in batches, through COPY on
+PostgreSQL and bulk_create elsewhere. A bad row is reported and skipped, it
+never aborts the import.
+"""
+import codecs
+import csv
+import io
+import json
+import os
+import re
+from datetime import date
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .bulk import insert_rows
+from .models import Task
+from .serializers import TaskSerializer
+
+
+IMPORT_FIELDS = (
+	"title", "description", "completed", "due_date", "category", "label",
+	"is_recurring", "recurrence_type", "recurrence_interval", "recurrence_days",
+	"recurrence_end_date", "recurrence_count",
+)
+# Errors beyond this are counted but not listed in the report
+MAX_REPORTED_ERRORS = 100
+_READ_SIZE = 64 * 1024
+
+
+def _text_stream(fileobj):
+	"""Decode a binary upload lazily (utf-8, BOM tolerated)."""
+	if isinstance(fileobj, io.TextIOBase):
+		return fileobj
+	return codecs.getreader("utf-8-sig")(fileobj)
+
+
+def parse_csv(fileobj):
+	reader = csv.DictReader(_text_stream(fileobj))
+	for row_number, row in enumerate(reader, start=1):
+		data = {key.strip(): value for key, value in row.items() if key and value not in (None, "")}
+		if "recurrence_days" in data:
+			try:
+				data["recurrence_days"] = json.loads(data["recurrence_days"])
+			except ValueError:
+				pass  # left as-is for the serializer to reject
+		yield row_number, data
+
+
+def parse_ndjson(fileobj):
+	for row_number, line in enumerate(_text_stream(fileobj), start=1):
+		if not line.strip():
+			continue
+		try:
+			yield row_number, json.loads(line)
+		except ValueError as exc:
+			yield row_number, ValueError(f"Invalid JSON: {exc}")
+
+
+def parse_json_array(fileobj):
+	"""Yield the objects of a top-level JSON array without loading the whole document."""
+	stream = _text_stream(fileobj)
+	decoder = json.JSONDecoder()
+	buffer = ""
+	position = 0
+	started = False
+	row_number = 0
+	eof = False
+	while True:
+		# Skip whitespace, the opening bracket and separators
+		while True:
+			while position < len(buffer) and buffer[position] in " \t\r\n,":
+				position += 1
+			if position < len(buffer) or eof:
+				break
+			chunk = stream.read(_READ_SIZE)
+			buffer, position = buffer[position:] + chunk, 0
+			eof = not chunk
+		if position >= len(buffer):
+			return
+		if not started:
+			if buffer[position] != "[":
+				raise ValueError("Expected a JSON array of task objects.")
+			started = True
+			position += 1
+			continue
+		if buffer[position] == "]":
+			return
+		try:
+			obj, end = decoder.raw_decode(buffer, position)
+		except ValueError:
+			if eof:
+				raise ValueError(f"Invalid JSON near item {row_number + 1}.")
+			chunk = stream.read(_READ_SIZE)
+			buffer, position = buffer[position:] + chunk, 0
+			eof = not chunk
+			continue
+		row_number += 1
+		position = end
+		yield row_number, obj
+
+
+_ICS_UNESCAPE = re.compile(r"\\([\\;,nN])")
+
+
+def _ics_text(value):
+	return _ICS_UNESCAPE.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def _ics_date(value):
+	# DATE (20250101) or DATE-TIME (20250101T090000[Z]); only the day is kept
+	return date(int(value[0:4]), int(value[4:6]), int(value[6:8])).isoformat()
+
+
+def _ics_lines(stream):
+	"""Unfold RFC 5545 continuation lines."""
+	current = None
+	for raw in stream:
+		line = raw.rstrip("\r\n")
+		if line[:1] in (" ", "\t") and current is not None:
+			current += line[1:]
+			continue
+		if current is not None:
+			yield current
+		current = line
+	if current is not None:
+		yield current
+
+
+def parse_ics(fileobj):
+	"""Yield VTODO/VEVENT components as task dicts (title, description, due date, ...)."""
+	row_number = 0
+	component = None
+	for line in _ics_lines(_text_stream(fileobj)):
+		if line in ("BEGIN:VTODO", "BEGIN:VEVENT"):
+			component = {}
+			continue
+		if line in ("END:VTODO", "END:VEVENT") and component is not None:
+			row_number += 1
+			yield row_number, component
+			component = None
+			continue
+		if component is None or ":" not in line:
+			continue
+		name_params, value = line.split(":", 1)
+		name = name_params.split(";", 1)[0].upper()
+		try:
+			if name == "SUMMARY":
+				component["title"] = _ics_text(value)
+			elif name == "DESCRIPTION":
+				component["description"] = _ics_text(value)
+			elif name == "DUE" or (name == "DTSTART" and "due_date" not in component):
+				component["due_date"] = _ics_date(value)
+			elif name == "CATEGORIES":
+				component["category"] = _ics_text(value).split(",")[0]
+			elif name == "STATUS":
+				component["completed"] = value.upper() == "COMPLETED"
+			elif name == "COMPLETED":
+				component["completed"] = True
+		except ValueError:
+			component.setdefault("_errors", {})[name.lower()] = [f"Invalid value: {value}"]
+
+
+PARSERS = {
+	"csv": parse_csv,
+	"ndjson": parse_ndjson,
+	"json": parse_json_array,
+	"ics": parse_ics,
+}
+_EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "json", ".ics": "ics"}
+
+
+def detect_input(filename, explicit=None):
+	if explicit:
+		return explicit if explicit in PARSERS else None
+	return _EXTENSIONS.get(os.path.splitext(filename or "")[1].lower())
+
+
+class TaskImporter:
+	"""Validate parsed rows and write them for `user` in batches."""
+
+	def __init__(self, user, batch_size=None):
+		self.user = user
+		self.batch_size = batch_size or settings.TASK_IMPORT_BATCH_SIZE
+		self.created = 0
+		self.rows = 0
+		self.error_count = 0
+		self.errors = []
+
+	def _error(self, row_number, errors):
+		self.error_count += 1
+		if len(self.errors) < MAX_REPORTED_ERRORS:
+			self.errors.append({"row": row_number, "errors": errors})
+
+	def _build(self, data, now):
+		task = Task(user_id=self.user.pk, created_at=now, updated_at=now, **data)
+		if task.is_recurring and task.recurrence_type:
+			task.next_recurrence_date = task.calculate_next_recurrence()
+		return task
+
+	def _flush(self, batch):
+		if not batch:
+			return
+		now = timezone.now()
+		tasks = [self._build(data, now) for _, data in batch]
+		try:
+			with transaction.atomic():
+				insert_rows(Task, tasks)
+			self.created += len(tasks)
+			return
+		except DatabaseError:
+			pass
+		# Something slipped past validation; find the offending rows one by one
+		for (row_number, _), task in zip(batch, tasks):
+			try:
+				with transaction.atomic():
+					insert_rows(Task, [task])
+				self.created += 1
+			except DatabaseError as exc:
+				self._error(row_number, {"non_field_errors": [str(exc).strip()]})
+
+	def run(self, rows):
+		max_rows = settings.TASK_IMPORT_MAX_ROWS
+		batch = []
+		try:
+			for row_number, data in rows:
+				if self.rows >= max_rows:
+					self._error(row_number, {"non_field_errors": [f"Import is limited to {max_rows} rows."]})
+					break
+				self.rows += 1
+				if isinstance(data, Exception):
+					self._error(row_number, {"non_field_errors": [str(data)]})
+					continue
+				if not isinstance(data, dict):
+					self._error(row_number, {"non_field_errors": ["Expected an object."]})
+					continue
+				parse_errors = data.pop("_errors", None)
+				if parse_errors:
+					self._error(row_number, parse_errors)
+					continue
+				serializer = TaskSerializer(data={key: data[key] for key in IMPORT_FIELDS if key in data})
+				if not serializer.is_valid():
+					self._error(row_number, serializer.errors)
+					continue
+				batch.append((row_number, serializer.validated_data))
+				if len(batch) >= self.batch_size:
+					self._flush(batch)
+					batch = []
+		except (ValueError, csv.Error, UnicodeDecodeError) as exc:
+			# The stream is unreadable past this point; rows before it still count
+			self._error(self.rows + 1, {"non_field_errors": [str(exc)]})
+		self._flush(batch)
+		return self.report()
+
+	def report(self):
+		return {
+			"rows": self.rows,
+			"created": self.created,
+			"error_count": self.error_count,
+			"errors": self.errors,
+		}
+
+
+def import_tasks(user, fileobj, input_format, batch_size=None):
+	"""Parse `fileobj` as `input_format` and import it for `user`; returns the report."""
+	return TaskImporter(user, batch_size=batch_size).run(PARSERS[input_format](fileobj))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.tasks import archive_completed_tasks
+
+
+class Command(BaseCommand):
+	help = "Move completed tasks older than TASK_ARCHIVE_AFTER_DAYS into the archive table."
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=None)
+		parser.add_argument(
+			'--older-than-days', type=int, default=None,
+			help="Archive only tasks older than this; at least TASK_ARCHIVE_AFTER_DAYS",
+		)
+
+	def handle(self, *args, **options):
+		try:
+			result = archive_completed_tasks(
+				batch_size=options['batch_size'],
+				older_than_days=options['older_than_days'],
+			)
+		except ValueError as exc:
+			raise CommandError(str(exc))
+		self.stdout.write(
+			f"Archived {result['archived_count']} tasks in {result['batches']} batches "
+			f"(cutoff {result['cutoff']})"
+		)
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.authentication import add_user_claims
+from billing.models import Subscription
+from monitoring.stats import percentile
+from tasks.models import Task
+
+
+BENCH_USERNAME = 'bench-asgi-user'
+
+# (label, server, endpoint) - each sync endpoint is paired with its async twin
+SCENARIOS = [
+	('tasks', 'wsgi', '/api/tasks/'),
+	('tasks', 'asgi', '/api/async/tasks/'),
+	('dashboard', 'wsgi', '/api/dashboard/?period=month'),
+	('dashboard', 'asgi', '/api/async/dashboard/?period=month'),
+]
+
+
+def _free_port():
+	with socket.socket() as sock:
+		sock.bind(('127.0.0.1', 0))
+		return sock.getsockname()[1]
+
+
+async def _fetch(reader, writer, request):
+	writer.write(request)
+	await writer.drain()
+	status_line = await reader.readline()
+	length = 0
+	while True:
+		line = await reader.readline()
+		if line in (b'\r\n', b''):
+			break
+		name, _, value = line.decode('latin-1').partition(':')
+		if name.lower() == 'content-length':
+			length = int(value)
+	await reader.readexactly(length)
+	return int(status_line.split()[1])
+
+
+async def _load(port, path, token, concurrency, duration):
+	"""Keep `concurrency` keep-alive connections busy for `duration` seconds."""
+	request = (
+		f"GET {path} HTTP/1.1\r\nHost: localhost\r\n"
+		f"Authorization: Bearer {token}\r\nConnection: keep-alive\r\n\r\n"
+	).encode()
+	deadline = time.monotonic() + duration
+	latencies = []
+	errors = 0
+
+	async def connection_loop():
+		nonlocal errors
+		reader, writer = await asyncio.open_connection('127.0.0.1', port)
+		try:
+			while time.monotonic() < deadline:
+				start = time.perf_counter()
+				status = await _fetch(reader, writer, request)
+				if status != 200:
+					errors += 1
+				latencies.append((time.perf_counter() - start) * 1000)
+		except (ConnectionError, asyncio.IncompleteReadError):
+			errors += 1
+		finally:
+			writer.close()
+
+	await asyncio.gather(*(connection_loop() for _ in range(concurrency)))
+	return sorted(latencies), errors
+
+
+class Command(BaseCommand):
+	help = (
+		"Compare concurrent-connection throughput of the sync (gunicorn/WSGI) and "
+		"async (uvicorn/ASGI) task endpoints against the configured database."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument('--concurrency', type=int, default=50, help="Open keep-alive connections")
+		parser.add_argument('--duration', type=float, default=10.0, help="Seconds per scenario")
+		parser.add_argument('--workers', type=int, default=1, help="Server processes for both stacks")
+		parser.add_argument('--threads', type=int, default=4, help="gunicorn threads per WSGI worker")
+		parser.add_argument('--tasks', type=int, default=200, help="Tasks seeded for the bench user")
+
+	def handle(self, *args, **options):
+		User.objects.filter(username=BENCH_USERNAME).delete()
+		user = User.objects.create_user(username=BENCH_USERNAME)
+		try:
+			today = timezone.now().date()
+			Subscription.objects.create(
+				user=user,
+				plan=Subscription.PLAN_MONTHLY,
+				start_date=today,
+				end_date=today + timedelta(days=30),
+			)
+			Task.objects.bulk_create(
+				Task(user=user, title=f"Bench task {i}", category=f"c{i % 5}",
+					due_date=today - timedelta(days=i % 20), completed=i % 3 == 0)
+				for i in range(options['tasks'])
+			)
+			user = User.objects.select_related('subscription').get(pk=user.pk)
+			refresh = RefreshToken.for_user(user)
+			add_user_claims(refresh, user)
+			self._run(str(refresh.access_token), options)
+		finally:
+			User.objects.filter(username=BENCH_USERNAME).delete()
+
+	def _run(self, token, options):
+		self.stdout.write(
+			f"concurrency={options['concurrency']} workers={options['workers']} "
+			f"wsgi threads={options['threads']} duration={options['duration']}s"
+		)
+		self.stdout.write(f"{'endpoint':<12}{'server':<8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+		for label, server, path in SCENARIOS:
+			port = _free_port()
+			process = self._start_server(server, port, options)
+			try:
+				self._wait_for_port(port, process)
+				latencies, errors = asyncio.run(
+					_load(port, path, token, options['concurrency'], options['duration'])
+				)
+			finally:
+				process.terminate()
+				process.wait(timeout=30)
+			self.stdout.write(
+				f"{label:<12}{server:<8}{len(latencies) / options['duration']:>9.1f}"
+				f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}"
+				f"{percentile(latencies, 99):>9.1f}{errors:>8}"
+			)
+
+	def _start_server(self, server, port, options):
+		if server == 'wsgi':
+			command = [
+				sys.executable, '-m', 'gunicorn', 'core.wsgi:application',
+				'--bind', f'127.0.0.1:{port}',
+				'--workers', str(options['workers']),
+				'--threads', str(options['threads']),
+				'--log-level', 'warning',
+			]
+		else:
+			command = [
+				sys.executable, '-m', 'uvicorn', 'core.asgi:application',
+				'--host', '127.0.0.1', '--port', str(port),
+				'--workers', str(options['workers']),
+				'--log-level', 'warning', '--no-access-log',
+			]
+		env = dict(os.environ, DJANGO_ALLOWED_HOSTS='localhost,127.0.0.1')
+		return subprocess.Popen(command, env=env)
+
+	def _wait_for_port(self, port, process, timeout=30):
+		deadline = time.monotonic() + timeout
+		while time.monotonic() < deadline:
+			if process.poll() is not None:
+				raise RuntimeError(f"Server exited with code {process.returncode}")
+			try:
+				with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+					return
+			except OSError:
+				time.sleep(0.2)
+		raise RuntimeError(f"Server did not start on port {port}")
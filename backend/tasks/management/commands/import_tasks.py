@@ -0,0 +1,38 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.importers import PARSERS, detect_input, import_tasks
+
+
+class Command(BaseCommand):
+	help = "Import tasks for a user from a CSV, NDJSON, JSON array or iCalendar file."
+
+	def add_arguments(self, parser):
+		parser.add_argument('username')
+		parser.add_argument('path')
+		parser.add_argument('--input', choices=sorted(PARSERS), default=None, help="Defaults to the file extension")
+		parser.add_argument('--batch-size', type=int, default=None)
+
+	def handle(self, *args, **options):
+		try:
+			user = User.objects.get(username=options['username'])
+		except User.DoesNotExist:
+			raise CommandError(f"No user named {options['username']!r}")
+		input_format = detect_input(options['path'], options['input'])
+		if input_format is None:
+			raise CommandError("Could not tell the file type from its extension; pass --input")
+
+		with open(options['path'], 'rb') as fileobj:
+			report = import_tasks(user, fileobj, input_format, batch_size=options['batch_size'])
+
+		for error in report['errors']:
+			messages = '; '.join(
+				f"{field}: {' '.join(str(message) for message in field_messages)}"
+				for field, field_messages in error['errors'].items()
+			)
+			self.stderr.write(f"row {error['row']}: {messages}")
+		if report['error_count'] > len(report['errors']):
+			self.stderr.write(f"... {report['error_count'] - len(report['errors'])} more errors not shown")
+		self.stdout.write(
+			f"Imported {report['created']} of {report['rows']} rows ({report['error_count']} errors)"
+		)
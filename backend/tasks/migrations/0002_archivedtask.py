@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-19 06:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('completed', models.BooleanField(default=True)),
+                ('due_date', models.DateField()),
+                ('category', models.CharField(blank=True, max_length=100)),
+                ('label', models.CharField(choices=[('none', 'None'), ('yellow', 'Yellow'), ('green', 'Green'), ('blue', 'Blue'), ('red', 'Red')], default='none', max_length=12)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('overdue_notified', models.BooleanField(default=False)),
+                ('is_recurring', models.BooleanField(default=False)),
+                ('recurrence_type', models.CharField(blank=True, max_length=20, null=True)),
+                ('recurrence_interval', models.IntegerField(default=1)),
+                ('recurrence_days', models.JSONField(blank=True, default=list)),
+                ('recurrence_end_date', models.DateField(blank=True, null=True)),
+                ('recurrence_count', models.IntegerField(blank=True, null=True)),
+                ('recurrence_created_count', models.IntegerField(default=0)),
+                ('parent_task_id', models.BigIntegerField(blank=True, null=True)),
+                ('next_recurrence_date', models.DateField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['updated_at'], name='tasks_task_done_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_tasks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtask',
+            index=models.Index(fields=['user', 'created_at'], name='tasks_archi_user_id_a9d0b6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtask',
+            index=models.Index(fields=['user', 'due_date'], name='tasks_archi_user_id_363645_idx'),
+        ),
+    ]
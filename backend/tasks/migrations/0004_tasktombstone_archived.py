@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_task_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tasktombstone',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,6 +1,14 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
+
+from .events import publish_change
 from datetime import timedelta
 from calendar import monthrange
 
@@ -70,6 +78,10 @@ class Task(models.Model):
 			models.Index(fields=['user', 'is_recurring', 'parent_task']),
 			models.Index(fields=['parent_task', 'due_date']),
 			models.Index(fields=['user', 'created_at']),
+			# Delta sync walks (updated_at, id) per user
+			models.Index(fields=['user', 'updated_at', 'id']),
+			# Candidates for archive_completed_tasks
+			models.Index(fields=['updated_at'], condition=models.Q(completed=True), name='tasks_task_done_updated_idx'),
 		]
 
 	def __str__(self) -> str:
@@ -165,6 +177,77 @@ class Task(models.Model):
 		return None
 
 
+class ArchivedTask(models.Model):
+	"""
+	Completed task moved out of Task by archive_completed_tasks.
+
+	Rows keep their original id, so ids stay unique across both tables.
+	parent_task_id is a plain column because the parent may be live or archived.
+	"""
+	id = models.BigIntegerField(primary_key=True)
+	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_tasks')
+	title = models.CharField(max_length=255)
+	description = models.TextField(blank=True)
+	completed = models.BooleanField(default=True)
+	due_date = models.DateField()
+	category = models.CharField(max_length=100, blank=True)
+	label = models.CharField(max_length=12, choices=Task.LABEL_CHOICES, default=Task.LABEL_NONE)
+	created_at = models.DateTimeField()
+	updated_at = models.DateTimeField()
+	overdue_notified = models.BooleanField(default=False)
+	is_recurring = models.BooleanField(default=False)
+	recurrence_type = models.CharField(max_length=20, blank=True, null=True)
+	recurrence_interval = models.IntegerField(default=1)
+	recurrence_days = models.JSONField(default=list, blank=True)
+	recurrence_end_date = models.DateField(blank=True, null=True)
+	recurrence_count = models.IntegerField(blank=True, null=True)
+	recurrence_created_count = models.IntegerField(default=0)
+	parent_task_id = models.BigIntegerField(blank=True, null=True)
+	next_recurrence_date = models.DateField(blank=True, null=True)
+	archived_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['user', 'created_at']),
+			models.Index(fields=['user', 'due_date']),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.title} (archived)"
+
+	@classmethod
+	def may_contain_created_since(cls, start) -> bool:
+		"""
+		Whether archived rows can have created_at on or after `start` (a date).
+		Only tasks untouched for TASK_ARCHIVE_AFTER_DAYS are archived, and
+		created_at <= updated_at, so recent periods never need the archive.
+		"""
+		cutoff = timezone.now() - timedelta(days=settings.TASK_ARCHIVE_AFTER_DAYS)
+		return start <= cutoff.date()
+
+
+class TaskTombstone(models.Model):
+	"""
+	Id of a task that left the live table, kept for TASK_SYNC_TOMBSTONE_DAYS
+	so delta sync can tell clients to drop it. `archived` marks tasks moved to
+	ArchivedTask, which ?include_archived=1 still lists.
+	"""
+	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='task_tombstones')
+	task_id = models.BigIntegerField()
+	deleted_at = models.DateTimeField(default=timezone.now)
+	archived = models.BooleanField(default=False)
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['user', 'deleted_at', 'id']),
+			models.Index(fields=['deleted_at']),
+		]
+
+	def __str__(self) -> str:
+		return f"TaskTombstone({self.task_id})"
+
+
 class TaskTemplate(models.Model):
 	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='task_templates')
 	name = models.CharField(max_length=255)
@@ -209,3 +292,41 @@ class TaskTemplateItem(models.Model):
 
 	def __str__(self) -> str:
 		return f"{self.title} (in {self.template.name})"
+
+
+_bulk_removal = ContextVar("tasks_bulk_removal", default=False)
+
+
+@contextmanager
+def bulk_removal():
+	"""
+	Silence the per-row post_delete receivers below, for callers that record
+	tombstones and publish events for a whole batch themselves.
+	"""
+	token = _bulk_removal.set(True)
+	try:
+		yield
+	finally:
+		_bulk_removal.reset(token)
+
+
+@receiver(post_delete, sender=Task)
+def record_task_tombstone(sender, instance, origin=None, **kwargs):
+	# Deleting the account removes its tombstones too; nobody is left to sync
+	origin_model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+	if origin_model is get_user_model() or _bulk_removal.get():
+		return
+	TaskTombstone.objects.create(user_id=instance.user_id, task_id=instance.pk)
+
+
+@receiver(post_save, sender=Task)
+def publish_task_saved(sender, instance, created, **kwargs):
+	publish_change(instance.user_id, "task", "created" if created else "updated", instance.pk)
+
+
+@receiver(post_delete, sender=Task)
+def publish_task_deleted(sender, instance, origin=None, **kwargs):
+	origin_model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+	if origin_model is get_user_model() or _bulk_removal.get():
+		return
+	publish_change(instance.user_id, "task", "deleted", instance.pk)
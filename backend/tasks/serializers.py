@@ -1,5 +1,6 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Task, TaskTemplate, TaskTemplateItem
+from .models import ArchivedTask, Task, TaskTemplate, TaskTemplateItem
 
 
 class TaskSerializer(serializers.ModelSerializer):
@@ -55,6 +56,20 @@ class TaskSerializer(serializers.ModelSerializer):
 		return super().update(instance, validated_data)
 
 
+class ArchivedTaskSerializer(serializers.ModelSerializer):
+	"""Read-only archived task, shaped like TaskSerializer plus an `archived` flag."""
+	parent_task = serializers.IntegerField(source='parent_task_id', read_only=True, allow_null=True)
+	archived = serializers.SerializerMethodField()
+
+	class Meta:
+		model = ArchivedTask
+		fields = TaskSerializer.Meta.fields + ("archived",)
+		read_only_fields = fields
+
+	def get_archived(self, obj) -> bool:
+		return True
+
+
 class TaskTemplateItemSerializer(serializers.ModelSerializer):
 	class Meta:
 		model = TaskTemplateItem
@@ -71,37 +86,76 @@ class TaskTemplateSerializer(serializers.ModelSerializer):
 		read_only_fields = ("id", "created_at", "updated_at")
 
 
+class TaskTemplateItemWriteSerializer(TaskTemplateItemSerializer):
+	# Optional on write: items sent with an id are updated in place, the rest are created
+	id = serializers.IntegerField(required=False)
+
+
 class TaskTemplateCreateSerializer(serializers.ModelSerializer):
-	items = TaskTemplateItemSerializer(many=True, required=False)
+	items = TaskTemplateItemWriteSerializer(many=True, required=False)
 	
 	class Meta:
 		model = TaskTemplate
 		fields = ("name", "description", "category", "items")
 	
+	def validate_items(self, items):
+		ids = [item["id"] for item in items if "id" in item]
+		if len(ids) != len(set(ids)):
+			raise serializers.ValidationError("Each item id may appear only once.")
+		existing = set(self.instance.items.values_list("id", flat=True)) if self.instance else set()
+		unknown = sorted(set(ids) - existing)
+		if unknown:
+			raise serializers.ValidationError(f"Unknown item ids for this template: {unknown}")
+		return items
+	
 	def create(self, validated_data):
 		items_data = validated_data.pop("items", [])
-		template = TaskTemplate.objects.create(**validated_data)
-		for order, item_data in enumerate(items_data):
-			# Remove 'order' from item_data if it exists to avoid duplicate
-			item_data.pop('order', None)
-			TaskTemplateItem.objects.create(template=template, order=order, **item_data)
+		with transaction.atomic():
+			template = TaskTemplate.objects.create(**validated_data)
+			TaskTemplateItem.objects.bulk_create([
+				TaskTemplateItem(template=template, **self._item_fields(item_data, order))
+				for order, item_data in enumerate(items_data)
+			])
 		return template
 	
 	def update(self, instance, validated_data):
 		items_data = validated_data.pop("items", None)
 		for attr, value in validated_data.items():
 			setattr(instance, attr, value)
-		instance.save()
-		
-		if items_data is not None:
-			# Delete existing items
-			instance.items.all().delete()
-			# Create new items
-			for order, item_data in enumerate(items_data):
-				# Remove 'order' from item_data if it exists to avoid duplicate
-				item_data.pop('order', None)
-				TaskTemplateItem.objects.create(template=instance, order=order, **item_data)
-		
+		with transaction.atomic():
+			instance.save()
+			if items_data is not None:
+				self._sync_items(instance, items_data)
 		return instance
-
-
+	
+	@staticmethod
+	def _item_fields(item_data, order):
+		# Position in the list is the order; an 'order' in the payload is ignored
+		fields = {key: value for key, value in item_data.items() if key not in ("id", "order")}
+		fields["order"] = order
+		return fields
+	
+	def _sync_items(self, template, items_data):
+		"""Apply the item list as a diff: create new ones, update changed ones, delete missing ones."""
+		existing = {item.id: item for item in TaskTemplateItem.objects.filter(template=template)}
+		to_create = []
+		to_update = []
+		changed_fields = set()
+		for order, item_data in enumerate(items_data):
+			fields = self._item_fields(item_data, order)
+			item = existing.pop(item_data.get("id"), None)
+			if item is None:
+				to_create.append(TaskTemplateItem(template=template, **fields))
+				continue
+			changed = [name for name, value in fields.items() if getattr(item, name) != value]
+			if changed:
+				for name in changed:
+					setattr(item, name, fields[name])
+				to_update.append(item)
+				changed_fields.update(changed)
+		if existing:
+			TaskTemplateItem.objects.filter(id__in=existing).delete()
+		if to_update:
+			TaskTemplateItem.objects.bulk_update(to_update, sorted(changed_fields))
+		if to_create:
+			TaskTemplateItem.objects.bulk_create(to_create)
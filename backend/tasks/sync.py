@@ -0,0 +1,98 @@
+"""
+Delta sync for task clients.
+
+A cursor holds two positions: (updated_at, id) in the user's tasks and
+(deleted_at, id) in their tombstones. Each call returns rows past those
+positions in that order, so an idle client costs two index range scans that
+find nothing.
+
+Timestamps are taken before a transaction commits, so a row can become
+visible with a position a client has already passed. The final page
+therefore never moves the cursor past ``now - TASK_SYNC_SETTLE_SECONDS``:
+rows newer than that are sent again on the next call (clients upsert), and
+anything committed later than the settle window after its timestamp is the
+only thing that can be missed.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import TaskTombstone
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidCursor(ValueError):
+	pass
+
+
+class CursorExpired(Exception):
+	"""The cursor is older than the tombstone log; the client must refetch everything."""
+
+
+def _micros(value):
+	return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def encode_cursor(task_position, tombstone_position):
+	(task_at, task_id), (tombstone_at, tombstone_id) = task_position, tombstone_position
+	return f"{_micros(task_at)}-{task_id}-{_micros(tombstone_at)}-{tombstone_id}"
+
+
+def decode_cursor(cursor):
+	try:
+		task_us, task_id, tombstone_us, tombstone_id = (int(part) for part in cursor.split("-"))
+	except ValueError:
+		raise InvalidCursor("Invalid cursor.")
+	return (
+		(EPOCH + timedelta(microseconds=task_us), task_id),
+		(EPOCH + timedelta(microseconds=tombstone_us), tombstone_id),
+	)
+
+
+def _after(queryset, field, position):
+	moment, pk = position
+	return queryset.filter(Q(**{f"{field}__gt": moment}) | Q(**{field: moment, "id__gt": pk})).order_by(field, "id")
+
+
+def _page(queryset, field, position, limit, settled):
+	rows = list(_after(queryset, field, position)[:limit + 1])
+	if len(rows) > limit:
+		rows = rows[:limit]
+		last = rows[-1]
+		return rows, (getattr(last, field), last.id), True
+	# Everything past `position` was read; only the settled part counts as done
+	return rows, max(position, (settled, 0)), False
+
+
+def changes_since(tasks, user_id, cursor=None, limit=None):
+	"""
+	Tasks from `tasks` changed after `cursor`, and ids of the user's tasks
+	deleted or archived after it. Without a cursor every task is returned and
+	no tombstones, since a fresh client has nothing to delete.
+	"""
+	limit = limit or settings.TASK_SYNC_PAGE_SIZE
+	now = timezone.now()
+	settled = now - timedelta(seconds=settings.TASK_SYNC_SETTLE_SECONDS)
+	if cursor:
+		task_position, tombstone_position = decode_cursor(cursor)
+		if tombstone_position[0] < now - timedelta(days=settings.TASK_SYNC_TOMBSTONE_DAYS):
+			raise CursorExpired()
+	else:
+		task_position, tombstone_position = (EPOCH, 0), (settled, 0)
+
+	changed, task_position, more_tasks = _page(tasks, "updated_at", task_position, limit, settled)
+	tombstones, tombstone_position, more_tombstones = _page(
+		TaskTombstone.objects.filter(user_id=user_id).only("id", "task_id", "deleted_at", "archived"),
+		"deleted_at", tombstone_position, limit, settled,
+	)
+	return {
+		"changed": changed,
+		"deleted": [tombstone.task_id for tombstone in tombstones if not tombstone.archived],
+		"archived": [tombstone.task_id for tombstone in tombstones if tombstone.archived],
+		"cursor": encode_cursor(task_position, tombstone_position),
+		"has_more": more_tasks or more_tombstones,
+	}
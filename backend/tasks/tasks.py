@@ -1,8 +1,20 @@
+import logging
 from datetime import timedelta, date
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 
-from .models import Task
+from .events import publish_change
+from .models import ArchivedTask, Task, TaskTombstone, bulk_removal
+
+logger = logging.getLogger(__name__)
+
+# Columns copied verbatim from Task into ArchivedTask (attnames match)
+_ARCHIVED_COLUMNS = [
+	field.attname for field in ArchivedTask._meta.concrete_fields if field.name != 'archived_at'
+]
 
 
 @shared_task
@@ -36,9 +48,11 @@ def flag_overdue_tasks():
 		'today_tasks_flagged': today_count,
 		'overdue_tasks_flagged': overdue_count,
 		'total_flagged': today_count + overdue_count,
+		'rows_scanned': today_count + overdue_count,
+		'rows_written': today_count + overdue_count,
 		'date': today.isoformat()
 	}
-	print(f"✅ Flagged {today_count} tasks due today and {overdue_count} overdue tasks (Total: {result['total_flagged']})")
+	logger.info("Flagged %s tasks due today and %s overdue tasks", today_count, overdue_count)
 	return result
 
 
@@ -50,6 +64,7 @@ def create_recurring_tasks():
 	"""
 	today = timezone.localdate()
 	created_count = 0
+	scanned = 0
 	
 	# Find recurring tasks that need new instances
 	# Either next_recurrence_date is today or in the past, or it's null and due_date is today/past
@@ -63,6 +78,7 @@ def create_recurring_tasks():
 	)
 	
 	for parent_task in recurring_tasks:
+		scanned += 1
 		# Check end conditions first
 		if parent_task.recurrence_end_date and today > parent_task.recurrence_end_date:
 			continue  # Recurrence has ended
@@ -97,7 +113,7 @@ def create_recurring_tasks():
 			if not existing:
 				# Create new task instance
 				new_task = Task.objects.create(
-					user=parent_task.user,
+					user_id=parent_task.user_id,
 					title=parent_task.title,
 					description=parent_task.description,
 					category=parent_task.category,
@@ -127,15 +143,94 @@ def create_recurring_tasks():
 				break
 		
 		# Final save with all updates
-		parent_task.save(update_fields=['recurrence_created_count', 'next_recurrence_date'])
+		parent_task.save(update_fields=['recurrence_created_count', 'next_recurrence_date', 'updated_at'])
 	
 	result = {
 		'created_count': created_count,
+		'rows_scanned': scanned,
+		'rows_written': created_count,
 		'date': today.isoformat()
 	}
-	if created_count > 0:
-		print(f"✅ Created {created_count} recurring task instances")
-	else:
-		print(f"ℹ️  No recurring tasks to create today ({today.isoformat()})")
+	logger.info("Created %s recurring task instances from %s parents", created_count, scanned)
+	return result
+
+
+
+
+def _archivable_tasks(cutoff):
+	# Recurring parents keep generating instances, and deleting a task that
+	# still has instances would cascade to them, so both stay live.
+	return Task.objects.filter(
+		completed=True,
+		updated_at__lt=cutoff,
+		is_recurring=False,
+	).exclude(
+		Exists(Task.objects.filter(parent_task=OuterRef('pk')))
+	).order_by()
+
+
+@shared_task
+def archive_completed_tasks(batch_size=None, older_than_days=None):
+	"""
+	Move completed tasks untouched for TASK_ARCHIVE_AFTER_DAYS (or a longer
+	`older_than_days`) into ArchivedTask.
+
+	Works in batches of `batch_size` ids, each copied and deleted in its own
+	transaction, so the job can be stopped at any point and rerun. A batch
+	writes its tombstones (flagged archived) in one insert and sends one
+	change event per user, instead of the per-row delete signal receivers.
+	"""
+	batch_size = batch_size or settings.TASK_ARCHIVE_BATCH_SIZE
+	days = older_than_days if older_than_days is not None else settings.TASK_ARCHIVE_AFTER_DAYS
+	if days < settings.TASK_ARCHIVE_AFTER_DAYS:
+		# The dashboard skips the archive for periods newer than TASK_ARCHIVE_AFTER_DAYS
+		# (ArchivedTask.may_contain_created_since), so younger tasks would vanish from it
+		raise ValueError(
+			f"older_than_days must be at least TASK_ARCHIVE_AFTER_DAYS ({settings.TASK_ARCHIVE_AFTER_DAYS})."
+		)
+	cutoff = timezone.now() - timedelta(days=days)
+	archived = 0
+	scanned = 0
+	batches = 0
+
+	while True:
+		ids = list(_archivable_tasks(cutoff).values_list('id', flat=True)[:batch_size])
+		if not ids:
+			break
+		scanned += len(ids)
+		with transaction.atomic():
+			# Re-check under lock: a task may have been reopened or edited since
+			rows = list(
+				_archivable_tasks(cutoff).filter(id__in=ids).select_for_update().values(*_ARCHIVED_COLUMNS)
+			)
+			ArchivedTask.objects.bulk_create([ArchivedTask(**row) for row in rows])
+			# Delta sync reports these under "archived", not "deleted"
+			TaskTombstone.objects.bulk_create([
+				TaskTombstone(user_id=row['user_id'], task_id=row['id'], archived=True) for row in rows
+			])
+			with bulk_removal():
+				Task.objects.filter(id__in=[row['id'] for row in rows]).delete()
+			for user_id in {row['user_id'] for row in rows}:
+				publish_change(user_id, "task", "archived")
+		archived += len(rows)
+		batches += 1
+
+	result = {
+		'archived_count': archived,
+		'rows_scanned': scanned,
+		'rows_written': archived,
+		'batches': batches,
+		'cutoff': cutoff.isoformat(),
+	}
+	logger.info("Archived %s completed tasks in %s batches (cutoff %s)", archived, batches, result['cutoff'])
 	return result
 
+
+@shared_task
+def purge_task_tombstones(older_than_days=None):
+	"""Drop tombstones older than any cursor delta sync still accepts."""
+	days = older_than_days if older_than_days is not None else settings.TASK_SYNC_TOMBSTONE_DAYS
+	cutoff = timezone.now() - timedelta(days=days)
+	deleted, _ = TaskTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+	logger.info("Purged %d task tombstones older than %d days", deleted, days)
+	return {'deleted': deleted, 'rows_scanned': deleted, 'rows_written': deleted}
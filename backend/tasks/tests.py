@@ -1,6 +1,6 @@
 from datetime import date, timedelta
 from django.contrib.auth import get_user_model
-from django.test import TestCase, TransactionTestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
@@ -443,6 +443,37 @@ class TaskViewSetTest(APITestCase):
 		response = self.client.post('/api/tasks/from-template/', data, format='json')
 		self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 	
+	def test_create_from_template_over_schedule_returns_ids(self):
+		"""Test that a schedule stamps the template on every base date and can return ids only"""
+		template = TaskTemplate.objects.create(user=self.user, name='Weekly', category='Work')
+		TaskTemplateItem.objects.create(template=template, title='Plan', due_date_offset=0, order=0)
+		TaskTemplateItem.objects.create(template=template, title='Review', due_date_offset=4, order=1)
+		data = {
+			'template_id': template.id,
+			'schedule': {'start': '2025-01-06', 'end': '2025-03-31', 'interval_days': 7},
+			'response': 'ids',
+		}
+		response = self.client.post('/api/tasks/from-template/', data, format='json')
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+		self.assertEqual(response.data['created'], 26)
+		self.assertNotIn('tasks', response.data)
+		self.assertEqual(set(response.data['ids']), set(Task.objects.filter(user=self.user).values_list('id', flat=True)))
+		self.assertTrue(Task.objects.filter(title='Review', due_date=date(2025, 4, 4)).exists())
+	
+	def test_create_from_template_with_base_dates_list(self):
+		"""Test that explicit base dates work and bad input is rejected with 400"""
+		template = TaskTemplate.objects.create(user=self.user, name='Checklist')
+		TaskTemplateItem.objects.create(template=template, title='Check', order=0)
+		response = self.client.post('/api/tasks/from-template/', {
+			'template_id': template.id, 'base_dates': ['2025-01-01', '2025-02-01'],
+		}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+		self.assertEqual([t['due_date'] for t in response.data['tasks']], ['2025-01-01', '2025-02-01'])
+		for bad in ({'base_dates': ['not-a-date']}, {'schedule': {'start': '2025-01-01'}}, {'base_dates': []}):
+			response = self.client.post('/api/tasks/from-template/', {'template_id': template.id, **bad}, format='json')
+			self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertEqual(Task.objects.filter(user=self.user).count(), 2)
+	
 	def test_update_task(self):
 		"""Test updating a task"""
 		task = Task.objects.create(
@@ -530,6 +561,67 @@ class TaskTemplateViewSetTest(APITestCase):
 		self.assertEqual(response.status_code, status.HTTP_200_OK)
 		self.assertEqual(len(response.data['items']), 2)
 		self.assertEqual(template.items.count(), 2)
+	
+	def test_update_template_items_applies_diff(self):
+		"""Test that editing one item of a large template keeps ids and runs a fixed number of queries"""
+		from django.db import connection
+		from django.test.utils import CaptureQueriesContext
+		template = TaskTemplate.objects.create(user=self.user, name='Template')
+		TaskTemplateItem.objects.bulk_create(
+			TaskTemplateItem(template=template, title=f'Item {i}', order=i) for i in range(100)
+		)
+		items = list(template.items.order_by('order'))
+		payload = [{'id': item.id, 'title': item.title} for item in items[:-1]]
+		payload[5]['title'] = 'Edited'
+		payload.append({'title': 'Brand new'})
+		with CaptureQueriesContext(connection) as ctx:
+			response = self.client.patch(f'/api/tasks/templates/{template.id}/', {'items': payload}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertLess(len(ctx.captured_queries), 20)
+		kept = list(template.items.order_by('order'))
+		self.assertEqual([item.id for item in kept[:99]], [item.id for item in items[:99]])
+		self.assertEqual(kept[5].title, 'Edited')
+		self.assertEqual(kept[99].title, 'Brand new')
+		self.assertFalse(TaskTemplateItem.objects.filter(id=items[-1].id).exists())
+	
+	def test_put_without_item_ids_replaces_every_item(self):
+		"""Test that id-less items on PUT are a full replace, and the UI's payload with ids is not"""
+		template = TaskTemplate.objects.create(user=self.user, name='Template')
+		old = [TaskTemplateItem.objects.create(template=template, title=f'Item {i}', order=i) for i in range(3)]
+		base = {'name': 'Template', 'description': '', 'category': ''}
+		
+		response = self.client.put(
+			f'/api/tasks/templates/{template.id}/',
+			dict(base, items=[{'title': 'Item 0', 'order': 0}, {'title': 'Item 1', 'order': 1}]), format='json',
+		)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		replaced = list(template.items.order_by('order'))
+		self.assertEqual([item.title for item in replaced], ['Item 0', 'Item 1'])
+		self.assertFalse(TaskTemplateItem.objects.filter(id__in=[item.id for item in old]).exists())
+		
+		# What frontend/app/templates/page.tsx sends when editing: ids for existing items
+		items = [
+			{'id': replaced[0].id, 'title': 'Item 0', 'description': '', 'category': '', 'label': 'none', 'due_date_offset': 0, 'order': 0},
+			{'id': replaced[1].id, 'title': 'Renamed', 'description': '', 'category': '', 'label': 'none', 'due_date_offset': 0, 'order': 1},
+			{'title': 'Added', 'description': '', 'category': '', 'label': 'none', 'due_date_offset': 2, 'order': 2},
+		]
+		response = self.client.put(f'/api/tasks/templates/{template.id}/', dict(base, items=items), format='json')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		kept = list(template.items.order_by('order'))
+		self.assertEqual([item.id for item in kept[:2]], [item.id for item in replaced])
+		self.assertEqual([item.title for item in kept], ['Item 0', 'Renamed', 'Added'])
+	
+	def test_update_template_rejects_foreign_item_ids(self):
+		"""Test that item ids from another template are rejected"""
+		template = TaskTemplate.objects.create(user=self.user, name='Template')
+		other = TaskTemplate.objects.create(user=self.user, name='Other')
+		foreign = TaskTemplateItem.objects.create(template=other, title='Not here')
+		response = self.client.patch(
+			f'/api/tasks/templates/{template.id}/', {'items': [{'id': foreign.id, 'title': 'Moved'}]}, format='json'
+		)
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		foreign.refresh_from_db()
+		self.assertEqual(foreign.title, 'Not here')
 
 
 class DashboardViewTest(APITestCase):
@@ -617,3 +709,672 @@ class TaskSubscriptionAccessTest(APITestCase):
 		
 		response = self.client.get('/api/tasks/')
 		self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AsyncTaskViewsTest(APITestCase):
+	"""Unit tests for the async task list and dashboard variants"""
+	
+	def setUp(self):
+		self.user = User.objects.create_user(
+			username='testuser1',
+			email='test@example.com',
+			password='Test1234#'
+		)
+		self.subscription = Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		for i in range(12):
+			Task.objects.create(user=self.user, title=f'Task {i}', due_date=date.today(), completed=i % 3 == 0)
+		self.client = APIClient()
+		response = self.client.post('/api/auth/login/', {'username': 'testuser1', 'password': 'Test1234#'}, format='json')
+		self.auth = f"Bearer {response.data['access']}"
+		self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+	
+	async def test_task_list_matches_sync_endpoint(self):
+		"""Test that the async list returns the same page as the DRF list"""
+		from django.test import AsyncClient
+		from asgiref.sync import sync_to_async
+		expected = await sync_to_async(self.client.get)('/api/tasks/?page=2')
+		response = await AsyncClient().get('/api/async/tasks/?page=2', headers={'Authorization': self.auth})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		data = response.json()
+		self.assertEqual(data['count'], 12)
+		self.assertEqual([t['id'] for t in data['results']], [t['id'] for t in expected.data['results']])
+		self.assertIsNone(data['next'])
+		self.assertTrue(data['previous'].endswith('/api/async/tasks/'))
+	
+	async def test_dashboard_matches_sync_endpoint(self):
+		"""Test that the async dashboard returns the same payload as the DRF view"""
+		from django.test import AsyncClient
+		from asgiref.sync import sync_to_async
+		expected = await sync_to_async(self.client.get)('/api/dashboard/?period=week')
+		response = await AsyncClient().get('/api/async/dashboard/?period=week', headers={'Authorization': self.auth})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.json(), expected.json())
+	
+	async def test_requires_token(self):
+		"""Test that the async endpoints reject anonymous requests"""
+		from django.test import AsyncClient
+		response = await AsyncClient().get('/api/async/tasks/')
+		self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+	
+	def test_expired_subscription_forbidden(self):
+		"""Test that an expired subscription blocks the async list"""
+		from django.test import AsyncClient
+		from asgiref.sync import async_to_sync
+		self.subscription.end_date = timezone.now().date() - timedelta(days=1)
+		self.subscription.save(update_fields=['end_date'])
+		# A fresh token carries the expired claims, so the database is consulted
+		login = APIClient().post('/api/auth/login/', {'username': 'testuser1', 'password': 'Test1234#'}, format='json')
+		response = async_to_sync(AsyncClient().get)(
+			'/api/async/tasks/', headers={'Authorization': f"Bearer {login.data['access']}"}
+		)
+		self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TransactionTestCase):
+	"""Tests for primary/replica read routing with read-your-writes stickiness"""
+	# Not TestCase: reads inside its wrapping transaction always use the primary
+	databases = {'default', 'replica'}
+	
+	def setUp(self):
+		from django.core.cache import cache
+		cache.clear()
+		self.user = User.objects.create_user(username='testuser1', password='Test1234#')
+		subscription = Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		# The replica has the user but has not caught up with their task yet
+		# (bulk_create skips the post_save signals that would write to the primary)
+		User.objects.using('replica').bulk_create([self.user])
+		Subscription.objects.using('replica').bulk_create([subscription])
+		Task.objects.create(user=self.user, title='Primary only', due_date=date.today())
+		self.client = APIClient()
+		response = self.client.post('/api/auth/login/', {'username': 'testuser1', 'password': 'Test1234#'}, format='json')
+		self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+	
+	def test_safe_api_reads_use_replica(self):
+		"""Test that a GET reads from the replica"""
+		response = self.client.get('/api/tasks/')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data['count'], 0)
+	
+	def test_reads_stick_to_primary_after_write(self):
+		"""Test that a user's reads go to the primary right after they write"""
+		response = self.client.post('/api/tasks/', {'title': 'New', 'due_date': date.today().isoformat()}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+		response = self.client.get('/api/tasks/')
+		self.assertEqual(response.data['count'], 2)
+		
+		from django.core.cache import cache
+		cache.clear()  # sticky window over
+		response = self.client.get('/api/tasks/')
+		self.assertEqual(response.data['count'], 0)
+	
+	def test_jobs_read_primary_unless_opted_in(self):
+		"""Test that code outside requests reads the primary unless it uses replica_reads()"""
+		from django.db import transaction
+		from core.db_routers import replica_reads
+		self.assertEqual(Task.objects.count(), 1)
+		with replica_reads():
+			self.assertEqual(Task.objects.count(), 0)
+			with transaction.atomic():
+				self.assertEqual(Task.objects.count(), 1)
+
+
+class ArchiveCompletedTasksTest(APITestCase):
+	"""Tests for moving old completed tasks into the archive table"""
+	
+	def setUp(self):
+		self.user = User.objects.create_user(username='testuser1', password='Test1234#')
+		Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.user)
+	
+	def _task(self, age_days, **kwargs):
+		task = Task.objects.create(user=self.user, title=kwargs.pop('title', 'Task'), due_date=date.today(), **kwargs)
+		old = timezone.now() - timedelta(days=age_days)
+		Task.objects.filter(pk=task.pk).update(created_at=old, updated_at=old)
+		return task
+	
+	def test_archives_only_old_completed_tasks(self):
+		"""Test that only long-untouched completed tasks without live instances move"""
+		from .models import ArchivedTask
+		from .tasks import archive_completed_tasks
+		old_done = self._task(400, completed=True)
+		recent_done = self._task(10, completed=True)
+		old_open = self._task(400, completed=False)
+		parent = self._task(400, completed=True, is_recurring=True, recurrence_type='daily')
+		instance = self._task(400, completed=True, parent_task=parent)
+		
+		result = archive_completed_tasks(batch_size=1, older_than_days=365)
+		
+		self.assertEqual(result['archived_count'], 2)
+		self.assertEqual(result['batches'], 2)
+		self.assertEqual(set(ArchivedTask.objects.values_list('id', flat=True)), {old_done.id, instance.id})
+		self.assertEqual(set(Task.objects.values_list('id', flat=True)), {recent_done.id, old_open.id, parent.id})
+		self.assertEqual(ArchivedTask.objects.get(id=instance.id).parent_task_id, parent.id)
+	
+	@override_settings(TASK_EVENTS_REDIS_URL='redis://localhost:6379/0', TASK_SYNC_SETTLE_SECONDS=0)
+	def test_batch_writes_tombstones_and_events_once(self):
+		"""Test that a batch costs the same queries for 5 or 40 tasks and syncs as archived"""
+		from django.db import connection
+		from django.test.utils import CaptureQueriesContext
+		from .models import ArchivedTask
+		from .tasks import archive_completed_tasks
+		cursor = self.client.get('/api/tasks/changes/').data['cursor']
+		counts = []
+		for size in (5, 40):
+			for _ in range(size):
+				self._task(400, completed=True)
+			with patch('tasks.events._publish') as publish:
+				with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+					archive_completed_tasks(older_than_days=365)
+			counts.append(len(ctx.captured_queries))
+			self.assertEqual(publish.call_count, 1)
+		self.assertEqual(counts[0], counts[1])
+		
+		archived_ids = set(ArchivedTask.objects.values_list('id', flat=True))
+		response = self.client.get('/api/tasks/changes/', {'since': cursor, 'limit': 100})
+		self.assertEqual(response.data['deleted'], [])
+		self.assertEqual(set(response.data['archived']), archived_ids)
+		self.assertEqual(len(response.data['archived']), 45)
+	
+	def test_cutoff_cannot_be_younger_than_the_dashboard_assumes(self):
+		"""Test that archiving tasks younger than TASK_ARCHIVE_AFTER_DAYS is refused"""
+		from io import StringIO
+		from django.core.management import call_command
+		from django.core.management.base import CommandError
+		from .tasks import archive_completed_tasks
+		task = self._task(2, completed=True)
+		with self.assertRaises(ValueError):
+			archive_completed_tasks(older_than_days=1)
+		with self.assertRaisesRegex(CommandError, 'TASK_ARCHIVE_AFTER_DAYS'):
+			call_command('archive_tasks', older_than_days=1, stdout=StringIO())
+		self.assertTrue(Task.objects.filter(pk=task.pk).exists())
+	
+	def test_include_archived_lists_both_tables(self):
+		"""Test that include_archived pages over live and archived tasks together"""
+		from .tasks import archive_completed_tasks
+		for i in range(8):
+			self._task(400 + i, completed=True, title=f'Old {i}')
+		for i in range(4):
+			self._task(i, title=f'Live {i}')
+		archive_completed_tasks(older_than_days=365)
+		
+		response = self.client.get('/api/tasks/')
+		self.assertEqual(response.data['count'], 4)
+		
+		response = self.client.get('/api/tasks/?include_archived=1')
+		self.assertEqual(response.data['count'], 12)
+		self.assertEqual([t['title'] for t in response.data['results'][:5]], ['Live 0', 'Live 1', 'Live 2', 'Live 3', 'Old 0'])
+		self.assertEqual([t['archived'] for t in response.data['results'][3:5]], [False, True])
+		response = self.client.get('/api/tasks/?include_archived=1&page=2')
+		self.assertEqual(len(response.data['results']), 2)
+	
+	@override_settings(TASK_ARCHIVE_AFTER_DAYS=7)
+	def test_dashboard_reads_archive_only_for_old_periods(self):
+		"""Test that the dashboard merges archived tasks only when the period reaches them"""
+		from django.db import connection
+		from django.test.utils import CaptureQueriesContext
+		from .tasks import archive_completed_tasks
+		self._task(20, completed=True)
+		self._task(1, completed=False)
+		archive_completed_tasks()
+		
+		with CaptureQueriesContext(connection) as ctx:
+			response = self.client.get('/api/dashboard/?period=week')
+		self.assertEqual(response.data['total_tasks'], 1)
+		self.assertFalse(any('tasks_archivedtask' in q['sql'] for q in ctx.captured_queries))
+		
+		response = self.client.get('/api/dashboard/?period=month')
+		self.assertEqual(response.data['total_tasks'], 2)
+		self.assertEqual(response.data['completed_tasks'], 1)
+
+
+class TaskExportTest(APITestCase):
+	"""Tests for the streaming task export"""
+	
+	def setUp(self):
+		self.user = User.objects.create_user(username='testuser1', password='Test1234#')
+		Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		other = User.objects.create_user(username='other', password='Test1234#')
+		Task.objects.create(user=other, title='Not mine', due_date=date.today())
+		for i in range(5):
+			Task.objects.create(user=self.user, title=f'Task {i}', due_date=date.today() + timedelta(days=i % 2))
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.user)
+	
+	def test_csv_export_streams_all_tasks_without_count(self):
+		"""Test that CSV export includes every task and never runs COUNT"""
+		import csv
+		import io
+		from django.db import connection
+		from django.test.utils import CaptureQueriesContext
+		with CaptureQueriesContext(connection) as ctx:
+			response = self.client.get('/api/tasks/export/')
+			body = b''.join(response.streaming_content).decode()
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertTrue(response['Content-Type'].startswith('text/csv'))
+		self.assertIn('attachment;', response['Content-Disposition'])
+		rows = list(csv.DictReader(io.StringIO(body)))
+		self.assertEqual(len(rows), 5)
+		self.assertEqual({row['title'] for row in rows}, {f'Task {i}' for i in range(5)})
+		self.assertEqual(rows[0]['recurrence_days'], '[]')
+		self.assertFalse(any('COUNT(' in q['sql'].upper() for q in ctx.captured_queries))
+	
+	def test_csv_export_neutralises_formulas(self):
+		"""Test that text cells that a spreadsheet would evaluate are prefixed with a quote"""
+		import csv
+		import io
+		import json
+		Task.objects.all().delete()
+		for title in ('=HYPERLINK("http://x")', '+1', '-2', '@SUM(A1)', 'Plain - title'):
+			Task.objects.create(user=self.user, title=title, description='=1+1', due_date=date.today())
+		body = b''.join(self.client.get('/api/tasks/export/').streaming_content).decode()
+		rows = list(csv.DictReader(io.StringIO(body)))
+		self.assertEqual(
+			{row['title'] for row in rows},
+			{'\'=HYPERLINK("http://x")', "'+1", "'-2", "'@SUM(A1)", 'Plain - title'},
+		)
+		self.assertEqual({row['description'] for row in rows}, {"'=1+1"})
+		ndjson = self.client.get('/api/tasks/export/?output=ndjson')
+		titles = {json.loads(line)['title'] for line in b''.join(ndjson.streaming_content).decode().splitlines()}
+		self.assertIn('=HYPERLINK("http://x")', titles)
+	
+	def test_ndjson_export_applies_list_filters(self):
+		"""Test that NDJSON export honours the due_date filter"""
+		import json
+		response = self.client.get(f'/api/tasks/export/?output=ndjson&due_date={date.today().isoformat()}')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		lines = b''.join(response.streaming_content).decode().splitlines()
+		self.assertEqual(len(lines), 3)
+		record = json.loads(lines[0])
+		self.assertEqual(record['due_date'], date.today().isoformat())
+		self.assertIsNone(record['parent_task'])
+	
+	def test_unknown_output_rejected(self):
+		"""Test that an unsupported output format returns 400"""
+		response = self.client.get('/api/tasks/export/?output=xml')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TaskImportTest(APITestCase):
+	"""Tests for the streaming bulk task import"""
+	
+	def setUp(self):
+		self.user = User.objects.create_user(username='testuser1', password='Test1234#')
+		Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.user)
+	
+	def _upload(self, name, content, **data):
+		from django.core.files.uploadedfile import SimpleUploadedFile
+		return self.client.post(
+			'/api/tasks/import/', {'file': SimpleUploadedFile(name, content.encode()), **data}, format='multipart'
+		)
+	
+	def test_csv_import_reports_bad_rows_and_keeps_good_ones(self):
+		"""Test that invalid CSV rows are reported without aborting the import"""
+		content = (
+			"title,due_date,completed,category,recurrence_days\n"
+			"First,2025-01-10,true,Work,\n"
+			"Missing date,,false,,\n"
+			"Weekly,2025-01-11,false,,\"[0, 2]\"\n"
+		)
+		response = self._upload('tasks.csv', content)
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+		self.assertEqual(response.data['created'], 2)
+		self.assertEqual(response.data['error_count'], 1)
+		self.assertEqual(response.data['errors'][0]['row'], 2)
+		self.assertIn('due_date', response.data['errors'][0]['errors'])
+		first = Task.objects.get(user=self.user, title='First')
+		self.assertTrue(first.completed)
+		self.assertEqual(first.category, 'Work')
+	
+	def test_json_array_is_parsed_incrementally(self):
+		"""Test that a JSON array split across read chunks is parsed item by item"""
+		import io
+		import json
+		from . import importers
+		items = [{'title': f'Task {i}', 'due_date': '2025-02-01'} for i in range(20)]
+		with patch.object(importers, '_READ_SIZE', 16):
+			rows = list(importers.parse_json_array(io.BytesIO(json.dumps(items).encode())))
+		self.assertEqual([data for _, data in rows], items)
+	
+	def test_ics_import_reads_todos_and_events(self):
+		"""Test that VTODO/VEVENT components become tasks"""
+		content = (
+			"BEGIN:VCALENDAR\r\n"
+			"BEGIN:VTODO\r\nSUMMARY:Pay rent\r\nDUE;VALUE=DATE:20250301\r\nSTATUS:COMPLETED\r\nEND:VTODO\r\n"
+			"BEGIN:VEVENT\r\nSUMMARY:Team\r\n  sync\r\nDTSTART:20250302T090000Z\r\n"
+			"DESCRIPTION:Line one\\nLine two\r\nCATEGORIES:Work,Meetings\r\nEND:VEVENT\r\n"
+			"END:VCALENDAR\r\n"
+		)
+		response = self._upload('calendar.ics', content)
+		self.assertEqual(response.data['created'], 2)
+		rent = Task.objects.get(title='Pay rent')
+		self.assertEqual(rent.due_date, date(2025, 3, 1))
+		self.assertTrue(rent.completed)
+		sync = Task.objects.get(title='Team sync')
+		self.assertEqual(sync.description, 'Line one\nLine two')
+		self.assertEqual(sync.category, 'Work')
+	
+	def test_rows_are_written_in_batches(self):
+		"""Test that the import issues one insert per batch rather than per row"""
+		from django.db import connection
+		from django.test.utils import CaptureQueriesContext
+		from .importers import import_tasks
+		import io
+		content = "title,due_date\n" + "".join(f"Task {i},2025-01-01\n" for i in range(25))
+		with CaptureQueriesContext(connection) as ctx:
+			report = import_tasks(self.user, io.BytesIO(content.encode()), 'csv', batch_size=10)
+		self.assertEqual(report['created'], 25)
+		inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+		self.assertEqual(len(inserts), 3)
+	
+	def test_copy_payload_round_trips_through_csv(self):
+		"""Test that the shared COPY helper writes values COPY (FORMAT csv) reads back unchanged"""
+		import csv
+		from .bulk import copy_buffer, copy_statement
+		now = timezone.now()
+		task = Task(
+			user_id=self.user.pk, title='Say "hi", then\nleave', description='', due_date=date(2025, 1, 2),
+			recurrence_days=[0, 3], created_at=now, updated_at=now,
+		)
+		statement = copy_statement(Task)
+		self.assertIn('FORMAT csv', statement)
+		not_null = statement.split('FORCE_NOT_NULL (')[1]
+		self.assertIn('"description"', not_null)
+		self.assertNotIn('"recurrence_type"', not_null)
+		columns = [name.strip('" ') for name in statement.split('(')[1].split(')')[0].split(',')]
+		row = dict(zip(columns, next(csv.reader(copy_buffer(Task, [task])))))
+		self.assertEqual(row['title'], 'Say "hi", then\nleave')
+		self.assertEqual(row['description'], '')
+		self.assertEqual(row['recurrence_type'], '')  # unquoted empty: NULL
+		self.assertEqual(row['recurrence_days'], '[0, 3]')
+		self.assertEqual(row['completed'], 'f')
+		self.assertEqual(row['due_date'], '2025-01-02')
+		self.assertEqual(row['created_at'], now.isoformat())
+		self.assertNotIn('id', columns)
+	
+	def test_unknown_file_type_rejected(self):
+		"""Test that a file with an unknown extension and no input hint returns 400"""
+		response = self._upload('tasks.txt', 'title\nx\n')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CalendarFeedTest(APITestCase):
+	"""Tests for the tokenized iCalendar feed"""
+	
+	def setUp(self):
+		from django.core.cache import cache
+		cache.clear()
+		self.user = User.objects.create_user(username='testuser1', password='Test1234#')
+		Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.user)
+		response = self.client.post('/api/auth/calendar-token/')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.feed_url = response.data['calendar_url'].replace('http://testserver', '')
+		self.feed_client = APIClient()
+	
+	def test_recurring_parent_is_one_event_with_rrule(self):
+		"""Test that a recurring parent carries an RRULE and its instances are left out"""
+		parent = Task.objects.create(
+			user=self.user, title='Standup', due_date=date(2025, 1, 6),
+			is_recurring=True, recurrence_type='weekly', recurrence_days=[0, 2], recurrence_count=4
+		)
+		Task.objects.create(user=self.user, title='Standup', due_date=date(2025, 1, 8), parent_task=parent)
+		Task.objects.create(user=self.user, title='One-off, with comma', due_date=date(2025, 1, 7), completed=True)
+		response = self.feed_client.get(self.feed_url)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertTrue(response['Content-Type'].startswith('text/calendar'))
+		body = response.content.decode()
+		self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+		self.assertIn('RRULE:FREQ=WEEKLY;BYDAY=MO,WE;COUNT=5\r\n', body)
+		self.assertIn('DTSTART;VALUE=DATE:20250106\r\n', body)
+		self.assertIn('SUMMARY:✓ One-off\\, with comma\r\n', body)
+	
+	def test_unchanged_feed_returns_304(self):
+		"""Test that a poller sending the previous ETag gets 304 until a task is deleted"""
+		task = Task.objects.create(user=self.user, title='Keep', due_date=date.today())
+		Task.objects.create(user=self.user, title='Drop', due_date=date.today())
+		first = self.feed_client.get(self.feed_url)
+		etag = first['ETag']
+		self.assertIn('Last-Modified', first)
+		second = self.feed_client.get(self.feed_url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+		Task.objects.exclude(pk=task.pk).get().delete()
+		third = self.feed_client.get(self.feed_url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(third.status_code, status.HTTP_200_OK)
+		self.assertNotEqual(third['ETag'], etag)
+		self.assertNotIn('Drop', third.content.decode())
+	
+	def test_unchanged_feed_takes_one_query(self):
+		"""Test that a 304 for a subscribed poller costs only the validator query"""
+		Task.objects.create(user=self.user, title='Keep', due_date=date.today())
+		etag = self.feed_client.get(self.feed_url)['ETag']
+		with self.assertNumQueries(1):
+			response = self.feed_client.get(self.feed_url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+	
+	def test_expired_subscription_is_refused_even_when_unchanged(self):
+		"""Test that a poller with a current ETag gets 403, not 304, once the subscription lapses"""
+		Task.objects.create(user=self.user, title='Keep', due_date=date.today())
+		first = self.feed_client.get(self.feed_url)
+		Subscription.objects.filter(user=self.user).update(end_date=timezone.now().date() - timedelta(days=1))
+		response = self.feed_client.get(
+			self.feed_url, HTTP_IF_NONE_MATCH=first['ETag'], HTTP_IF_MODIFIED_SINCE=first['Last-Modified'],
+		)
+		self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+	
+	def test_deletion_changes_validators_without_the_cache(self):
+		"""Test that the deletion marker lives in the database, not per-process cache"""
+		from django.core.cache import cache
+		Task.objects.create(user=self.user, title='Keep', due_date=date.today())
+		drop = Task.objects.create(user=self.user, title='Drop', due_date=date.today())
+		etag = self.feed_client.get(self.feed_url)['ETag']
+		drop.delete()
+		cache.clear()
+		response = self.feed_client.get(self.feed_url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertNotIn('Drop', response.content.decode())
+	
+	@override_settings(ALLOWED_HOSTS=['testserver', 'cal.example.com'])
+	def test_each_host_gets_its_own_version(self):
+		"""Test that UIDs carry the requesting host even when the feed is cached"""
+		Task.objects.create(user=self.user, title='Keep', due_date=date.today())
+		first = self.feed_client.get(self.feed_url)
+		other = self.feed_client.get(self.feed_url, HTTP_HOST='cal.example.com')
+		self.assertNotEqual(first['ETag'], other['ETag'])
+		self.assertIn('@cal.example.com', other.content.decode())
+		self.assertNotIn('@testserver', other.content.decode())
+	
+	def test_rotated_or_revoked_token_is_not_found(self):
+		"""Test that old and revoked feed URLs return 404"""
+		self.client.post('/api/auth/calendar-token/')
+		self.assertEqual(self.feed_client.get(self.feed_url).status_code, status.HTTP_404_NOT_FOUND)
+		response = self.client.delete('/api/auth/calendar-token/')
+		self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+		self.assertIsNone(self.client.get('/api/auth/calendar-token/').data['calendar_url'])
+
+
+class TaskDeltaSyncTest(APITestCase):
+	"""Tests for the /api/tasks/changes/ delta sync endpoint"""
+	
+	def setUp(self):
+		self.user = User.objects.create_user(username='testuser1', password='Test1234#')
+		Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		other = User.objects.create_user(username='other', password='Test1234#')
+		Task.objects.create(user=other, title='Not mine', due_date=date.today())
+		self.tasks = [Task.objects.create(user=self.user, title=f'Task {i}', due_date=date.today()) for i in range(3)]
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.user)
+	
+	@override_settings(TASK_SYNC_SETTLE_SECONDS=0)
+	def test_changes_and_tombstones_since_cursor(self):
+		"""Test that only updates and deletions after the cursor are returned"""
+		first = self.client.get('/api/tasks/changes/')
+		self.assertEqual(first.status_code, status.HTTP_200_OK)
+		self.assertEqual({t['title'] for t in first.data['changed']}, {'Task 0', 'Task 1', 'Task 2'})
+		self.assertEqual(first.data['deleted'], [])
+		cursor = first.data['cursor']
+		
+		idle = self.client.get('/api/tasks/changes/', {'since': cursor})
+		self.assertEqual((idle.data['changed'], idle.data['deleted']), ([], []))
+		
+		self.tasks[0].title = 'Renamed'
+		self.tasks[0].save()
+		deleted_id = self.tasks[1].id
+		self.tasks[1].delete()
+		response = self.client.get('/api/tasks/changes/', {'since': cursor})
+		self.assertEqual([t['title'] for t in response.data['changed']], ['Renamed'])
+		self.assertEqual(response.data['deleted'], [deleted_id])
+		self.assertFalse(response.data['has_more'])
+	
+	@override_settings(TASK_SYNC_SETTLE_SECONDS=0)
+	def test_pages_until_has_more_is_false(self):
+		"""Test that following the cursor pages through every change exactly once"""
+		seen = []
+		cursor = None
+		for _ in range(5):
+			params = {'limit': 2, **({'since': cursor} if cursor else {})}
+			response = self.client.get('/api/tasks/changes/', params)
+			seen.extend(t['id'] for t in response.data['changed'])
+			cursor = response.data['cursor']
+			if not response.data['has_more']:
+				break
+		self.assertEqual(sorted(seen), sorted(t.id for t in self.tasks))
+	
+	def test_recent_changes_are_resent_within_settle_window(self):
+		"""Test that the cursor stays behind rows that might still be committing"""
+		first = self.client.get('/api/tasks/changes/')
+		again = self.client.get('/api/tasks/changes/', {'since': first.data['cursor']})
+		self.assertEqual(len(again.data['changed']), 3)
+	
+	def test_bad_and_expired_cursors(self):
+		"""Test that malformed cursors are rejected and expired ones ask for a full refetch"""
+		self.assertEqual(self.client.get('/api/tasks/changes/', {'since': 'nope'}).status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertEqual(self.client.get('/api/tasks/changes/', {'since': '0-0-0-0'}).status_code, status.HTTP_410_GONE)
+	
+	def test_account_deletion_leaves_no_tombstones(self):
+		"""Test that cascaded deletes from a removed account skip the deletion log"""
+		from .models import TaskTombstone
+		from .tasks import purge_task_tombstones
+		self.tasks[0].delete()
+		self.assertEqual(TaskTombstone.objects.filter(user=self.user).count(), 1)
+		TaskTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=60))
+		self.assertEqual(purge_task_tombstones()['deleted'], 1)
+		self.user.delete()
+		self.assertFalse(TaskTombstone.objects.exists())
+
+	def test_purge_with_zero_days_drops_every_tombstone(self):
+		"""Test that an explicit 0 is honoured rather than replaced by the default"""
+		from .models import TaskTombstone
+		from .tasks import purge_task_tombstones
+		self.tasks[0].delete()
+		TaskTombstone.objects.update(deleted_at=timezone.now() - timedelta(minutes=1))
+		self.assertEqual(purge_task_tombstones(older_than_days=0)['deleted'], 1)
+		self.assertFalse(TaskTombstone.objects.exists())
+
+
+class TaskEventsTest(APITestCase):
+	"""Tests for change events and the SSE stream"""
+	
+	def setUp(self):
+		self.user = User.objects.create_user(username='testuser1', password='Test1234#')
+		Subscription.objects.create(
+			user=self.user,
+			plan=Subscription.PLAN_TRIAL,
+			status=Subscription.STATUS_ACTIVE,
+			start_date=timezone.now().date(),
+			end_date=timezone.now().date() + timedelta(days=14)
+		)
+		self.client = APIClient()
+		response = self.client.post('/api/auth/login/', {'username': 'testuser1', 'password': 'Test1234#'}, format='json')
+		self.access = response.data['access']
+		self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+	
+	@override_settings(TASK_EVENTS_REDIS_URL='redis://localhost:6379/0')
+	def test_writes_publish_after_commit(self):
+		"""Test that task saves, deletes and template writes publish to the user's channel"""
+		import json
+		with patch('tasks.events._publish') as publish:
+			with self.captureOnCommitCallbacks(execute=True):
+				response = self.client.post('/api/tasks/', {'title': 'New', 'due_date': date.today().isoformat()}, format='json')
+				self.client.delete(f"/api/tasks/{response.data['id']}/")
+				self.client.post('/api/tasks/templates/', {'name': 'Weekly', 'items': [{'title': 'Plan'}]}, format='json')
+				self.assertFalse(publish.called)
+		events = [(call.args[0], json.loads(call.args[1])) for call in publish.call_args_list]
+		channel = f'task-events:{self.user.id}'
+		self.assertTrue(all(ch == channel for ch, _ in events))
+		actions = [(event['type'], event['action']) for _, event in events]
+		self.assertIn(('task', 'created'), actions)
+		self.assertIn(('task', 'deleted'), actions)
+		self.assertEqual(actions[-1], ('template', 'created'))
+	
+	async def _stream(self, path):
+		from django.test import AsyncClient
+		response = await AsyncClient().get(path)
+		body = b''.join([chunk async for chunk in response.streaming_content]).decode() if response.streaming else ''
+		return response, body
+	
+	async def test_stream_without_redis_sends_poll_hint(self):
+		"""Test that the stream degrades to a polling hint when events are disabled"""
+		response, body = await self._stream(f'/api/async/events/?access_token={self.access}')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response['Content-Type'], 'text/event-stream')
+		self.assertIn('event: poll\n', body)
+		self.assertIn('retry: 30000\n', body)
+	
+	@override_settings(TASK_EVENTS_REDIS_URL='redis://127.0.0.1:1/0')
+	async def test_stream_with_unreachable_redis_sends_poll_hint(self):
+		"""Test that a Redis connection failure also ends in a polling hint"""
+		response, body = await self._stream(f'/api/async/events/?access_token={self.access}')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertIn('event: poll\n', body)
+	
+	async def test_stream_requires_authentication(self):
+		"""Test that the stream rejects requests without a token"""
+		response, _ = await self._stream('/api/async/events/')
+		self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
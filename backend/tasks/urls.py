@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet, TaskTemplateViewSet
+from .views import TaskViewSet, TaskTemplateViewSet, calendar_feed
 
 
 app_name = 'tasks'
@@ -11,5 +11,6 @@ router.register(r'templates', TaskTemplateViewSet, basename='template')
 router.register(r'', TaskViewSet, basename='task')
 
 urlpatterns = [
+    path('calendar/<str:token>.ics', calendar_feed, name='calendar-feed'),
     path('', include(router.urls)),
 ]
@@ -1,14 +1,25 @@
 from datetime import date, timedelta, time
-from django.db.models import Count, Q
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Value
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_safe
 from django.utils import timezone
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import api_view, action, permission_classes
 from rest_framework.response import Response
-from rest_framework.parsers import JSONParser
-from .models import Task, TaskTemplate
+from rest_framework.parsers import JSONParser, MultiPartParser
+from .models import ArchivedTask, Task, TaskTemplate, TaskTombstone
 from .serializers import (
-	TaskSerializer, TaskTemplateSerializer, TaskTemplateCreateSerializer
+	ArchivedTaskSerializer, TaskSerializer, TaskTemplateSerializer, TaskTemplateCreateSerializer
 )
+from .exports import EXPORTERS
+from .importers import PARSERS, detect_input, import_tasks
+from .ical import feed_tasks, render_feed
+from .sync import CursorExpired, InvalidCursor, changes_since
+from .events import publish_change
 from billing.models import Subscription
 from django.core.exceptions import PermissionDenied
 
@@ -21,28 +32,119 @@ class TaskViewSet(viewsets.ModelViewSet):
 
 	def get_queryset(self):
 		# Enforce subscription/trial access
-		from billing.views import _get_or_create_trial
-		sub = _get_or_create_trial(self.request.user)
-		# Check if subscription is active (this will auto-expire if needed)
-		if not sub.is_active():
-			raise PermissionDenied("Subscription required. Please subscribe to continue using tasks.")
+		from billing.views import _require_active_subscription
+		_require_active_subscription(self.request.user, "Subscription required. Please subscribe to continue using tasks.")
 		qs = Task.objects.filter(user=self.request.user)
 		due_date_param = self.request.query_params.get("due_date")
 		if due_date_param:
 			qs = qs.filter(due_date=due_date_param)
 		return qs
 
+	def list(self, request, *args, **kwargs):
+		if request.query_params.get("include_archived") not in ("1", "true", "True"):
+			return super().list(request, *args, **kwargs)
+
+		# Paginate (id, created_at) over both tables, then load just the page's rows
+		live = self.get_queryset().order_by().values_list("id", "created_at", Value(False))
+		archived = ArchivedTask.objects.filter(user=request.user)
+		due_date_param = request.query_params.get("due_date")
+		if due_date_param:
+			archived = archived.filter(due_date=due_date_param)
+		archived = archived.order_by().values_list("id", "created_at", Value(True))
+		combined = live.union(archived, all=True).order_by("-created_at", "-id")
+
+		page = self.paginate_queryset(combined)
+		live_ids = [row[0] for row in page if not row[2]]
+		archived_ids = [row[0] for row in page if row[2]]
+		live_tasks = Task.objects.in_bulk(live_ids)
+		archived_tasks = ArchivedTask.objects.in_bulk(archived_ids)
+		results = [
+			ArchivedTaskSerializer(archived_tasks[task_id]).data if is_archived
+			else dict(TaskSerializer(live_tasks[task_id]).data, archived=False)
+			for task_id, _, is_archived in page
+			if task_id in (archived_tasks if is_archived else live_tasks)
+		]
+		return self.get_paginated_response(results)
+
+	@action(detail=False, methods=["get"], url_path="export")
+	def export(self, request):
+		"""Stream every matching task as CSV (default) or NDJSON, without paging or COUNT."""
+		# `format` is taken by DRF's renderer negotiation, hence `output`
+		output = request.query_params.get("output", "csv")
+		if output not in EXPORTERS:
+			return Response(
+				{"output": [f"Choose one of: {', '.join(EXPORTERS)}"]}, status=status.HTTP_400_BAD_REQUEST
+			)
+		querysets = [self.get_queryset().order_by("-created_at", "-id")]
+		if request.query_params.get("include_archived") in ("1", "true", "True"):
+			archived = ArchivedTask.objects.filter(user=request.user)
+			due_date_param = request.query_params.get("due_date")
+			if due_date_param:
+				archived = archived.filter(due_date=due_date_param)
+			querysets.append(archived.order_by("-created_at", "-id"))
+
+		iterate, content_type = EXPORTERS[output]
+		response = StreamingHttpResponse(iterate(querysets), content_type=content_type)
+		response["Content-Disposition"] = f'attachment; filename="tasks-{timezone.localdate().isoformat()}.{output}"'
+		# Let nginx pass chunks through instead of buffering the whole export
+		response["X-Accel-Buffering"] = "no"
+		return response
+
+	@action(detail=False, methods=["get"], url_path="changes")
+	def changes(self, request):
+		"""
+		Tasks created or updated, ids deleted, and ids archived (still listed by
+		?include_archived=1) since `since` (a cursor from the previous call).
+		Keep calling with the returned cursor while has_more.
+		"""
+		try:
+			limit = min(int(request.query_params.get("limit", settings.TASK_SYNC_PAGE_SIZE)), settings.TASK_SYNC_MAX_PAGE_SIZE)
+		except ValueError:
+			return Response({"limit": ["A valid integer is required."]}, status=status.HTTP_400_BAD_REQUEST)
+		try:
+			result = changes_since(
+				self.get_queryset(), request.user.id, request.query_params.get("since"), max(limit, 1)
+			)
+		except InvalidCursor as exc:
+			return Response({"since": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+		except CursorExpired:
+			return Response(
+				{"since": ["Cursor has expired; fetch all tasks again without `since`."]},
+				status=status.HTTP_410_GONE,
+			)
+		result["changed"] = TaskSerializer(result["changed"], many=True).data
+		return Response(result)
+
+	@action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser])
+	def import_file(self, request):
+		"""Bulk-create tasks from an uploaded CSV, NDJSON, JSON array or iCalendar file."""
+		from billing.views import _require_active_subscription
+		_require_active_subscription(request.user, "Subscription required. Please subscribe to continue using tasks.")
+		upload = request.FILES.get("file")
+		if upload is None:
+			return Response({"file": ["No file was submitted."]}, status=status.HTTP_400_BAD_REQUEST)
+		input_format = detect_input(upload.name, request.data.get("input") or request.query_params.get("input"))
+		if input_format is None:
+			return Response(
+				{"input": [f"Could not tell the file type; pass input as one of: {', '.join(PARSERS)}"]},
+				status=status.HTTP_400_BAD_REQUEST,
+			)
+		report = import_tasks(request.user, upload, input_format)
+		if report["created"]:
+			# Bulk writes send no post_save
+			publish_change(request.user.id, "task", "bulk_created")
+		response_status = status.HTTP_201_CREATED if report["created"] else status.HTTP_400_BAD_REQUEST
+		return Response(report, status=response_status)
+
 	def perform_create(self, serializer):
-		from billing.views import _get_or_create_trial
-		sub = _get_or_create_trial(self.request.user)
-		if not sub.is_active():
-			raise PermissionDenied("Subscription required. Please subscribe to continue using tasks.")
+		from billing.views import _require_active_subscription
+		_require_active_subscription(self.request.user, "Subscription required. Please subscribe to continue using tasks.")
 		task = serializer.save(user=self.request.user)
 		
 		# If this is a recurring task, calculate next recurrence date
 		if task.is_recurring and task.recurrence_type:
 			task.next_recurrence_date = task.calculate_next_recurrence()
-			task.save(update_fields=['next_recurrence_date'])
+			task.save(update_fields=['next_recurrence_date', 'updated_at'])
 
 	@action(detail=False, methods=["get"], url_path="recent")
 	def recent(self, request):
@@ -69,7 +171,7 @@ class TaskViewSet(viewsets.ModelViewSet):
 	@action(detail=True, methods=["post"], url_path="reschedule")
 	def reschedule(self, request, pk=None):
 		task = self.get_object()
-		if task.user != request.user:
+		if task.user_id != request.user.id:
 			raise PermissionDenied("You do not have permission to modify this task.")
 		task.due_date = timezone.localdate() + timedelta(days=1)
 		task.overdue_notified = False
@@ -78,14 +180,19 @@ class TaskViewSet(viewsets.ModelViewSet):
 	
 	@action(detail=False, methods=["post"], url_path="from-template")
 	def create_from_template(self, request):
-		"""Create tasks from a template"""
-		from billing.views import _get_or_create_trial
-		sub = _get_or_create_trial(request.user)
-		if not sub.is_active():
-			raise PermissionDenied("Subscription required.")
+		"""
+		Create tasks from a template for one `base_date`, a list of `base_dates`,
+		or a `schedule` ({"start", "end", "interval_days"}). With
+		`"response": "ids"` only the count and new ids are returned.
+		"""
+		from billing.views import _require_active_subscription
+		_require_active_subscription(request.user)
 		
 		template_id = request.data.get("template_id")
-		base_date = request.data.get("base_date", timezone.localdate().isoformat())
+		try:
+			base_dates = _template_base_dates(request.data)
+		except (TypeError, ValueError) as exc:
+			return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 		
 		try:
 			# Optimize: Use prefetch_related to avoid N+1 queries
@@ -95,34 +202,77 @@ class TaskViewSet(viewsets.ModelViewSet):
 				{"error": "Template not found"}, status=status.HTTP_404_NOT_FOUND
 			)
 		
-		base_date_obj = date.fromisoformat(base_date) if isinstance(base_date, str) else base_date
-		created_tasks = []
+		items = list(template.items.all())
+		max_tasks = settings.TASK_TEMPLATE_MAX_TASKS
+		if len(items) * len(base_dates) > max_tasks:
+			return Response(
+				{"error": f"This would create more than {max_tasks} tasks; use fewer dates."},
+				status=status.HTTP_400_BAD_REQUEST,
+			)
 		
-		# Optimize: Use bulk_create for better performance with many items
-		tasks_to_create = []
-		for item in template.items.all():
-			due_date = base_date_obj + timedelta(days=item.due_date_offset)
-			tasks_to_create.append(
-				Task(
-					user=request.user,
-					title=item.title,
-					description=item.description,
-					category=item.category or template.category,
-					label=item.label,
-					due_date=due_date,
-				)
+		tasks_to_create = [
+			Task(
+				user=request.user,
+				title=item.title,
+				description=item.description,
+				category=item.category or template.category,
+				label=item.label,
+				due_date=base_date + timedelta(days=item.due_date_offset),
 			)
+			for base_date in base_dates
+			for item in items
+		]
 		
-		# Bulk create all tasks at once
-		created_task_objects = Task.objects.bulk_create(tasks_to_create)
-		created_tasks = [TaskSerializer(task).data for task in created_task_objects]
+		# Every date or none; chunked so one statement stays a reasonable size
+		with transaction.atomic():
+			created_task_objects = Task.objects.bulk_create(tasks_to_create, batch_size=settings.TASK_IMPORT_BATCH_SIZE)
+		publish_change(request.user.id, "task", "bulk_created")
 		
+		if request.data.get("response") == "ids":
+			return Response({
+				"created": len(created_task_objects),
+				"ids": [task.id for task in created_task_objects],
+			}, status=status.HTTP_201_CREATED)
+		created_tasks = TaskSerializer(created_task_objects, many=True).data
 		return Response({
 			"message": f"Created {len(created_tasks)} tasks from template",
 			"tasks": created_tasks
 		}, status=status.HTTP_201_CREATED)
 
 
+def _parse_date(value):
+	return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _template_base_dates(data):
+	"""Base dates for create_from_template; raises ValueError with a client-facing message."""
+	max_dates = settings.TASK_TEMPLATE_MAX_DATES
+	if "schedule" in data:
+		schedule = data["schedule"]
+		if not isinstance(schedule, dict):
+			raise ValueError("schedule must be an object with start, end and interval_days.")
+		try:
+			start = _parse_date(schedule["start"])
+			end = _parse_date(schedule["end"])
+		except KeyError as exc:
+			raise ValueError(f"schedule.{exc.args[0]} is required.")
+		interval = int(schedule.get("interval_days", 7))
+		if interval < 1 or end < start:
+			raise ValueError("schedule needs interval_days >= 1 and end on or after start.")
+		count = (end - start).days // interval + 1
+		if count > max_dates:
+			raise ValueError(f"At most {max_dates} base dates are allowed.")
+		return [start + timedelta(days=interval * i) for i in range(count)]
+	if "base_dates" in data:
+		base_dates = data["base_dates"]
+		if not isinstance(base_dates, list) or not base_dates:
+			raise ValueError("base_dates must be a non-empty list of dates.")
+		if len(base_dates) > max_dates:
+			raise ValueError(f"At most {max_dates} base dates are allowed.")
+		return [_parse_date(value) for value in base_dates]
+	return [_parse_date(data.get("base_date") or timezone.localdate())]
+
+
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
 def dashboard(request):
@@ -156,29 +306,43 @@ def dashboard(request):
 		start = today - timedelta(days=29)
 
 	tasks_qs = Task.objects.filter(user=user, created_at__date__gte=start, created_at__date__lte=today)
+	# The archive only holds long-untouched tasks; recent periods skip it entirely
+	sources = [tasks_qs]
+	if ArchivedTask.may_contain_created_since(start):
+		sources.append(ArchivedTask.objects.filter(user=user, created_at__date__gte=start, created_at__date__lte=today))
 
-	# Optimize: Use single aggregation query instead of multiple queries
-	stats = tasks_qs.aggregate(
-		total=Count("id"),
-		completed=Count("id", filter=Q(completed=True))
-	)
-	total = stats['total']
-	completed = stats['completed']
-	pending = total - completed
-	completion_rate = int((completed / total) * 100) if total > 0 else 0
+	total = completed = 0
+	tasks_by_category = {}
+	dates = {}
+	for qs in sources:
+		# Optimize: Use single aggregation query instead of multiple queries
+		stats = qs.aggregate(
+			total=Count("id"),
+			completed=Count("id", filter=Q(completed=True))
+		)
+		total += stats['total']
+		completed += stats['completed']
+
+		# Optimize: Use aggregation for category counts
+		for item in qs.values("category").annotate(count=Count("id")):
+			key = item["category"] or "Uncategorized"
+			tasks_by_category[key] = tasks_by_category.get(key, 0) + item["count"]
 
-	# Optimize: Use aggregation for category counts
-	by_category = tasks_qs.values("category").annotate(count=Count("id"))
-	tasks_by_category = {item["category"] or "Uncategorized": item["count"] for item in by_category}
+		# Optimize: Use aggregation instead of loop (prevents N+1 queries)
+		by_date = qs.values("due_date").annotate(
+			total=Count("id"),
+			completed=Count("id", filter=Q(completed=True))
+		)
+		for item in by_date:
+			entry = dates.setdefault(item["due_date"], {"total": 0, "completed": 0})
+			entry["total"] += item["total"]
+			entry["completed"] += item["completed"]
 
-	# Optimize: Use aggregation instead of loop (prevents N+1 queries)
-	by_date = tasks_qs.values("due_date").annotate(
-		total=Count("id"),
-		completed=Count("id", filter=Q(completed=True))
-	)
+	pending = total - completed
+	completion_rate = int((completed / total) * 100) if total > 0 else 0
 	tasks_by_date = [
-		{"date": item["due_date"].isoformat(), "total": item["total"], "completed": item["completed"]}
-		for item in by_date
+		{"date": due_date.isoformat(), "total": entry["total"], "completed": entry["completed"]}
+		for due_date, entry in dates.items()
 	]
 
 	# Optimize: Use only() to fetch only needed fields
@@ -202,6 +366,78 @@ def dashboard(request):
 	})
 
 
+def _calendar_feed_state(request, token):
+	"""
+	Owner of the feed token plus everything the feed's validators depend on,
+	fetched once per request in a single query. Runs before @condition
+	compares validators, so an unknown token or a lapsed subscription is
+	refused even to pollers whose copy is current.
+	"""
+	if not hasattr(request, "_calendar_feed_state"):
+		from accounts.models import Profile
+		user_tasks = Task.objects.filter(user=OuterRef("user")).order_by().values("user")
+		# Deletions (and archiving) leave a tombstone rather than an updated_at
+		user_tombstones = TaskTombstone.objects.filter(user=OuterRef("user")).order_by().values("user")
+		state = Profile.objects.filter(calendar_token=token).annotate(
+			task_count=Subquery(user_tasks.annotate(n=Count("id")).values("n")),
+			last_updated=Subquery(user_tasks.annotate(m=Max("updated_at")).values("m")),
+			last_deleted=Subquery(user_tombstones.annotate(m=Max("deleted_at")).values("m")),
+			subscription_status=F("user__subscription__status"),
+			subscription_end=F("user__subscription__end_date"),
+		).values(
+			"user_id", "task_count", "last_updated", "last_deleted", "subscription_status", "subscription_end",
+		).first()
+		if state is None:
+			raise Http404("Unknown calendar feed.")
+		if not (
+			state["subscription_status"] == Subscription.STATUS_ACTIVE
+			and state["subscription_end"] >= timezone.now().date()
+		):
+			# Missing or lapsed: let the usual check create the trial or expire it
+			from django.contrib.auth.models import User
+			from billing.views import _require_active_subscription
+			_require_active_subscription(User(id=state["user_id"]), "Subscription required.")
+		state["last_modified"] = max(filter(None, [state["last_updated"], state["last_deleted"]]), default=None)
+		# The host is part of every UID in the body, so it is part of the version too
+		fingerprint = ":".join([
+			str(state["user_id"]),
+			str(state["task_count"]),
+			state["last_modified"].isoformat() if state["last_modified"] else "",
+			request.get_host(),
+		])
+		state["etag"] = hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+		request._calendar_feed_state = state
+	return request._calendar_feed_state
+
+
+def _calendar_feed_etag(request, token):
+	return _calendar_feed_state(request, token)["etag"]
+
+
+def _calendar_feed_last_modified(request, token):
+	return _calendar_feed_state(request, token)["last_modified"]
+
+
+@require_safe
+@condition(etag_func=_calendar_feed_etag, last_modified_func=_calendar_feed_last_modified)
+def calendar_feed(request, token):
+	"""
+	Tokenized .ics feed for calendar subscriptions. Pollers with an active
+	subscription that send the previous ETag/Last-Modified get a 304 after
+	one small aggregate query; changed feeds are rendered once per version
+	and served from the cache.
+	"""
+	state = _calendar_feed_state(request, token)
+	cache_key = f"calendar-feed:{state['user_id']}:{state['etag']}"
+	body = cache.get(cache_key)
+	if body is None:
+		body = render_feed(feed_tasks(state["user_id"]), host=request.get_host())
+		cache.set(cache_key, body, settings.CALENDAR_FEED_CACHE_SECONDS)
+	response = HttpResponse(body, content_type="text/calendar; charset=utf-8")
+	response["Cache-Control"] = f"private, max-age={settings.CALENDAR_FEED_MAX_AGE}"
+	return response
+
+
 class TaskTemplateViewSet(viewsets.ModelViewSet):
 	queryset = TaskTemplate.objects.all()
 	serializer_class = TaskTemplateSerializer
@@ -209,10 +445,8 @@ class TaskTemplateViewSet(viewsets.ModelViewSet):
 	permission_classes = [permissions.IsAuthenticated]
 	
 	def get_queryset(self):
-		from billing.views import _get_or_create_trial
-		sub = _get_or_create_trial(self.request.user)
-		if not sub.is_active():
-			raise PermissionDenied("Subscription required.")
+		from billing.views import _require_active_subscription
+		_require_active_subscription(self.request.user)
 		# Optimize: Use prefetch_related to avoid N+1 queries when accessing items
 		return TaskTemplate.objects.filter(user=self.request.user).prefetch_related('items')
 	
@@ -222,8 +456,17 @@ class TaskTemplateViewSet(viewsets.ModelViewSet):
 		return TaskTemplateSerializer
 	
 	def perform_create(self, serializer):
-		from billing.views import _get_or_create_trial
-		sub = _get_or_create_trial(self.request.user)
-		if not sub.is_active():
-			raise PermissionDenied("Subscription required.")
-		serializer.save(user=self.request.user)
\ No newline at end of file
+		from billing.views import _require_active_subscription
+		_require_active_subscription(self.request.user)
+		template = serializer.save(user=self.request.user)
+		# Published here rather than from signals so it follows the item writes
+		publish_change(self.request.user.id, "template", "created", template.pk)
+
+	def perform_update(self, serializer):
+		template = serializer.save()
+		publish_change(self.request.user.id, "template", "updated", template.pk)
+
+	def perform_destroy(self, instance):
+		template_id = instance.pk
+		instance.delete()
+		publish_change(self.request.user.id, "template", "deleted", template_id)
\ No newline at end of file
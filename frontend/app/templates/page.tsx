@@ -83,6 +83,8 @@ export default function TemplatesPage() {
           description: formData.description,
           category: formData.category,
           items: formData.items.map((item, index) => ({
+            // Existing items keep their id so the server updates them in place
+            ...(item.id ? { id: item.id } : {}),
             title: item.title,
             description: item.description || '',
             category: item.category || '',